@@ -2,7 +2,7 @@ from django.contrib import admin
 from .models import (
     PricingFactor, PricingRule, PricingHistory, 
     DynamicPricing, PricingPrediction, CustomerPricingProfile,
-    PricingAudit
+    PricingAudit, PriceMatrix, TrainingJob
 )
 
 
@@ -28,7 +28,7 @@ class PricingHistoryAdmin(admin.ModelAdmin):
     list_filter = ['service__category', 'area', 'season', 'customer_segment', 'created_at']
     search_fields = ['service__name', 'area__name']
     ordering = ['-created_at']
-    readonly_fields = ['created_at']
+    readonly_fields = ['created_at', 'updated_at']
 
 
 @admin.register(DynamicPricing)
@@ -37,7 +37,24 @@ class DynamicPricingAdmin(admin.ModelAdmin):
     list_filter = ['service__category', 'area', 'is_active', 'pricing_version', 'created_at']
     search_fields = ['service__name', 'area__name']
     ordering = ['-created_at']
+    readonly_fields = ['record_id', 'created_at']
+
+
+@admin.register(PriceMatrix)
+class PriceMatrixAdmin(admin.ModelAdmin):
+    list_display = ['model_version', 'season_key', 'pricing_version', 'entry_count', 'is_active', 'created_at']
+    list_filter = ['is_active', 'season_key', 'model_version']
+    ordering = ['-created_at']
     readonly_fields = ['created_at']
+    exclude = ['entries']
+
+
+@admin.register(TrainingJob)
+class TrainingJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'mode', 'status', 'progress', 'stage', 'best_model', 'bundle_id', 'created_at', 'finished_at']
+    list_filter = ['status', 'mode', 'best_model', 'created_at']
+    ordering = ['-created_at']
+    readonly_fields = ['created_at', 'started_at', 'finished_at', 'updated_at']
 
 
 @admin.register(PricingPrediction)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AiPricingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ai_pricing'
+
+    def ready(self):
+        from . import signals  # noqa: F401
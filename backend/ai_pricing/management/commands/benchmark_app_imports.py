@@ -0,0 +1,98 @@
+import json
+import subprocess
+import sys
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Modules a worker imports when it first resolves the URLconf
+APP_MODULES = ('urls', 'views', 'serializers')
+
+# Packages worth calling out when they show up in an app's import graph
+HEAVY_PACKAGES = ('numpy', 'pandas', 'sklearn', 'scipy', 'joblib', 'pyarrow')
+
+# Run in a fresh interpreter so every measurement starts from a cold import cache
+PROBE = """
+import importlib, json, os, resource, sys, time
+
+def rss_kb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+start = time.perf_counter()
+import django
+django.setup()
+setup_seconds = time.perf_counter() - start
+before = set(sys.modules)
+rss_before = rss_kb()
+start = time.perf_counter()
+for name in sys.argv[1:]:
+    try:
+        importlib.import_module(name)
+    except ModuleNotFoundError as e:
+        if e.name != name:
+            raise
+added = set(sys.modules) - before
+print(json.dumps({
+    'setup_seconds': setup_seconds,
+    'import_seconds': time.perf_counter() - start,
+    'modules': len(added),
+    'rss_kb': rss_kb() - rss_before,
+    'heavy': sorted({name.split('.')[0] for name in added} & set(%r)),
+}))
+""" % (HEAVY_PACKAGES,)
+
+
+class Command(BaseCommand):
+    help = 'Measure the cold import time of each installed app (urls, views, serializers)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('apps', nargs='*', help='App labels to measure (default: project apps)')
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Runs per app; the fastest is reported',
+        )
+
+    def probe(self, modules):
+        result = subprocess.run(
+            [sys.executable, '-c', PROBE, *modules],
+            capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise CommandError(result.stderr.strip().splitlines()[-1])
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        if options['apps']:
+            try:
+                configs = [apps.get_app_config(label) for label in options['apps']]
+            except LookupError as e:
+                raise CommandError(str(e))
+        else:
+            # Project apps only; third-party and contrib apps live in site-packages
+            configs = [
+                config for config in apps.get_app_configs()
+                if config.path.startswith(str(settings.BASE_DIR))
+            ]
+
+        repeat = max(1, options['repeat'])
+        baseline = min((self.probe([]) for _ in range(repeat)), key=lambda run: run['setup_seconds'])
+        self.stdout.write(f"django.setup(): {baseline['setup_seconds'] * 1000:.0f} ms")
+        self.stdout.write(f"{'app':<16}{'import ms':>10}{'modules':>9}{'RSS MB':>8}  heavy packages")
+
+        for config in configs:
+            modules = [f'{config.name}.{module}' for module in APP_MODULES]
+            run = min((self.probe(modules) for _ in range(repeat)), key=lambda run: run['import_seconds'])
+            heavy = ', '.join(run['heavy']) or '-'
+            self.stdout.write(
+                f"{config.label:<16}{run['import_seconds'] * 1000:>10.0f}{run['modules']:>9}"
+                f"{run['rss_kb'] / 1024:>8.1f}  {heavy}"
+            )
+
+        self.stdout.write(self.style.SUCCESS('Import benchmark complete'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from ai_pricing.services.price_matrix import build_price_matrix, price_matrix_is_stale
+
+
+class Command(BaseCommand):
+    help = 'Precompute default-context dynamic prices for every active service and area'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--if-stale',
+            action='store_true',
+            help='Only rebuild when no active matrix exists for the current model and season',
+        )
+
+    def handle(self, *args, **options):
+        if options['if_stale'] and not price_matrix_is_stale():
+            self.stdout.write('Price matrix is up to date')
+            return
+
+        self.stdout.write('Building price matrix...')
+        matrix = build_price_matrix()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Built price matrix {matrix.model_version}/{matrix.season_key} '
+                f'with {matrix.entry_count} prices'
+            )
+        )
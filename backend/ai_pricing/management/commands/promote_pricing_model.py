@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ai_pricing.services.artifact_store import ArtifactStoreError, artifact_store
+
+
+class Command(BaseCommand):
+    help = 'List pricing model bundles or promote one to CURRENT'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'bundle_id',
+            nargs='?',
+            help='Bundle to promote',
+        )
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='List bundles, marking the current one',
+        )
+        parser.add_argument(
+            '--import-legacy',
+            metavar='VERSION',
+            help='Import flat pricing_/scalers_/encoders_<VERSION>.joblib files as a new bundle and promote it',
+        )
+
+    def handle(self, *args, **options):
+        if options['list']:
+            self.list_bundles()
+            return
+
+        bundle_id = options['bundle_id']
+        try:
+            if options['import_legacy']:
+                bundle_id = artifact_store.import_legacy(options['import_legacy'])
+                self.stdout.write(f'Imported legacy artifacts as {bundle_id}')
+
+            if not bundle_id:
+                raise CommandError('Give a bundle id, --import-legacy or --list')
+
+            artifact_store.promote(bundle_id)
+        except ArtifactStoreError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Promoted pricing model bundle {bundle_id}')
+        )
+
+    def list_bundles(self):
+        current = artifact_store.current()
+        bundles = artifact_store.list_bundles()
+
+        if not bundles:
+            self.stdout.write('No pricing model bundles')
+            return
+
+        for manifest in bundles:
+            marker = '*' if manifest['bundle_id'] == current else ' '
+            r2 = manifest.get('metrics', {}).get('r2')
+            score = f" r2={r2:.3f}" if isinstance(r2, (int, float)) else ''
+            self.stdout.write(
+                f"{marker} {manifest['bundle_id']}  {manifest.get('model_type', '')}{score}"
+            )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from ai_pricing.models import TrainingJob
+from ai_pricing.services.training_jobs import enqueue_training_job
+
+
+class Command(BaseCommand):
+    help = 'Queue a pricing model training job for the training worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mode',
+            choices=[mode for mode, _ in TrainingJob.MODE_CHOICES],
+            default='auto',
+            help='full retrain, incremental update, or auto (incremental unless a full retrain is due)',
+        )
+
+    def handle(self, *args, **options):
+        job, created = enqueue_training_job(options['mode'])
+
+        if created:
+            self.stdout.write(self.style.SUCCESS(f"Queued {job.mode} training job {job.id}"))
+        else:
+            self.stdout.write(f"Training job {job.id} is already {job.status}")
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ai_pricing.services.feature_snapshot import feature_snapshot, snapshot_available
+
+
+class Command(BaseCommand):
+    help = 'Bring the Arrow feature snapshot used for training up to date with pricing history'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Discard the snapshot and rebuild it from all pricing history',
+        )
+
+    def handle(self, *args, **options):
+        if not snapshot_available():
+            raise CommandError('Feature snapshot is disabled or pyarrow is not installed')
+
+        manifest = feature_snapshot.refresh(rebuild=options['rebuild'])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Feature snapshot holds {manifest['rows']} rows in {len(manifest['months'])} months "
+                f"(up to history id {manifest['high_water_id']})"
+            )
+        )
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ai_pricing.services.artifact_store import ArtifactStoreError, artifact_store
+
+
+class Command(BaseCommand):
+    help = 'Point CURRENT back at the previously promoted pricing model bundle'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--to',
+            metavar='BUNDLE_ID',
+            help='Roll back to this bundle instead of the previous one',
+        )
+
+    def handle(self, *args, **options):
+        previous = artifact_store.current()
+        try:
+            pointer = artifact_store.rollback(options['to'])
+        except ArtifactStoreError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rolled back pricing model from {previous} to {pointer['bundle_id']}"
+            )
+        )
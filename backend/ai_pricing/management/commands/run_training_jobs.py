@@ -0,0 +1,74 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from ai_pricing.services.price_matrix import build_price_matrix, price_matrix_is_stale
+from ai_pricing.services.training_jobs import (
+    claim_next_job, fail_stale_jobs, run_training_job
+)
+
+
+class Command(BaseCommand):
+    help = 'Run queued pricing model training jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run at most one queued job and exit',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=10.0,
+            help='Seconds to wait between checks for new jobs',
+        )
+        parser.add_argument(
+            '--matrix-interval',
+            type=float,
+            default=900.0,
+            help='Seconds between checks that the price matrix matches the current model and season (0 disables)',
+        )
+
+    def handle(self, *args, **options):
+        stale = fail_stale_jobs()
+        if stale:
+            self.stdout.write(self.style.WARNING(f'Marked {stale} stale training jobs as failed'))
+
+        matrix_checked_at = float('-inf')
+        while True:
+            close_old_connections()
+            job = claim_next_job()
+
+            if job is None:
+                if options['once']:
+                    self.stdout.write('No queued training jobs')
+                    return
+                if options['matrix_interval'] and time.monotonic() - matrix_checked_at >= options['matrix_interval']:
+                    matrix_checked_at = time.monotonic()
+                    self.rebuild_stale_price_matrix()
+                time.sleep(options['poll_interval'])
+                continue
+
+            self.stdout.write(f'Running training job {job.id}...')
+            job = run_training_job(job)
+
+            if job.status == 'succeeded':
+                self.stdout.write(
+                    self.style.SUCCESS(f'Training job {job.id} promoted {job.bundle_id} ({job.best_model})')
+                )
+            else:
+                self.stdout.write(self.style.ERROR(f'Training job {job.id} failed: {job.error}'))
+
+            if options['once']:
+                return
+
+    def rebuild_stale_price_matrix(self):
+        """Rebuild default prices here, where the promoted model bundles are readable"""
+        try:
+            if price_matrix_is_stale():
+                matrix = build_price_matrix()
+                self.stdout.write(f'Built price matrix {matrix.model_version}/{matrix.season_key}')
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'Error building price matrix: {str(e)}'))
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.1 on 2026-10-17 01:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_pricing', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceMatrix',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_version', models.CharField(max_length=50)),
+                ('season_key', models.CharField(help_text='Month the prices were computed for (YYYY-MM)', max_length=7)),
+                ('entries', models.JSONField(help_text="Default quotes keyed by 'service_id:area_id'")),
+                ('entry_count', models.IntegerField(default=0)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'unique_together': {('model_version', 'season_key')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-17 01:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_pricing', '0003_training_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trainingjob',
+            name='mode',
+            field=models.CharField(choices=[('full', 'Full Retrain'), ('incremental', 'Incremental Update'), ('auto', 'Incremental Unless Full Retrain Due')], default='full', max_length=20),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.1 on 2026-10-17 02:02
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fail_duplicate_active_jobs(apps, schema_editor):
+    TrainingJob = apps.get_model('ai_pricing', 'TrainingJob')
+    for status in ('queued', 'running'):
+        jobs = TrainingJob.objects.filter(status=status).order_by('created_at')
+        keep = jobs.values_list('id', flat=True).first()
+        jobs.exclude(id=keep).update(
+            status='failed', stage='Failed', error='Superseded by another active job',
+            finished_at=timezone.now()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_pricing', '0004_training_job_mode'),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_duplicate_active_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='trainingjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'queued')), fields=('status',), name='single_queued_training_job'),
+        ),
+        migrations.AddConstraint(
+            model_name='trainingjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'running')), fields=('status',), name='single_running_training_job'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-17 02:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_pricing', '0005_single_active_training_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pricematrix',
+            name='pricing_version',
+            field=models.CharField(default='0', help_text='Pricing data version stamp the prices were computed under', max_length=32),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.1 on 2026-10-17 02:29
+
+from django.db import migrations, models
+
+from ai_pricing.services.pricing_records import record_id
+
+
+def set_existing_record_ids(apps, schema_editor):
+    DynamicPricing = apps.get_model('ai_pricing', 'DynamicPricing')
+    records = list(DynamicPricing.objects.only('id', 'service_id', 'area_id', 'pricing_version'))
+    for record in records:
+        record.record_id = record_id(record.service_id, record.area_id, record.pricing_version)
+    DynamicPricing.objects.bulk_update(records, ['record_id'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_pricing', '0006_price_matrix_pricing_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dynamicpricing',
+            name='record_id',
+            field=models.UUIDField(editable=False, help_text='Id returned with quotes as pricing_record_id, derived from service, area and version', null=True, unique=True),
+        ),
+        migrations.RunPython(set_existing_record_ids, migrations.RunPython.noop),
+    ]
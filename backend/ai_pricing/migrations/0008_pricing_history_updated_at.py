@@ -0,0 +1,28 @@
+# Generated by Django 5.0.1 on 2026-10-17 02:41
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def stamp_existing_history(apps, schema_editor):
+    # Existing rows count as last changed when they were created
+    PricingHistory = apps.get_model('ai_pricing', 'PricingHistory')
+    PricingHistory.objects.update(updated_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_pricing', '0007_dynamic_pricing_record_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pricinghistory',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(stamp_existing_history, migrations.RunPython.noop),
+    ]
@@ -4,6 +4,7 @@ from services.models import Service, ServicePricing, PricingArea
 from orders.models import Order
 from appointments.models import Customer
 import json
+import uuid
 
 
 class PricingFactor(models.Model):
@@ -86,6 +87,8 @@ class PricingHistory(models.Model):
         help_text="Customer satisfaction/order success rate"
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    # Lets the feature snapshot find edited rows; queryset update() calls must set it
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
@@ -106,6 +109,10 @@ class DynamicPricing(models.Model):
     )
     factors_applied = models.JSONField(help_text="Factors and their impact")
     pricing_version = models.CharField(max_length=20, default="v1.0")
+    record_id = models.UUIDField(
+        null=True, unique=True, editable=False,
+        help_text="Id returned with quotes as pricing_record_id, derived from service, area and version"
+    )
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField(null=True, blank=True)
@@ -118,6 +125,74 @@ class DynamicPricing(models.Model):
         return f"{self.service.name} - ₹{self.calculated_price} (Confidence: {self.confidence_score:.2f})"
 
 
+class PriceMatrix(models.Model):
+    """Precomputed default-context prices for every active service and area"""
+    model_version = models.CharField(max_length=50)
+    season_key = models.CharField(max_length=7, help_text="Month the prices were computed for (YYYY-MM)")
+    pricing_version = models.CharField(
+        max_length=32, default='0',
+        help_text="Pricing data version stamp the prices were computed under"
+    )
+    entries = models.JSONField(help_text="Default quotes keyed by 'service_id:area_id'")
+    entry_count = models.IntegerField(default=0)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        unique_together = ['model_version', 'season_key']
+
+    def __str__(self):
+        return f"Price matrix {self.model_version} / {self.season_key} ({self.entry_count} prices)"
+
+
+class TrainingJob(models.Model):
+    """Background pricing model training run"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    MODE_CHOICES = [
+        ('full', 'Full Retrain'),
+        ('incremental', 'Incremental Update'),
+        ('auto', 'Incremental Unless Full Retrain Due'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    mode = models.CharField(max_length=20, choices=MODE_CHOICES, default='full')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    progress = models.FloatField(
+        default=0.0,
+        validators=[MinValueValidator(0.0), MaxValueValidator(1.0)]
+    )
+    stage = models.CharField(max_length=100, blank=True)
+    model_results = models.JSONField(default=dict, blank=True, help_text="Metrics per candidate model")
+    best_model = models.CharField(max_length=50, blank=True)
+    bundle_id = models.CharField(max_length=100, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            # At most one job waits and one runs; requests join the waiting job
+            models.UniqueConstraint(
+                fields=['status'], condition=models.Q(status='queued'), name='single_queued_training_job'
+            ),
+            models.UniqueConstraint(
+                fields=['status'], condition=models.Q(status='running'), name='single_running_training_job'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Training job {self.id} ({self.status})"
+
+
 class PricingPrediction(models.Model):
     """ML model predictions for pricing"""
     service = models.ForeignKey(Service, on_delete=models.CASCADE)
@@ -1 +1,35 @@
-# AI Pricing Services
+"""AI Pricing Services
+
+The pricing service classes bring in NumPy and the model runtime. They are
+resolved on first use, through ``get_pricing_service()`` and
+``get_optimization_service()`` or as attributes of this package, rather than
+when ``ai_pricing.urls`` is loaded. Management commands, migrations and
+health checks then start without them.
+"""
+from importlib import import_module
+
+# Public service class -> module that defines it
+_LAZY_SERVICES = {
+    'SmartPricingService': 'pricing_calculator',
+    'PricingMLService': 'pricing_ml',
+    'PricingOptimizationService': 'pricing_ml',
+}
+
+__all__ = ['get_pricing_service', 'get_optimization_service', *_LAZY_SERVICES]
+
+
+def __getattr__(name):
+    module = _LAZY_SERVICES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(import_module(f'{__name__}.{module}'), name)
+
+
+def get_pricing_service():
+    """A new ``SmartPricingService``, importing the pricing stack on first call"""
+    return __getattr__('SmartPricingService')()
+
+
+def get_optimization_service():
+    """A new ``PricingOptimizationService``, importing the pricing stack on first call"""
+    return __getattr__('PricingOptimizationService')()
@@ -0,0 +1,331 @@
+"""Versioned store for trained pricing model bundles.
+
+Every training run writes one immutable bundle directory::
+
+    <AI_PRICING_MODEL_DIR>/
+        CURRENT                      # {"bundle_id": ..., "history": [...]}
+        bundles/<bundle_id>/
+            manifest.json            # version, feature schema, metrics, sha256 per file
+            model.joblib
+            scalers.joblib
+            encoders.joblib
+            inference.npz            # NumPy-only export of the model, when supported
+
+Bundles are written to a staging directory and renamed into place, and the
+``CURRENT`` pointer is replaced with ``os.replace``, so readers only ever see
+a complete bundle and a whole pointer. Promotion and rollback only rewrite
+the pointer; workers notice the change through the model registry.
+
+Web workers serve from ``inference.npz`` through ``load_inference`` and
+never unpickle the joblib files; those are read by training only.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .feature_schema import FeatureSchema, FeatureSchemaError
+from .inference import CompiledModel, InferenceExportError, export_model
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = getattr(
+    settings, 'AI_PRICING_MODEL_DIR',
+    os.path.join(settings.BASE_DIR, 'var', 'ai_pricing', 'models')
+)
+
+BUNDLE_FILES = {
+    'model': 'model.joblib',
+    'scalers': 'scalers.joblib',
+    'encoders': 'encoders.joblib',
+}
+INFERENCE_FILE = 'inference.npz'
+MANIFEST_FILE = 'manifest.json'
+POINTER_FILE = 'CURRENT'
+
+# Previously promoted bundles remembered for rollback
+MAX_HISTORY = 20
+
+
+class ArtifactStoreError(Exception):
+    """A bundle is missing, incomplete or fails its checksum"""
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_json_atomic(path: str, data: Dict) -> None:
+    """Write a JSON file atomically: temp file in the same directory, fsync, rename"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp-', dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class ArtifactStore:
+    """Immutable model bundles plus an atomically swapped ``CURRENT`` pointer"""
+
+    def __init__(self, root: str = MODEL_DIR):
+        self.root = root
+
+    @property
+    def bundles_dir(self) -> str:
+        return os.path.join(self.root, 'bundles')
+
+    @property
+    def pointer_path(self) -> str:
+        return os.path.join(self.root, POINTER_FILE)
+
+    def bundle_path(self, bundle_id: str) -> str:
+        # Bundle ids come from the CLI; never let one escape the store
+        if not bundle_id or os.path.basename(bundle_id) != bundle_id or bundle_id.startswith('.'):
+            raise ArtifactStoreError(f"Invalid bundle id: {bundle_id!r}")
+        return os.path.join(self.bundles_dir, bundle_id)
+
+    def write_bundle(self, model_version: str, model, scalers: Dict, label_encoders: Dict,
+                     feature_schema: Optional[Dict] = None, metrics: Optional[Dict] = None,
+                     training_state: Optional[Dict] = None, uncertainty: Optional[Dict] = None) -> str:
+        """Write a complete bundle and return its id; the bundle is not promoted"""
+        import joblib
+
+        created_at = timezone.now()
+        bundle_id = f"{model_version}-{created_at:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}"
+
+        os.makedirs(self.bundles_dir, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=f'.staging-{bundle_id}-', dir=self.bundles_dir)
+        try:
+            checksums = {}
+            for key, obj in (('model', model), ('scalers', scalers), ('encoders', label_encoders)):
+                path = os.path.join(staging, BUNDLE_FILES[key])
+                joblib.dump(obj, path)
+                checksums[BUNDLE_FILES[key]] = file_sha256(path)
+
+            inference = None
+            try:
+                arrays = export_model(model, uncertainty)
+            except InferenceExportError as e:
+                logger.warning(f"Bundle {bundle_id} has no inference export: {str(e)}")
+            else:
+                path = os.path.join(staging, INFERENCE_FILE)
+                np.savez(path, **arrays)
+                checksums[INFERENCE_FILE] = file_sha256(path)
+                inference = INFERENCE_FILE
+
+            manifest = {
+                'bundle_id': bundle_id,
+                'model_version': model_version,
+                'model_type': type(model).__name__,
+                'created_at': created_at.isoformat(),
+                'feature_schema': feature_schema or {},
+                'metrics': metrics or {},
+                'training_state': training_state or {},
+                'uncertainty': uncertainty or {},
+                'inference': inference,
+                'files': checksums,
+            }
+            write_json_atomic(os.path.join(staging, MANIFEST_FILE), manifest)
+
+            # Publishing the directory is a single rename
+            os.rename(staging, self.bundle_path(bundle_id))
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        logger.info(f"Wrote pricing model bundle {bundle_id}")
+        return bundle_id
+
+    def import_legacy(self, model_version: str, model_dir: Optional[str] = None) -> str:
+        """Copy flat ``pricing_<version>.joblib`` style artifacts into a bundle"""
+        import joblib
+
+        model_dir = model_dir or self.root
+        paths = {
+            'model': os.path.join(model_dir, f'pricing_{model_version}.joblib'),
+            'scalers': os.path.join(model_dir, f'scalers_{model_version}.joblib'),
+            'encoders': os.path.join(model_dir, f'encoders_{model_version}.joblib'),
+        }
+        if not os.path.exists(paths['model']):
+            raise ArtifactStoreError(f"No legacy model artifact for {model_version}")
+
+        model = joblib.load(paths['model'])
+        scalers = joblib.load(paths['scalers']) if os.path.exists(paths['scalers']) else {}
+        label_encoders = joblib.load(paths['encoders']) if os.path.exists(paths['encoders']) else {}
+
+        return self.write_bundle(
+            model_version, model, scalers, label_encoders,
+            feature_schema=feature_schema_for(model, scalers, label_encoders),
+            metrics={'imported_from': os.path.basename(paths['model'])}
+        )
+
+    def read_manifest(self, bundle_id: str) -> Dict:
+        path = os.path.join(self.bundle_path(bundle_id), MANIFEST_FILE)
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise ArtifactStoreError(f"Bundle {bundle_id} does not exist")
+        except ValueError:
+            raise ArtifactStoreError(f"Bundle {bundle_id} has an unreadable manifest")
+
+    def verify(self, bundle_id: str, filenames=None) -> Dict:
+        """Check files (all of them by default) against the manifest checksums; returns the manifest"""
+        manifest = self.read_manifest(bundle_id)
+        bundle_path = self.bundle_path(bundle_id)
+
+        if filenames is None:
+            filenames = list(BUNDLE_FILES.values())
+            if manifest.get('inference'):
+                filenames.append(manifest['inference'])
+
+        for filename in filenames:
+            expected = manifest.get('files', {}).get(filename)
+            path = os.path.join(bundle_path, filename)
+            if expected is None or not os.path.exists(path):
+                raise ArtifactStoreError(f"Bundle {bundle_id} is missing {filename}")
+            if file_sha256(path) != expected:
+                raise ArtifactStoreError(f"Bundle {bundle_id} failed checksum for {filename}")
+
+        return manifest
+
+    def load(self, bundle_id: str, mmap_mode: Optional[str] = 'r') -> Tuple[Dict, object, Dict, Dict]:
+        """Verify and load a bundle: ``(manifest, model, scalers, label_encoders)``
+
+        The default read-only ``mmap_mode`` keeps the large numpy arrays (tree
+        nodes, coefficients) in the page cache instead of copying them into
+        each worker; pass ``None`` to get a model that can be refitted.
+        """
+        import joblib
+
+        manifest = self.verify(bundle_id)
+        bundle_path = self.bundle_path(bundle_id)
+
+        loaded = {
+            key: joblib.load(os.path.join(bundle_path, filename), mmap_mode=mmap_mode)
+            for key, filename in BUNDLE_FILES.items()
+        }
+        return manifest, loaded['model'], loaded['scalers'], loaded['encoders']
+
+    def load_inference(self, bundle_id: str) -> Tuple[Dict, CompiledModel]:
+        """Verify and load only the NumPy export: ``(manifest, compiled_model)``"""
+        manifest = self.read_manifest(bundle_id)
+        if not manifest.get('inference'):
+            raise ArtifactStoreError(f"Bundle {bundle_id} has no inference export")
+
+        self.verify(bundle_id, [manifest['inference']])
+        model = CompiledModel.load(os.path.join(self.bundle_path(bundle_id), manifest['inference']))
+        return manifest, model
+
+    def list_bundles(self) -> List[Dict]:
+        """Manifests of all complete bundles, oldest first"""
+        if not os.path.isdir(self.bundles_dir):
+            return []
+
+        manifests = []
+        for bundle_id in os.listdir(self.bundles_dir):
+            if bundle_id.startswith('.'):
+                continue
+            try:
+                manifests.append(self.read_manifest(bundle_id))
+            except ArtifactStoreError:
+                continue
+
+        return sorted(manifests, key=lambda manifest: manifest.get('created_at', ''))
+
+    def read_pointer(self) -> Dict:
+        try:
+            with open(self.pointer_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def current(self) -> Optional[str]:
+        return self.read_pointer().get('bundle_id')
+
+    def promote(self, bundle_id: str) -> Dict:
+        """Point ``CURRENT`` at a verified bundle, remembering the previous one"""
+        self.verify(bundle_id)
+
+        pointer = self.read_pointer()
+        history = list(pointer.get('history', []))
+        previous = pointer.get('bundle_id')
+        if previous and previous != bundle_id:
+            history.append(previous)
+
+        return self._write_pointer(bundle_id, history[-MAX_HISTORY:])
+
+    def rollback(self, to: Optional[str] = None) -> Dict:
+        """Re-promote the previous bundle, or ``to`` if given"""
+        pointer = self.read_pointer()
+        history = list(pointer.get('history', []))
+
+        if to is None:
+            if not history:
+                raise ArtifactStoreError("No previous bundle to roll back to")
+            to = history.pop()
+        elif to in history:
+            # Drop everything promoted after the target
+            history = history[:history.index(to)]
+        else:
+            return self.promote(to)
+
+        self.verify(to)
+        return self._write_pointer(to, history)
+
+    def _write_pointer(self, bundle_id: str, history: List[str]) -> Dict:
+        pointer = {
+            'bundle_id': bundle_id,
+            'promoted_at': timezone.now().isoformat(),
+            'history': history,
+        }
+        write_json_atomic(self.pointer_path, pointer)
+        logger.info(f"Promoted pricing model bundle {bundle_id}")
+        return pointer
+
+
+def feature_schema_for(model, scalers: Dict, label_encoders: Dict,
+                       feature_columns: Optional[List[str]] = None) -> Dict:
+    """Describe the inputs a bundle expects so a mismatched caller can be detected"""
+    if feature_columns is None:
+        scaler = scalers.get('pricing')
+        names = getattr(scaler, 'feature_names_in_', None)
+        if names is None:
+            names = getattr(model, 'feature_names_in_', None)
+        feature_columns = [str(name) for name in names] if names is not None else []
+
+    try:
+        return FeatureSchema.from_fitted(feature_columns, label_encoders, scalers.get('pricing')).to_dict()
+    except FeatureSchemaError:
+        # Too little is known to rebuild the inputs; record what is
+        return {
+            'feature_columns': list(feature_columns),
+            'categorical': {
+                column: [str(value) for value in encoder.classes_]
+                for column, encoder in label_encoders.items()
+            },
+            'scaled': 'pricing' in scalers,
+        }
+
+
+artifact_store = ArtifactStore()
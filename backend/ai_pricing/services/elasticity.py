@@ -0,0 +1,128 @@
+"""Price elasticity estimates and revenue-maximizing prices.
+
+Elasticity is estimated per (service, area) from ``PricingHistory``. Each row
+gives a relative price, ``log(final_price / base_price)``, and an effective
+demand, ``log(order_volume * success_rate)``. The least-squares slope of
+demand on price is the elasticity. Every group is fitted at once from
+``np.bincount`` sums over one query. Groups with little history, or with
+prices that barely varied, are shrunk towards ``DEFAULT_ELASTICITY``. All
+estimates are clipped to ``[MIN_ELASTICITY, MAX_ELASTICITY]`` so demand
+always falls as the price rises.
+
+``revenue_maximizing_prices`` prices each pair under linear demand with
+the estimated elasticity at the reference price,
+``orders * (1 + elasticity * (ratio - 1))``. Revenue then peaks at the ratio
+``(elasticity - 1) / (2 * elasticity)``: above the reference price for
+inelastic demand (above -1), below it for elastic demand and at it for unit
+elasticity. A constant-elasticity curve has no such peak, because its revenue
+only rises or only falls. The peak is clipped to
+``[MIN_PRICE_RATIO, MAX_PRICE_RATIO]``, and a clipped price is flagged as
+bounded.
+
+Estimates that lean mostly on the prior carry little information about the
+pair, so ``history_weight`` is returned with each one; callers should only
+act on prices from estimates with at least ``MIN_HISTORY_WEIGHT``.
+"""
+from datetime import timedelta
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+from django.utils import timezone
+
+from ..models import PricingHistory
+
+DEFAULT_ELASTICITY = -0.5
+MIN_ELASTICITY = -3.0
+MAX_ELASTICITY = -0.1
+
+# Rows of history worth as much as the prior; fewer rows lean on the default
+PRIOR_STRENGTH = 20
+# Relative price spread (std of the log ratio) below which a slope means nothing
+MIN_PRICE_SPREAD = 0.01
+HISTORY_DAYS = 365
+
+# Share of an estimate that must come from history before its price is used
+MIN_HISTORY_WEIGHT = 0.5
+
+# Band of prices considered, as ratios of the reference price
+MIN_PRICE_RATIO = 0.7
+MAX_PRICE_RATIO = 1.3
+
+
+def estimate_elasticities(pairs: Iterable[Tuple[int, int]]) -> Tuple[Dict[Tuple[int, int], float],
+                                                                     Dict[Tuple[int, int], float]]:
+    """Elasticity for every ``(service_id, area_id)`` pair and its history weight, from one query
+
+    The history weight is the share of the estimate that comes from the
+    pair's own history rather than ``DEFAULT_ELASTICITY`` (0 to 1).
+    """
+    pairs = list(dict.fromkeys((int(service_id), int(area_id)) for service_id, area_id in pairs))
+    if not pairs:
+        return {}, {}
+    index = {pair: position for position, pair in enumerate(pairs)}
+
+    rows = PricingHistory.objects.filter(
+        service_id__in={service_id for service_id, _ in pairs},
+        area_id__in={area_id for _, area_id in pairs},
+        created_at__gte=timezone.now() - timedelta(days=HISTORY_DAYS),
+        base_price__gt=0,
+        final_price__gt=0,
+        order_volume__gt=0,
+        success_rate__gt=0,
+    ).values_list('service_id', 'area_id', 'base_price', 'final_price', 'order_volume', 'success_rate')
+
+    groups, x, y = [], [], []
+    for service_id, area_id, base_price, final_price, order_volume, success_rate in rows.iterator():
+        group = index.get((service_id, area_id))
+        if group is None:
+            continue
+        groups.append(group)
+        x.append(float(final_price) / float(base_price))
+        y.append(order_volume * success_rate)
+
+    elasticities = np.full(len(pairs), DEFAULT_ELASTICITY)
+    weight = np.zeros(len(pairs))
+    if groups:
+        groups = np.asarray(groups)
+        x = np.log(np.asarray(x))
+        y = np.log(np.asarray(y))
+
+        size = len(pairs)
+        n = np.bincount(groups, minlength=size).astype(np.float64)
+        sx = np.bincount(groups, x, minlength=size)
+        sy = np.bincount(groups, y, minlength=size)
+        sxx = np.bincount(groups, x * x, minlength=size)
+        sxy = np.bincount(groups, x * y, minlength=size)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variance = sxx / n - (sx / n) ** 2
+            slope = (n * sxy - sx * sy) / (n * sxx - sx * sx)
+        fitted = (n > 1) & (variance > MIN_PRICE_SPREAD ** 2) & np.isfinite(slope)
+
+        weight = np.where(fitted, n / (n + PRIOR_STRENGTH), 0.0)
+        elasticities = weight * np.where(fitted, slope, 0.0) + (1.0 - weight) * DEFAULT_ELASTICITY
+
+    elasticities = np.clip(elasticities, MIN_ELASTICITY, MAX_ELASTICITY)
+    return (
+        {pair: float(elasticities[position]) for pair, position in index.items()},
+        {pair: float(weight[position]) for pair, position in index.items()},
+    )
+
+
+def revenue_maximizing_prices(reference_prices, elasticities) -> Tuple[np.ndarray, np.ndarray]:
+    """Revenue-maximizing price for each reference price, and whether the band clipped it"""
+    reference_prices = np.asarray(reference_prices, dtype=np.float64)
+    elasticities = np.asarray(elasticities, dtype=np.float64)
+    if reference_prices.size == 0:
+        return reference_prices, np.zeros(0, dtype=bool)
+
+    # Peak of ratio * (1 + e * (ratio - 1)); elasticities are negative, never 0
+    peaks = (elasticities - 1.0) / (2.0 * elasticities)
+    ratios = np.clip(peaks, MIN_PRICE_RATIO, MAX_PRICE_RATIO)
+    bounded = ratios != peaks
+    return np.round(reference_prices * ratios, 2), bounded
+
+
+def linear_demand(orders, price_ratio, elasticity):
+    """Orders at ``price_ratio`` times the reference price under linear demand"""
+    return orders * max(0.0, 1.0 + elasticity * (price_ratio - 1.0))
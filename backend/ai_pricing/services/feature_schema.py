@@ -0,0 +1,201 @@
+"""Declarative schema of the pricing model's input features.
+
+A schema lists the model's input columns in order. Each column has a kind:
+
+- ``numeric``: the value as a float
+- ``bool``: 1.0 or 0.0
+- ``category``: an integer code, the value's index in the sorted training
+  categories (the ``LabelEncoder`` code)
+
+It also has the default used when a quote leaves the column out. Training
+stores the schema in the bundle manifest, with the categories and the
+fitted scaler's mean and scale. ``compile()`` turns it into a
+``FeatureEncoder``. The encoder writes context dicts straight into a scaled
+float32 matrix, so serving sees the same columns, codes and scaling the
+model was fitted with, and no DataFrame is built per quote.
+"""
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+SCHEMA_VERSION = 1
+
+# Columns the pricing model is trained on, in order
+PRICING_FEATURES = [
+    {'name': 'service_id', 'kind': 'numeric', 'default': 0},
+    {'name': 'service_difficulty', 'kind': 'category', 'default': 'basic'},
+    {'name': 'area_id', 'kind': 'numeric', 'default': 0},
+    {'name': 'base_price', 'kind': 'numeric', 'default': 1000.0},
+    {'name': 'order_volume', 'kind': 'numeric', 'default': 1},
+    {'name': 'fabric_cost', 'kind': 'numeric', 'default': 0},
+    {'name': 'complexity_score', 'kind': 'numeric', 'default': 0},
+    {'name': 'success_rate', 'kind': 'numeric', 'default': 0.8},
+    {'name': 'created_month', 'kind': 'numeric', 'default': 1},
+    {'name': 'price_ratio', 'kind': 'numeric', 'default': 1.0},
+    {'name': 'is_peak_season', 'kind': 'bool', 'default': False},
+    {'name': 'is_high_difficulty', 'kind': 'bool', 'default': False},
+]
+
+FEATURE_KINDS = ('numeric', 'bool', 'category')
+
+
+class FeatureSchemaError(Exception):
+    """A schema that cannot describe the model's inputs"""
+
+
+class FeatureSchema:
+    """Ordered feature columns with their kinds, defaults, categories and scaling"""
+
+    def __init__(self, features: List[Dict], scaler: Optional[Dict] = None):
+        for feature in features:
+            if feature.get('kind') not in FEATURE_KINDS:
+                raise FeatureSchemaError(f"Unknown kind for feature {feature.get('name')!r}")
+            if feature['kind'] == 'category' and not feature.get('categories'):
+                raise FeatureSchemaError(f"Categorical feature {feature['name']!r} has no categories")
+        if scaler is not None and not len(scaler['mean']) == len(scaler['scale']) == len(features):
+            raise FeatureSchemaError("Scaler does not match the feature columns")
+
+        self.features = features
+        self.scaler = scaler
+
+    @property
+    def columns(self) -> List[str]:
+        return [feature['name'] for feature in self.features]
+
+    @classmethod
+    def from_fitted(cls, feature_columns: Sequence[str], label_encoders: Dict,
+                    scaler=None) -> 'FeatureSchema':
+        """Describe a trained model from its columns, label encoders and fitted scaler"""
+        declared = {feature['name']: feature for feature in PRICING_FEATURES}
+
+        features = []
+        for name in feature_columns:
+            feature = dict(declared.get(name, {'name': name, 'kind': 'numeric', 'default': 0}))
+            encoder = label_encoders.get(name)
+            if encoder is not None:
+                feature['kind'] = 'category'
+                feature['categories'] = [str(value) for value in encoder.classes_]
+            elif feature['kind'] == 'category':
+                raise FeatureSchemaError(f"No label encoder for categorical feature {name!r}")
+            features.append(feature)
+
+        scaling = None
+        if scaler is not None:
+            count = len(features)
+            mean = getattr(scaler, 'mean_', None)
+            scale = getattr(scaler, 'scale_', None)
+            scaling = {
+                'mean': [float(value) for value in mean] if mean is not None else [0.0] * count,
+                'scale': [float(value) for value in scale] if scale is not None else [1.0] * count,
+            }
+
+        return cls(features, scaling)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'FeatureSchema':
+        if data.get('schema_version') != SCHEMA_VERSION or not data.get('features'):
+            raise FeatureSchemaError("Manifest has no feature schema")
+        return cls(data['features'], data.get('scaler'))
+
+    def to_dict(self) -> Dict:
+        return {
+            'schema_version': SCHEMA_VERSION,
+            'features': self.features,
+            'scaler': self.scaler,
+            # Summary kept for readers of older manifests
+            'feature_columns': self.columns,
+            'categorical': {
+                feature['name']: feature['categories']
+                for feature in self.features if feature['kind'] == 'category'
+            },
+            'scaled': self.scaler is not None,
+        }
+
+    def compile(self) -> 'FeatureEncoder':
+        return FeatureEncoder(self)
+
+
+def _numeric(default):
+    default = float(default)
+
+    def convert(value) -> float:
+        return default if value is None else float(value)
+    return convert
+
+
+def _boolean(default):
+    default = 1.0 if default else 0.0
+
+    def convert(value) -> float:
+        if value is None:
+            return default
+        return 1.0 if value else 0.0
+    return convert
+
+
+def _category(categories: List[str], default):
+    codes = {category: float(code) for code, category in enumerate(categories)}
+    # Values the model never saw are encoded as the default category
+    fallback = codes.get(str(default), 0.0)
+
+    def convert(value) -> float:
+        if value is None:
+            return fallback
+        return codes.get(str(value), fallback)
+    return convert
+
+
+class FeatureEncoder:
+    """Compiled ``FeatureSchema``: context dicts in, scaled float32 rows out"""
+
+    def __init__(self, schema: FeatureSchema):
+        self.schema = schema
+        self.columns = schema.columns
+        self._converters = []
+        for feature in schema.features:
+            if feature['kind'] == 'category':
+                convert = _category(feature['categories'], feature.get('default'))
+            elif feature['kind'] == 'bool':
+                convert = _boolean(feature.get('default'))
+            else:
+                convert = _numeric(feature.get('default', 0))
+            self._converters.append((feature['name'], convert))
+
+        if schema.scaler is not None:
+            self._mean = np.asarray(schema.scaler['mean'], dtype=np.float32)
+            scale = np.asarray(schema.scaler['scale'], dtype=np.float32)
+            # StandardScaler leaves zero-variance columns unscaled
+            self._inverse_scale = np.where(scale == 0, 1.0, 1.0 / scale).astype(np.float32)
+        else:
+            self._mean = None
+            self._inverse_scale = None
+
+        # Each thread reuses one buffer, grown to the largest batch it has seen
+        self._local = threading.local()
+
+    def _buffer(self, rows: int) -> np.ndarray:
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None or buffer.shape[0] < rows:
+            capacity = max(rows, 2 * buffer.shape[0] if buffer is not None else 16)
+            buffer = np.empty((capacity, len(self._converters)), dtype=np.float32)
+            self._local.buffer = buffer
+        return buffer[:rows]
+
+    def encode_many(self, rows: Sequence[Dict]) -> np.ndarray:
+        """Encode feature dicts into an ``(n, columns)`` float32 matrix
+
+        The result is a view of this thread's buffer and is overwritten by
+        the thread's next call; copy it to keep it.
+        """
+        out = self._buffer(len(rows))
+        for column, (name, convert) in enumerate(self._converters):
+            out[:, column] = [convert(features.get(name)) for features in rows]
+
+        if self._mean is not None:
+            out -= self._mean
+            out *= self._inverse_scale
+        return out
+
+    def encode(self, features: Dict) -> np.ndarray:
+        return self.encode_many([features])[0]
@@ -0,0 +1,260 @@
+"""On-disk columnar snapshot of the training feature table.
+
+The frame built by ``extract_training_frame`` (derived features included)
+is kept as uncompressed Arrow IPC files, one per month::
+
+    <AI_PRICING_SNAPSHOT_DIR>/
+        snapshot.json            # high-water id, schema version, file and fingerprint per month
+        month=2026-10/part-000340-3f9a1c.arrow
+
+A refresh pulls ``PricingHistory`` rows above the high-water id. Rows
+already in the snapshot can also be edited (e.g. a ``success_rate``
+backfill) or deleted, so one grouped query first compares each month's row
+count and latest ``updated_at`` with the manifest. Months that differ are
+read again in full; the others only get their new rows. Each touched month
+is rewritten as one file. Loading memory-maps those files, so training and
+offline experiments read from the page cache instead of querying the
+database.
+
+``updated_at`` is set by ``save()``. Queryset ``update()`` calls on history
+must set it too, or the edit is only picked up by a ``rebuild``.
+
+pyarrow is optional. Without it, ``snapshot_available()`` is False and
+callers query the database directly.
+"""
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional
+
+import pandas as pd
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Max, Q
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from ..models import PricingHistory
+from .artifact_store import write_json_atomic
+from .training_data import CATEGORICAL_COLUMNS, extract_training_frame
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = getattr(
+    settings, 'AI_PRICING_SNAPSHOT_DIR',
+    os.path.join(settings.BASE_DIR, 'var', 'ai_pricing', 'snapshots')
+)
+MANIFEST_FILE = 'snapshot.json'
+
+# Bump when the columns produced by extract_training_frame change
+SCHEMA_VERSION = 1
+
+
+def database_name() -> str:
+    """Snapshots are only valid for the database they were built from"""
+    return str(connection.settings_dict['NAME'])
+
+
+def snapshot_available() -> bool:
+    """pyarrow is installed and the snapshot is enabled"""
+    if not getattr(settings, 'AI_PRICING_FEATURE_SNAPSHOT', True):
+        return False
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class FeatureSnapshot:
+    """Month-partitioned Arrow copy of the training feature table"""
+
+    def __init__(self, root: str = SNAPSHOT_DIR):
+        self.root = root
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.root, MANIFEST_FILE)
+
+    def read_manifest(self) -> Dict:
+        """The current manifest, or {} if it is missing or was built from another database"""
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+        if manifest.get('schema_version') != SCHEMA_VERSION or manifest.get('database') != database_name():
+            return {}
+        return manifest
+
+    def refresh(self, rebuild: bool = False) -> Dict:
+        """Bring the snapshot up to date with history; returns the manifest"""
+        manifest = {} if rebuild else self.read_manifest()
+        high_water_id = manifest.get('high_water_id', 0)
+        months = dict(manifest.get('months', {}))
+        # A rebuilt snapshot drops every file of the previous one once it is live
+        replaced = [] if manifest else self._listed_files()
+
+        fingerprints = self._month_fingerprints(high_water_id)
+        # Months whose rows already in the snapshot were edited or deleted
+        changed = {
+            key for key, fingerprint in fingerprints.items()
+            if (key in months and (
+                months[key]['rows'] != fingerprint['old_rows']
+                or months[key].get('updated_at') != fingerprint['old_updated_at']
+            )) or (key not in months and fingerprint['old_rows'])
+        }
+        # Months whose rows were all deleted
+        for key in [key for key in months if key not in fingerprints]:
+            replaced.append(months.pop(key)['file'])
+
+        selection = Q(id__gt=high_water_id)
+        for key in changed:
+            selection |= self._month_filter(key)
+        df = extract_training_frame(PricingHistory.objects.filter(selection))
+        if df.empty and not changed:
+            if not manifest or replaced:
+                manifest = self._write_manifest(high_water_id, months)
+                self._remove(replaced)
+            return manifest
+
+        new_high_water_id = max(df.attrs.get('high_water_id', 0), high_water_id)
+        groups = {} if df.empty else {
+            f"{year:04d}-{month:02d}": rows
+            for (year, month), rows in df.groupby(['created_year', 'created_month'], sort=True)
+        }
+        for key in changed - set(groups):
+            # Deleted after the fingerprints were read
+            if key in months:
+                replaced.append(months.pop(key)['file'])
+
+        for key, rows in groups.items():
+            existing = months.get(key)
+            if existing is not None:
+                if key not in changed:
+                    rows = pd.concat([self._read_file(existing['file']), rows], ignore_index=True)
+                replaced.append(existing['file'])
+
+            filename = os.path.join(f"month={key}", f"part-{new_high_water_id:06d}-{uuid.uuid4().hex[:6]}.arrow")
+            self._write_file(filename, rows)
+            months[key] = {
+                'file': filename,
+                'rows': len(rows),
+                # Read before the rows: an edit made meanwhile leaves the month stale
+                'updated_at': fingerprints.get(key, {}).get('updated_at'),
+            }
+
+        # Readers switch to the new files when the manifest is replaced
+        manifest = self._write_manifest(new_high_water_id, months)
+        self._remove(replaced)
+
+        logger.info(
+            f"Feature snapshot refreshed with {len(df)} rows up to id {new_high_water_id} "
+            f"({len(changed)} months re-read)"
+        )
+        return manifest
+
+    def _month_fingerprints(self, high_water_id: int) -> Dict[str, Dict]:
+        """Row count and latest ``updated_at`` per month, for all rows and for the snapshotted ones"""
+        old = Q(id__lte=high_water_id)
+        rows = PricingHistory.objects.annotate(
+            year=ExtractYear('created_at', tzinfo=timezone.utc),
+            month=ExtractMonth('created_at', tzinfo=timezone.utc),
+        ).values('year', 'month').annotate(
+            updated=Max('updated_at'),
+            old_rows=Count('id', filter=old),
+            old_updated=Max('updated_at', filter=old),
+        ).order_by()
+
+        return {
+            f"{row['year']:04d}-{row['month']:02d}": {
+                'updated_at': _stamp(row['updated']),
+                'old_rows': row['old_rows'],
+                'old_updated_at': _stamp(row['old_updated']),
+            }
+            for row in rows
+        }
+
+    def _month_filter(self, key: str) -> Q:
+        year, month = (int(part) for part in key.split('-'))
+        start = datetime(year, month, 1, tzinfo=timezone.utc)
+        end = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=timezone.utc)
+        return Q(created_at__gte=start, created_at__lt=end)
+
+    def load(self, months: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """Read the snapshot (or the given ``YYYY-MM`` months) as a training frame"""
+        import pyarrow as pa
+
+        manifest = self.read_manifest()
+        selected = sorted(manifest.get('months', {}).items())
+        if months is not None:
+            wanted = set(months)
+            selected = [(key, part) for key, part in selected if key in wanted]
+
+        if not selected:
+            return pd.DataFrame()
+
+        tables = [self._read_table(part['file']) for _, part in selected]
+        df = pa.concat_tables(tables).to_pandas()
+        for column in CATEGORICAL_COLUMNS:
+            df[column] = df[column].astype('category')
+
+        df.attrs['high_water_id'] = manifest['high_water_id']
+        return df
+
+    def _listed_files(self):
+        """Files named by the manifest on disk, whichever database it was built from"""
+        try:
+            with open(self.manifest_path) as f:
+                return [part['file'] for part in json.load(f).get('months', {}).values()]
+        except (FileNotFoundError, ValueError, KeyError, AttributeError):
+            return []
+
+    def _remove(self, filenames) -> None:
+        for filename in filenames:
+            try:
+                os.unlink(os.path.join(self.root, filename))
+            except OSError:
+                pass
+
+    def _read_table(self, filename: str):
+        import pyarrow as pa
+
+        # Uncompressed IPC files map straight into Arrow buffers
+        source = pa.memory_map(os.path.join(self.root, filename), 'r')
+        return pa.ipc.open_file(source).read_all()
+
+    def _read_file(self, filename: str) -> pd.DataFrame:
+        return self._read_table(filename).to_pandas()
+
+    def _write_file(self, filename: str, df: pd.DataFrame) -> None:
+        import pyarrow as pa
+
+        # Categories are stored as plain strings so months can be concatenated
+        df = df.astype({column: str for column in CATEGORICAL_COLUMNS})
+        table = pa.Table.from_pandas(df, preserve_index=False)
+
+        path = os.path.join(self.root, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with pa.OSFile(path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    def _write_manifest(self, high_water_id: int, months: Dict) -> Dict:
+        manifest = {
+            'schema_version': SCHEMA_VERSION,
+            'database': database_name(),
+            'high_water_id': high_water_id,
+            'rows': sum(part['rows'] for part in months.values()),
+            'months': months,
+        }
+        write_json_atomic(self.manifest_path, manifest)
+        return manifest
+
+
+def _stamp(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+feature_snapshot = FeatureSnapshot()
@@ -0,0 +1,169 @@
+"""NumPy-only runtime for serving trained pricing models.
+
+``export_model`` flattens a fitted candidate into plain arrays:
+
+- linear: ``coef`` and ``intercept``
+- forest / boosting: every tree's nodes concatenated into one table
+  (``feature``, ``threshold``, ``left``, ``right``, ``value``) plus the
+  root index of each tree
+
+``CompiledModel`` evaluates those arrays. Trees are walked for all rows and
+all trees at once, one level per step; leaves point at themselves, so
+``max_depth`` steps reach every leaf. The arrays are stored as
+``inference.npz`` in the model bundle, so web workers can serve quotes
+without importing sklearn, pandas or joblib.
+
+When training calibrated an error estimate (``fit_uncertainty``), it is
+exported too. ``predict_with_error`` then returns each row's expected
+absolute error, and ``confidence_scores`` turns that into a score.
+"""
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# Estimator class name -> exported kind
+EXPORTABLE_MODELS = {
+    'RandomForestRegressor': 'forest',
+    'GradientBoostingRegressor': 'boosting',
+    'LinearRegression': 'linear',
+    'Ridge': 'linear',
+}
+
+# Expected error, relative to the price, at which confidence bottoms out
+MAX_RELATIVE_ERROR = 0.25
+MIN_CONFIDENCE = 0.1
+
+
+def confidence_scores(predictions: np.ndarray, expected_errors: np.ndarray) -> np.ndarray:
+    """1.0 for an exact prediction, falling linearly to ``MIN_CONFIDENCE``"""
+    relative = expected_errors / np.maximum(np.abs(predictions), 1.0)
+    return np.clip(1.0 - relative / MAX_RELATIVE_ERROR, MIN_CONFIDENCE, 1.0)
+
+
+class InferenceExportError(Exception):
+    """The model cannot be expressed as NumPy arrays"""
+
+
+def _flatten_trees(trees) -> Dict[str, np.ndarray]:
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for tree in trees:
+        count = tree.node_count
+        nodes = np.arange(count)
+        leaf = tree.children_left == -1
+
+        features.append(np.where(leaf, 0, tree.feature))
+        thresholds.append(tree.threshold)
+        lefts.append(np.where(leaf, nodes, tree.children_left) + offset)
+        rights.append(np.where(leaf, nodes, tree.children_right) + offset)
+        values.append(tree.value.reshape(count, -1)[:, 0])
+        roots.append(offset)
+
+        max_depth = max(max_depth, tree.max_depth)
+        offset += count
+
+    return {
+        'feature': np.concatenate(features).astype(np.int32),
+        'threshold': np.concatenate(thresholds).astype(np.float64),
+        'left': np.concatenate(lefts).astype(np.int32),
+        'right': np.concatenate(rights).astype(np.int32),
+        'value': np.concatenate(values).astype(np.float64),
+        'roots': np.asarray(roots, dtype=np.int32),
+        'max_depth': np.asarray(max_depth, dtype=np.int32),
+    }
+
+
+def export_model(model, uncertainty: Optional[Dict] = None) -> Dict[str, np.ndarray]:
+    """Arrays that reproduce ``model.predict`` (and its error estimate) through ``CompiledModel``"""
+    kind = EXPORTABLE_MODELS.get(type(model).__name__)
+    if kind is None:
+        raise InferenceExportError(f"Cannot export {type(model).__name__}")
+
+    if kind == 'linear':
+        arrays = {
+            'coef': np.asarray(model.coef_, dtype=np.float64).ravel(),
+            'intercept': np.asarray(model.intercept_, dtype=np.float64).reshape(()),
+        }
+    elif kind == 'forest':
+        arrays = _flatten_trees(estimator.tree_ for estimator in model.estimators_)
+    else:
+        arrays = _flatten_trees(estimator.tree_ for estimator in model.estimators_[:, 0])
+        # The initial estimator predicts a constant (the training mean)
+        init = model.init_.predict(np.zeros((1, model.n_features_in_)))
+        arrays['init'] = np.asarray(np.ravel(init)[0], dtype=np.float64)
+        arrays['learning_rate'] = np.asarray(model.learning_rate, dtype=np.float64)
+
+    arrays['kind'] = np.asarray(kind)
+    arrays['n_features'] = np.asarray(model.n_features_in_, dtype=np.int32)
+
+    # An estimate that does not fit the model is left out; confidence then
+    # falls back to the service's heuristic
+    method = (uncertainty or {}).get('method')
+    if method == 'tree_spread' and kind == 'forest':
+        arrays['spread_scale'] = np.asarray(uncertainty['scale'], dtype=np.float64)
+    elif method == 'residual' and len(uncertainty['coef']) == model.n_features_in_:
+        arrays['residual_coef'] = np.asarray(uncertainty['coef'], dtype=np.float64)
+        arrays['residual_intercept'] = np.asarray(uncertainty['intercept'], dtype=np.float64)
+    else:
+        method = None
+    if method is not None:
+        arrays['uncertainty'] = np.asarray(method)
+        arrays['error_floor'] = np.asarray(uncertainty.get('floor', 0.0), dtype=np.float64)
+    return arrays
+
+
+class CompiledModel:
+    """Predicts from exported arrays with NumPy alone"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.kind = str(arrays['kind'])
+        self.n_features_in_ = int(arrays['n_features'])
+        self.arrays = arrays
+        self.uncertainty = str(arrays['uncertainty']) if 'uncertainty' in arrays else None
+        if self.kind == 'forest':
+            self.n_estimators = len(arrays['roots'])
+
+    @classmethod
+    def load(cls, path: str) -> 'CompiledModel':
+        with np.load(path, allow_pickle=False) as data:
+            return cls({key: data[key] for key in data.files})
+
+    def tree_values(self, X: np.ndarray) -> np.ndarray:
+        """Leaf value of every tree for every row: shape ``(rows, trees)``"""
+        a = self.arrays
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(a['roots'], (X.shape[0], len(a['roots'])))
+        for _ in range(int(a['max_depth'])):
+            # Trees compare float32 inputs with float64 thresholds, as sklearn does
+            go_left = X[rows, a['feature'][nodes]].astype(np.float32) <= a['threshold'][nodes]
+            nodes = np.where(go_left, a['left'][nodes], a['right'][nodes])
+        return a['value'][nodes]
+
+    def predict(self, X) -> np.ndarray:
+        return self.predict_with_error(X)[0]
+
+    def predict_with_error(self, X) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Predictions and expected absolute errors (None without a calibrated estimate)"""
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected {self.n_features_in_} features, got shape {X.shape}")
+
+        a = self.arrays
+        errors = None
+        if self.kind == 'linear':
+            predictions = X.astype(np.float64) @ a['coef'] + float(a['intercept'])
+        elif self.kind == 'forest':
+            values = self.tree_values(X)
+            predictions = values.mean(axis=1)
+            if self.uncertainty == 'tree_spread':
+                # Disagreement between the trees, calibrated to the holdout error
+                errors = values.std(axis=1) * float(a['spread_scale'])
+        else:
+            predictions = float(a['init']) + float(a['learning_rate']) * self.tree_values(X).sum(axis=1)
+
+        if self.uncertainty == 'residual':
+            errors = X.astype(np.float64) @ a['residual_coef'] + float(a['residual_intercept'])
+        if errors is not None:
+            errors = np.maximum(errors, float(a['error_floor']))
+        return predictions, errors
@@ -0,0 +1,200 @@
+"""Candidate model fitting for pricing model training.
+
+Kept free of Django imports so ``fit_candidate`` can run in spawned worker
+processes, one candidate per process.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, Sequence, Tuple
+
+import numpy as np
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import LinearRegression, Ridge
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import KFold, cross_val_score
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+# Slowest first, so the longest fit starts immediately
+CANDIDATE_MODELS = ('random_forest', 'gradient_boosting', 'ridge', 'linear')
+
+# Candidates whose estimator can use several cores itself
+THREADED_MODELS = ('random_forest',)
+
+
+def build_estimator(name: str, n_jobs: int = 1):
+    if name == 'random_forest':
+        return RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=n_jobs)
+    if name == 'gradient_boosting':
+        return GradientBoostingRegressor(random_state=42)
+    if name == 'ridge':
+        return Ridge(alpha=1.0)
+    if name == 'linear':
+        return LinearRegression()
+    raise ValueError(f"Unknown candidate model: {name}")
+
+
+def plan_parallelism(cores: int, candidates: Sequence[str] = CANDIDATE_MODELS) -> Tuple[int, Dict[str, int]]:
+    """Split a core budget into pool processes and per-candidate ``n_jobs``
+
+    Every process gets one core; the cores left over are shared by the
+    candidates whose estimators can thread.
+    """
+    cores = max(1, int(cores))
+    processes = min(cores, len(candidates))
+    spare = cores - processes
+
+    threaded = [name for name in candidates if name in THREADED_MODELS]
+    n_jobs = {name: 1 for name in candidates}
+    for name in threaded:
+        n_jobs[name] = 1 + spare // len(threaded)
+
+    return processes, n_jobs
+
+
+def fit_candidate(name: str, n_jobs: int, X_train, X_train_scaled, y_train,
+                  X_test_scaled, y_test, cv_folds: int = 0):
+    """Fit one candidate and score it on the holdout set (and k-fold CV)"""
+    metrics = {}
+
+    if cv_folds >= 2 and len(y_train) >= cv_folds:
+        # Scale inside each fold so the validation folds stay unseen
+        pipeline = make_pipeline(StandardScaler(), build_estimator(name, n_jobs))
+        scores = cross_val_score(
+            pipeline, X_train, y_train,
+            cv=KFold(n_splits=cv_folds, shuffle=True, random_state=42),
+            scoring='r2'
+        )
+        metrics['cv_r2_mean'] = float(scores.mean())
+        metrics['cv_r2_std'] = float(scores.std())
+
+    model = build_estimator(name, n_jobs)
+    model.fit(X_train_scaled, y_train)
+    y_pred = model.predict(X_test_scaled)
+
+    return name, model, {
+        'mae': float(mean_absolute_error(y_test, y_pred)),
+        'mse': float(mean_squared_error(y_test, y_pred)),
+        'r2': float(r2_score(y_test, y_pred)),
+        **metrics,
+    }
+
+
+def fit_candidates(X_train, X_train_scaled, y_train, X_test_scaled, y_test,
+                   cores: int = 1, cv_folds: int = 0,
+                   candidates: Sequence[str] = CANDIDATE_MODELS) -> Iterator[Tuple[str, object, Dict]]:
+    """Fit every candidate, yielding ``(name, model, metrics)`` as each finishes"""
+    processes, n_jobs = plan_parallelism(cores, candidates)
+    data = (X_train, X_train_scaled, y_train, X_test_scaled, y_test, cv_folds)
+
+    if processes <= 1:
+        for name in candidates:
+            yield fit_candidate(name, n_jobs[name], *data)
+        return
+
+    # spawn rather than fork: the parent is a Django process with open
+    # connections and possibly background threads
+    with ProcessPoolExecutor(max_workers=processes,
+                             mp_context=multiprocessing.get_context('spawn')) as pool:
+        futures = [pool.submit(fit_candidate, name, n_jobs[name], *data) for name in candidates]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def selection_score(metrics: Dict) -> float:
+    """Cross-validated R2 when available, holdout R2 otherwise"""
+    return metrics.get('cv_r2_mean', metrics['r2'])
+
+
+def fit_uncertainty(name: str, model, X, y) -> Dict:
+    """Calibrate a per-row expected absolute error on held-out rows
+
+    RandomForest uses the spread of its trees' predictions, scaled so its
+    mean matches the observed mean absolute error. Other candidates get a
+    ridge model of the absolute residual.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    residual = np.abs(np.asarray(y, dtype=np.float64) - model.predict(X))
+    floor = 0.1 * float(residual.mean())
+
+    if name == 'random_forest':
+        spread = np.std([tree.predict(X) for tree in model.estimators_], axis=0)
+        return {
+            'method': 'tree_spread',
+            'scale': float(residual.mean() / max(spread.mean(), 1e-9)),
+            'floor': floor,
+        }
+
+    residual_model = Ridge(alpha=1.0).fit(X, residual)
+    return {
+        'method': 'residual',
+        'coef': residual_model.coef_.tolist(),
+        'intercept': float(residual_model.intercept_),
+        'floor': floor,
+    }
+
+
+def linear_stats(X, y) -> Dict:
+    """Sufficient statistics of a least-squares fit, mergeable across batches"""
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    return {
+        'n': int(len(y)),
+        'sum_x': X.sum(axis=0).tolist(),
+        'sum_y': float(y.sum()),
+        'xtx': (X.T @ X).tolist(),
+        'xty': (X.T @ y).tolist(),
+    }
+
+
+def merge_linear_stats(a: Dict, b: Dict) -> Dict:
+    return {
+        'n': a['n'] + b['n'],
+        'sum_x': (np.asarray(a['sum_x']) + np.asarray(b['sum_x'])).tolist(),
+        'sum_y': a['sum_y'] + b['sum_y'],
+        'xtx': (np.asarray(a['xtx']) + np.asarray(b['xtx'])).tolist(),
+        'xty': (np.asarray(a['xty']) + np.asarray(b['xty'])).tolist(),
+    }
+
+
+def solve_linear(stats: Dict, alpha: float = 0.0) -> Tuple[np.ndarray, float]:
+    """Coefficients and intercept of (ridge) least squares with a fitted intercept"""
+    n = stats['n']
+    mean_x = np.asarray(stats['sum_x']) / n
+    mean_y = stats['sum_y'] / n
+
+    # Centre the normal equations, as sklearn does when fit_intercept=True
+    gram = np.asarray(stats['xtx']) - n * np.outer(mean_x, mean_x)
+    moment = np.asarray(stats['xty']) - n * mean_x * mean_y
+    if alpha:
+        gram = gram + alpha * np.eye(len(mean_x))
+
+    coef = np.linalg.lstsq(gram, moment, rcond=None)[0]
+    return coef, float(mean_y - mean_x @ coef)
+
+
+def update_candidate(name: str, model, X, y, state: Dict) -> Tuple[object, Dict]:
+    """Fold new rows into a trained candidate without refitting from scratch
+
+    Tree ensembles grow with ``warm_start``: new trees (random forest) or
+    boosting stages (gradient boosting) are fitted on the new rows, in
+    proportion to how much data they add. Linear models are re-solved from
+    merged sufficient statistics, which gives the exact full-data fit.
+    """
+    state = dict(state)
+    new_rows = len(y)
+
+    if name in ('random_forest', 'gradient_boosting'):
+        base = state.get('base_estimators') or model.n_estimators
+        added = max(1, round(base * new_rows / max(state['rows_seen'], 1)))
+        model.set_params(warm_start=True, n_estimators=model.n_estimators + added)
+        model.fit(X, y)
+    elif name in ('ridge', 'linear'):
+        stats = merge_linear_stats(state['linear_stats'], linear_stats(X, y))
+        model.coef_, model.intercept_ = solve_linear(stats, getattr(model, 'alpha', 0.0))
+        state['linear_stats'] = stats
+    else:
+        raise ValueError(f"Unknown candidate model: {name}")
+
+    state['rows_seen'] += new_rows
+    return model, state
@@ -0,0 +1,103 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from .artifact_store import ArtifactStore, artifact_store, feature_schema_for
+from .feature_schema import FeatureEncoder, FeatureSchema, FeatureSchemaError
+
+logger = logging.getLogger(__name__)
+
+
+class ModelBundle:
+    """Model, scalers, label encoders and compiled feature encoder from one artifact bundle"""
+
+    def __init__(self, version: str, model, scalers: Dict, label_encoders: Dict,
+                 manifest: Optional[Dict] = None):
+        self.version = version
+        self.model = model
+        self.scalers = scalers
+        self.label_encoders = label_encoders
+        self.manifest = manifest or {}
+        self.encoder = self._compile_encoder()
+        self.loaded_at = time.time()
+
+    def _compile_encoder(self) -> FeatureEncoder:
+        try:
+            schema = FeatureSchema.from_dict(self.manifest.get('feature_schema') or {})
+        except FeatureSchemaError:
+            # Bundles written before the schema was stored
+            schema = FeatureSchema.from_dict(feature_schema_for(self.model, self.scalers, self.label_encoders))
+        return schema.compile()
+
+
+class ModelRegistry:
+    """Process-wide cache of the trained pricing model.
+
+    Artifacts are loaded once per worker and shared by every
+    ``PricingMLService`` instance. The artifact store's ``CURRENT`` pointer
+    is re-checked at most every ``check_interval`` seconds; when it names a
+    different bundle, that bundle is verified, loaded and swapped in without
+    blocking readers.
+    """
+
+    def __init__(self, store: ArtifactStore = artifact_store, check_interval: float = 5.0):
+        self.store = store
+        self.check_interval = check_interval
+        self._bundle: Optional[ModelBundle] = None
+        self._bundle_id = None
+        self._last_check = float('-inf')
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[ModelBundle]:
+        """Return the current bundle, reloading it if the artifacts changed"""
+        bundle = self._bundle
+        if time.monotonic() - self._last_check < self.check_interval:
+            return bundle
+
+        # Only the first caller pays for a reload; concurrent requests keep
+        # serving the bundle they already have.
+        if not self._lock.acquire(blocking=bundle is None):
+            return bundle
+        try:
+            if time.monotonic() - self._last_check < self.check_interval:
+                return self._bundle
+            self._refresh()
+            return self._bundle
+        finally:
+            self._lock.release()
+
+    def invalidate(self) -> None:
+        """Force the next ``get`` to re-check the ``CURRENT`` pointer"""
+        self._last_check = float('-inf')
+
+    def clear(self) -> None:
+        """Drop the loaded bundle"""
+        with self._lock:
+            self._bundle = None
+            self._bundle_id = None
+            self._last_check = float('-inf')
+
+    def _refresh(self) -> None:
+        self._last_check = time.monotonic()
+        try:
+            bundle_id = self.store.current()
+            if bundle_id is None or bundle_id == self._bundle_id:
+                return
+
+            if self.store.read_manifest(bundle_id).get('inference'):
+                # Serving needs only the NumPy export and the manifest's feature schema
+                manifest, model = self.store.load_inference(bundle_id)
+                scalers, label_encoders = {}, {}
+            else:
+                manifest, model, scalers, label_encoders = self.store.load(bundle_id)
+            self._bundle = ModelBundle(bundle_id, model, scalers, label_encoders, manifest)
+            self._bundle_id = bundle_id
+            logger.info(f"Loaded pricing model {bundle_id} into registry")
+
+        except Exception as e:
+            # Keep serving the previous bundle if the new one cannot be read
+            logger.error(f"Error refreshing model registry: {str(e)}")
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,232 @@
+"""Precomputed default-context price matrix.
+
+Most quotes use the default order context, so the default dynamic price of
+every active service/area pair is computed ahead of time (by the
+``build_price_matrix`` management command) and stored as one ``PriceMatrix``
+row per model version and season key. Workers keep the current matrix in
+memory and answer default quotes with a dict lookup; only quotes with a
+customer or a non-default order context run the full pricing path. Model
+prices below ``AI_PRICING_CACHE_MIN_CONFIDENCE`` are not precomputed, so
+those pairs are always priced live.
+
+Each matrix records the pricing version stamp it was computed under. The
+signals replace the stamp in the Django cache when a service, area, base
+price or rule changes, and a matrix is only served while its stamp is
+current. Workers re-read the stamp at most every ``VERSION_CHECK_INTERVAL``
+seconds.
+"""
+import logging
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from services.models import ServicePricing
+from ..models import PriceMatrix
+from .quote_cache import should_cache_quote
+
+logger = logging.getLogger(__name__)
+
+PRICING_VERSION_CACHE_KEY = 'ai_pricing:price_matrix_version'
+# Stamp in force until pricing data first changes; every process agrees on it
+# even without a shared cache
+INITIAL_PRICING_VERSION = '0'
+
+# How often a worker re-reads the pricing version stamp
+VERSION_CHECK_INTERVAL = 5.0
+# How often a worker without a matrix re-checks the database for a new build
+CHECK_INTERVAL = 30.0
+
+# order_context values that price the same as sending no context at all
+DEFAULT_ORDER_CONTEXT = {
+    'quantity': 1,
+    'fabric_cost': 0,
+    'urgency': 'normal',
+    'special_requirements': False,
+    'fabric_type': 'cotton',
+    'garment_length': 'medium',
+    'design_complexity': 'simple',
+    'lining_required': 'none',
+    'handwork_embroidery': 'none',
+    'trims_accessories': 'minimal',
+    'fit_adjustments': 'none',
+}
+
+
+def current_season_key() -> str:
+    """Seasonal multipliers change monthly, so the season key is the month"""
+    return timezone.now().strftime('%Y-%m')
+
+
+def current_model_version() -> str:
+    # Imported here: signals import this module at startup, and the model
+    # runtime (NumPy) should only load when prices are actually served
+    from .model_registry import model_registry
+
+    bundle = model_registry.get()
+    return bundle.version if bundle is not None else 'rules'
+
+
+_version = None
+_version_checked_at = 0.0
+
+
+def current_pricing_version() -> str:
+    """Version stamp of the service, area, base price and rule data"""
+    global _version, _version_checked_at
+
+    if _version is not None and time.monotonic() - _version_checked_at < VERSION_CHECK_INTERVAL:
+        return _version
+    _version = cache.get_or_set(PRICING_VERSION_CACHE_KEY, INITIAL_PRICING_VERSION, timeout=None)
+    _version_checked_at = time.monotonic()
+    return _version
+
+
+def matrix_key(service_id, area_id) -> str:
+    return f"{int(service_id)}:{int(area_id)}"
+
+
+def is_default_quote(customer_id: Optional[int], order_context: Optional[Dict]) -> bool:
+    """Whether a quote would price exactly like the precomputed default"""
+    if customer_id:
+        return False
+    if not order_context:
+        return True
+    # Keys the calculator does not read do not change the price
+    return all(
+        value == DEFAULT_ORDER_CONTEXT[key]
+        for key, value in order_context.items()
+        if key in DEFAULT_ORDER_CONTEXT
+    )
+
+
+_cached = None  # ((model_version, season_key, pricing_version), matrix id, entries)
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def get_price_matrix() -> Optional[Dict[str, Dict]]:
+    """Entries of the active matrix for the current model and season, if one exists"""
+    global _cached, _checked_at
+
+    key = (current_model_version(), current_season_key(), current_pricing_version())
+    cached = _cached
+    if cached is not None and cached[0] == key:
+        # A loaded matrix stays valid until its key changes; a missing one
+        # may have been built since the last check
+        if cached[2] is not None or time.monotonic() - _checked_at < CHECK_INTERVAL:
+            return cached[2]
+
+    with _lock:
+        matrix_id = PriceMatrix.objects.filter(
+            model_version=key[0], season_key=key[1], pricing_version=key[2], is_active=True
+        ).values_list('id', flat=True).first()
+
+        if matrix_id is None:
+            entries = None
+        elif _cached is not None and _cached[1] == matrix_id:
+            entries = _cached[2]
+        else:
+            entries = PriceMatrix.objects.filter(id=matrix_id).values_list('entries', flat=True).first()
+
+        _cached = (key, matrix_id, entries)
+        _checked_at = time.monotonic()
+        return entries
+
+
+def lookup_price(service_id, area_id) -> Optional[Dict]:
+    """Precomputed entry for a service/area pair: ``{'quote', 'service_pricing', 'pricing_context'}``"""
+    entries = get_price_matrix()
+    if not entries:
+        return None
+    return entries.get(matrix_key(service_id, area_id))
+
+
+def price_matrix_is_stale() -> bool:
+    """No active matrix exists for the current model, season and pricing data"""
+    return not PriceMatrix.objects.filter(
+        model_version=current_model_version(),
+        season_key=current_season_key(),
+        pricing_version=current_pricing_version(),
+        is_active=True
+    ).exists()
+
+
+def build_price_matrix(pricing_service=None) -> PriceMatrix:
+    """Compute the default quote for every active service/area pair and store it"""
+    from services.serializers import ServicePricingSerializer
+    from .pricing_calculator import SmartPricingService
+
+    pricing_service = pricing_service or SmartPricingService()
+    model_version = current_model_version()
+    season_key = current_season_key()
+    # Read before pricing: a change made during the build leaves the matrix
+    # stamped with the old version, so it is never served
+    reset_price_matrix_cache()
+    pricing_version = current_pricing_version()
+
+    pricing_rows = list(
+        ServicePricing.objects.filter(
+            is_active=True, service__is_active=True, area__is_active=True
+        ).select_related('service', 'area')
+    )
+
+    results = pricing_service.calculate_dynamic_prices(
+        [{'service_id': pricing.service_id, 'area_id': pricing.area_id} for pricing in pricing_rows],
+        use_price_matrix=False
+    )
+
+    entries = {}
+    skipped = 0
+    for pricing, result in zip(pricing_rows, results):
+        if result['status'] != 'success':
+            logger.warning(
+                f"Skipping {pricing.service.name} / {pricing.area.name} in price matrix: "
+                f"{result.get('message')}"
+            )
+            continue
+        if not should_cache_quote(result, model_version):
+            # The model is unsure of this price; it is computed live instead
+            skipped += 1
+            continue
+        entries[matrix_key(pricing.service_id, pricing.area_id)] = {
+            'quote': result,
+            'service_pricing': ServicePricingSerializer(pricing).data,
+            # Recorded with every quote served from the matrix
+            'pricing_context': pricing_service._prepare_pricing_context(
+                pricing.service, pricing.area, None, None
+            ),
+        }
+
+    matrix, _created = PriceMatrix.objects.update_or_create(
+        model_version=model_version,
+        season_key=season_key,
+        defaults={
+            'pricing_version': pricing_version,
+            'entries': entries,
+            'entry_count': len(entries),
+            'is_active': True,
+        }
+    )
+    reset_price_matrix_cache()
+
+    logger.info(
+        f"Built price matrix {model_version}/{season_key} with {len(entries)} prices "
+        f"({skipped} below the cache confidence threshold)"
+    )
+    return matrix
+
+
+def invalidate_price_matrix() -> None:
+    """Stop serving precomputed prices in every worker until the matrix is rebuilt"""
+    cache.set(PRICING_VERSION_CACHE_KEY, uuid.uuid4().hex, timeout=None)
+    reset_price_matrix_cache()
+
+
+def reset_price_matrix_cache() -> None:
+    global _cached, _version
+    _cached = None
+    _version = None
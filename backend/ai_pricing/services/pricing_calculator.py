@@ -2,7 +2,11 @@ from django.db.models import Avg, Count, Q, Sum
 from django.utils import timezone
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
+import copy
 import logging
+import uuid
+
+import numpy as np
 
 from services.models import Service, ServicePricing, PricingArea
 from orders.models import Order, OrderItem
@@ -12,6 +16,12 @@ from ..models import (
     DynamicPricing, CustomerPricingProfile
 )
 from .pricing_ml import PricingMLService, PricingOptimizationService
+from .pricing_kernel import price_contexts
+from .pricing_records import pricing_record_buffer
+from .price_matrix import current_model_version, is_default_quote, lookup_price
+from .quote_cache import current_generation, quote_cache, should_cache_quote
+from .request_context import PricingRequestContext
+from .rule_engine import get_rule_set
 
 logger = logging.getLogger(__name__)
 
@@ -21,49 +31,183 @@ class SmartPricingService:
     
     def __init__(self):
         self.ml_service = PricingMLService()
-        self.optimization_service = PricingOptimizationService()
+        self.optimization_service = PricingOptimizationService(self.ml_service)
     
     def calculate_dynamic_price(self, service_id: int, area_id: int, 
                               customer_id: Optional[int] = None,
-                              order_context: Optional[Dict] = None) -> Dict:
+                              order_context: Optional[Dict] = None,
+                              request_context: Optional[PricingRequestContext] = None) -> Dict:
         """Calculate dynamic price for a service"""
+        return self.calculate_dynamic_prices([{
+            'service_id': service_id,
+            'area_id': area_id,
+            'customer_id': customer_id,
+            'order_context': order_context,
+        }], request_context)[0]
+    
+    def calculate_dynamic_prices(self, batch: List[Dict],
+                                 request_context: Optional[PricingRequestContext] = None,
+                                 use_price_matrix: bool = True) -> List[Dict]:
+        """Calculate dynamic prices for many quotes with a single ML inference pass.
+        
+        Each batch item is a dict with ``service_id``, ``area_id`` and optional
+        ``customer_id`` and ``order_context``. Results are returned in the
+        same order as the batch. Pass a preloaded ``request_context`` to share
+        ORM lookups with the caller. Default-context quotes are answered from
+        the precomputed price matrix unless ``use_price_matrix`` is False.
+        Other quotes whose prepared context was priced before are answered
+        from the quote cache.
+        """
         try:
-            service = Service.objects.get(id=service_id)
-            area = PricingArea.objects.get(id=area_id)
+            results = [None] * len(batch)
+            pending = []
+            for index, item in enumerate(batch):
+                precomputed = None
+                if use_price_matrix:
+                    precomputed = self.get_precomputed_price(
+                        item['service_id'], item['area_id'],
+                        item.get('customer_id'), item.get('order_context')
+                    )
+                if precomputed is not None:
+                    results[index] = precomputed
+                else:
+                    pending.append((index, item))
+            
+            if not pending:
+                return results
+            
+            if request_context is None:
+                request_context = PricingRequestContext.load(
+                    [(item['service_id'], item['area_id']) for _, item in pending],
+                    [item.get('customer_id') for _, item in pending]
+                )
             
-            # Get base pricing
-            try:
-                base_pricing = ServicePricing.objects.get(service=service, area=area)
-                base_price = float(base_pricing.base_price)
-            except ServicePricing.DoesNotExist:
-                return {
-                    'status': 'error',
-                    'message': 'No base pricing found for this service and area'
-                }
+            quotes = []
+            for index, item in pending:
+                service = request_context.get_service(item['service_id'])
+                area = request_context.get_area(item['area_id'])
+                
+                if service is None or area is None:
+                    results[index] = {
+                        'status': 'error',
+                        'message': 'Service or area not found'
+                    }
+                    continue
+                
+                base_price = request_context.get_base_price(service.id, area.id)
+                if base_price is None:
+                    results[index] = {
+                        'status': 'error',
+                        'message': 'No base pricing found for this service and area'
+                    }
+                    continue
+                
+                # Prepare context for pricing calculation
+                customer_id = item.get('customer_id')
+                pricing_context = self._prepare_pricing_context(
+                    service, area, customer_id, item.get('order_context'), request_context
+                )
+                quotes.append((index, service, area, base_price, customer_id, pricing_context))
+            
+            # Answer quotes priced before from the quote cache
+            model_version = current_model_version()
+            rules_version = get_rule_set().version
+            generation = current_generation()
+            cache_keys = {}
+            for index, service, area, base_price, customer_id, pricing_context in quotes:
+                cache_keys[index] = quote_cache.make_key(
+                    model_version, rules_version, generation, service.id, area.id, base_price,
+                    pricing_context, self._get_discount_percentage(customer_id, request_context)
+                )
+            cached = quote_cache.get_many(cache_keys.values())
+            if cached:
+                for index, service, area, base_price, _, pricing_context in quotes:
+                    quote = cached.get(cache_keys[index])
+                    if quote is not None:
+                        # Served quotes are recorded whether or not they were priced now
+                        self._queue_pricing_record(
+                            service.id, area.id, base_price, quote['breakdown']['final_price'],
+                            quote['confidence_score'], pricing_context
+                        )
+                        results[index] = quote
+                quotes = [quote for quote in quotes if cache_keys[quote[0]] not in cached]
+                if not quotes:
+                    return results
+            
+            # Get ML predictions for the whole batch at once
+            ml_predictions = self.ml_service.predict_prices([
+                (service.id, area.id, pricing_context)
+                for _, service, area, _, _, pricing_context in quotes
+            ], request_context)
+            
+            # Fallback to rule-based pricing for every quote the model could not price
+            fallback = [
+                position for position, ml_prediction in enumerate(ml_predictions)
+                if ml_prediction['status'] != 'success'
+            ]
+            fallback_prices = dict(zip(fallback, self.calculate_rule_based_prices(
+                [quotes[position][3] for position in fallback],
+                [quotes[position][5] for position in fallback]
+            ).tolist()))
+            
+            for position, (index, service, area, base_price, customer_id, pricing_context) in enumerate(quotes):
+                if position in fallback_prices:
+                    calculated_price = fallback_prices[position]
+                    confidence_score = 0.3  # Lower confidence for rule-based
+                else:
+                    calculated_price = ml_predictions[position]['final_price']
+                    confidence_score = ml_predictions[position]['confidence_score']
+                
+                results[index] = self._build_quote(
+                    service, area, base_price, customer_id, pricing_context,
+                    calculated_price, confidence_score, request_context
+                )
             
-            # Prepare context for pricing calculation
-            pricing_context = self._prepare_pricing_context(
-                service, area, customer_id, order_context
-            )
+            quote_cache.set_many({
+                cache_keys[index]: results[index]
+                for index, *_ in quotes
+                if should_cache_quote(results[index], model_version)
+            })
             
-            # Get ML prediction
-            ml_prediction = self.ml_service.predict_price(
-                service_id, area_id, pricing_context
-            )
-            
-            if ml_prediction['status'] != 'success':
-                # Fallback to rule-based pricing
-                calculated_price = self._calculate_rule_based_price(
-                    service, area, base_price, pricing_context
-                )
-                confidence_score = 0.3  # Lower confidence for rule-based
-            else:
-                calculated_price = ml_prediction['final_price']
-                confidence_score = ml_prediction['confidence_score']
+            return results
             
+        except Exception as e:
+            logger.error(f"Error calculating dynamic prices: {str(e)}")
+            return [{'status': 'error', 'message': str(e)} for _ in batch]
+    
+    def get_precomputed_price(self, service_id: int, area_id: int,
+                              customer_id: Optional[int] = None,
+                              order_context: Optional[Dict] = None) -> Optional[Dict]:
+        """Precomputed quote for a default-context request, if the matrix has one"""
+        if not is_default_quote(customer_id, order_context):
+            return None
+        
+        try:
+            entry = lookup_price(service_id, area_id)
+        except (TypeError, ValueError):
+            return None
+        
+        if entry is None:
+            return None
+        # The matrix is shared by every request in this worker
+        quote = copy.deepcopy(entry['quote'])
+        # Served quotes are recorded whether or not they were priced now
+        self._queue_pricing_record(
+            service_id, area_id, quote['base_price'], quote['breakdown']['final_price'],
+            quote['confidence_score'], entry.get('pricing_context', {})
+        )
+        return quote
+    
+    def _build_quote(self, service: Service, area: PricingArea, base_price: float,
+                     customer_id: Optional[int], pricing_context: Dict,
+                     calculated_price: float, confidence_score: float,
+                     request_context: Optional[PricingRequestContext] = None) -> Dict:
+        """Turn a model or rule-based price into a final quote"""
+        try:
             # Apply customer-specific adjustments
+            customer_adjustment = 0
             if customer_id:
-                customer_adjustment = self._get_customer_adjustment(customer_id)
+                customer_adjustment = self._get_customer_adjustment(customer_id, request_context)
                 calculated_price = self._apply_customer_adjustment(
                     calculated_price, customer_adjustment
                 )
@@ -84,26 +228,26 @@ class SmartPricingService:
             max_price = base_price * 2.0  # Maximum 200% of base price
             final_price = max(min_price, min(calculated_price, max_price))
             
-            # Create pricing record
-            pricing_record = self._create_pricing_record(
-                service, area, base_price, final_price, 
+            # Record the quote without writing on the request path
+            pricing_record_id = self._queue_pricing_record(
+                service.id, area.id, base_price, final_price, 
                 confidence_score, pricing_context
             )
             
             return {
                 'status': 'success',
-                'service_id': service_id,
-                'area_id': area_id,
+                'service_id': service.id,
+                'area_id': area.id,
                 'base_price': base_price,
                 'calculated_price': round(final_price, 2),
                 'price_multiplier': round(final_price / base_price, 2),
                 'confidence_score': confidence_score,
-                'pricing_record_id': pricing_record.id,
                 'factors_applied': self._get_applied_factors_summary(pricing_context),
+                'pricing_record_id': str(pricing_record_id),
                 'breakdown': {
                     'base_price': base_price,
                     'ml_adjustment': calculated_price - base_price,
-                    'customer_adjustment': self._get_customer_adjustment(customer_id) if customer_id else 0,
+                    'customer_adjustment': customer_adjustment,
                     'seasonal_adjustment': seasonal_adjustment,
                     'final_price': final_price
                 }
@@ -118,7 +262,8 @@ class SmartPricingService:
     
     def _prepare_pricing_context(self, service: Service, area: PricingArea,
                                customer_id: Optional[int], 
-                               order_context: Optional[Dict]) -> Dict:
+                               order_context: Optional[Dict],
+                               request_context: Optional[PricingRequestContext] = None) -> Dict:
         """Prepare context for pricing calculation"""
         context = {
             'service_difficulty': service.difficulty_level,
@@ -143,19 +288,30 @@ class SmartPricingService:
         
         # Add customer context if available
         if customer_id:
-            try:
-                customer = Customer.objects.get(id=customer_id)
-                customer_profile = self._get_or_create_customer_profile(customer)
-                
+            customer_profile = None
+            if request_context is not None:
+                customer_profile = request_context.get_customer_profile(customer_id)
+            
+            if customer_profile is None:
+                try:
+                    customer = Customer.objects.get(id=customer_id)
+                    customer_profile = self._get_or_create_customer_profile(customer)
+                    if request_context is not None:
+                        request_context.add_customer_profile(customer_profile)
+                except Customer.DoesNotExist:
+                    pass
+            
+            if customer_profile is not None:
                 context.update({
                     'customer_loyalty_tier': customer_profile.loyalty_tier,
                     'customer_total_orders': customer_profile.total_orders,
                     'customer_avg_order_value': float(customer_profile.average_order_value),
                     'customer_payment_reliability': customer_profile.payment_reliability_score,
-                    'customer_preferred_services': list(customer_profile.preferred_services.values_list('id', flat=True))
+                    # Uses the prefetched relation when the profile came from the request context
+                    'customer_preferred_services': [
+                        preferred.id for preferred in customer_profile.preferred_services.all()
+                    ]
                 })
-            except Customer.DoesNotExist:
-                pass
         
         # Add order context if available
         if order_context:
@@ -179,128 +335,33 @@ class SmartPricingService:
     def _calculate_rule_based_price(self, service: Service, area: PricingArea,
                                   base_price: float, context: Dict) -> float:
         """Calculate price using business rules"""
-        try:
-            price = base_price
-            
-            # Apply area multiplier
-            price *= context.get('area_multiplier', 1.0)
-            
-            # Apply difficulty multiplier
-            difficulty_multipliers = {
-                'basic': 1.0,
-                'intermediate': 1.2,
-                'advanced': 1.5,
-                'expert': 2.0
-            }
-            difficulty = context.get('service_difficulty', 'basic')
-            price *= difficulty_multipliers.get(difficulty, 1.0)
-            
-            # Apply fabric type multiplier
-            fabric_multipliers = {
-                'cotton': 1.0,
-                'rayon': 1.1,   # +10% for rayon
-                'silk': 1.3,    # +30% for silk
-                'wool': 1.2,    # +20% for wool
-                'linen': 1.15,  # +15% for linen
-                'polyester': 0.95,  # -5% for polyester
-                'georgette': 1.25,  # +25% for georgette
-                'chiffon': 1.25,    # +25% for chiffon
-            }
-            fabric_type = context.get('fabric_type', 'cotton').lower()
-            price *= fabric_multipliers.get(fabric_type, 1.0)
-            
-            # Apply garment length multiplier
-            length_multipliers = {
-                'short': 1.0,
-                'medium': 1.1,   # +10% for medium length
-                'long': 1.2,     # +20% for long garments
-            }
-            garment_length = context.get('garment_length', 'medium').lower()
-            price *= length_multipliers.get(garment_length, 1.0)
-            
-            # Apply design complexity multiplier
-            design_multipliers = {
-                'simple': 1.0,
-                'moderate': 1.15,  # +15% for moderate complexity
-                'complex': 1.5,    # +50% for complex designs
-            }
-            design_complexity = context.get('design_complexity', 'simple').lower()
-            price *= design_multipliers.get(design_complexity, 1.0)
-            
-            # Apply lining multiplier
-            lining_multipliers = {
-                'none': 1.0,
-                'partial': 1.1,   # +10% for partial lining
-                'full': 1.3,      # +30% for full lining
-            }
-            lining_required = context.get('lining_required', 'none').lower()
-            price *= lining_multipliers.get(lining_required, 1.0)
-            
-            # Apply handwork/embroidery multiplier
-            handwork_multipliers = {
-                'none': 1.0,
-                'light': 1.1,    # +10% for light handwork
-                'heavy': 1.4,    # +40% for heavy embroidery
-            }
-            handwork = context.get('handwork_embroidery', 'none').lower()
-            price *= handwork_multipliers.get(handwork, 1.0)
-            
-            # Apply trims & accessories multiplier
-            trims_multipliers = {
-                'minimal': 1.0,
-                'moderate': 1.1,  # +10% for moderate trims
-                'heavy': 1.2,     # +20% for heavy trims
-            }
-            trims = context.get('trims_accessories', 'minimal').lower()
-            price *= trims_multipliers.get(trims, 1.0)
-            
-            # Apply fit adjustments multiplier
-            fit_multipliers = {
-                'none': 1.0,
-                'minor': 1.1,        # +10% for 1-point adjustments
-                'moderate': 1.2,     # +20% for 2-3 points adjustments
-                'major': 1.5,        # +50% for full restructure
-            }
-            fit_adjustments = context.get('fit_adjustments', 'none').lower()
-            price *= fit_multipliers.get(fit_adjustments, 1.0)
-            
-            # Apply seasonal multiplier
-            if context.get('is_peak_season', False):
-                price *= 1.3  # 30% increase during peak season
-            
-            # Apply volume discount
-            order_volume = context.get('order_volume', 1)
-            if order_volume >= 10:
-                price *= 0.85  # 15% discount for large orders (10+)
-            elif order_volume >= 5:
-                price *= 0.9   # 10% discount for bulk orders (5+)
-            
-            # Apply urgency multiplier
-            urgency_level = context.get('urgency_level', 'normal')
-            if urgency_level == 'urgent':
-                price *= 1.5  # 50% increase for urgent orders
-            elif urgency_level == 'rush':
-                price *= 2.0  # 100% increase for rush orders
-            
-            # Apply special requirements multiplier
-            if context.get('special_requirements', False):
-                price *= 1.15  # +15% for special requirements
-            
-            # Add fabric cost to the final price
-            fabric_cost = context.get('fabric_cost', 0)
-            if fabric_cost and fabric_cost > 0:
-                price += float(fabric_cost)
-            
-            return price
-            
-        except Exception as e:
-            logger.error(f"Error in rule-based pricing: {str(e)}")
-            return base_price
+        return float(self.calculate_rule_based_prices([base_price], [context])[0])
+    
+    def calculate_rule_based_prices(self, base_prices: List[float],
+                                    contexts: List[Dict]) -> np.ndarray:
+        """Calculate rule-based prices for a whole batch of contexts in one pass.
+        
+        Contexts that cannot be priced fall back to their base price.
+        """
+        return price_contexts(base_prices, contexts)
+    
+    def _get_discount_percentage(self, customer_id: Optional[int],
+                                 request_context: Optional[PricingRequestContext] = None) -> float:
+        """Loyalty discount of an already loaded customer profile (0 without one)"""
+        if not customer_id or request_context is None:
+            return 0
+        customer_profile = request_context.get_customer_profile(customer_id)
+        return customer_profile.discount_percentage if customer_profile is not None else 0
     
-    def _get_customer_adjustment(self, customer_id: int) -> Dict:
+    def _get_customer_adjustment(self, customer_id: int,
+                                 request_context: Optional[PricingRequestContext] = None) -> Dict:
         """Get customer-specific pricing adjustments"""
         try:
-            customer_profile = CustomerPricingProfile.objects.get(customer_id=customer_id)
+            customer_profile = None
+            if request_context is not None:
+                customer_profile = request_context.get_customer_profile(customer_id)
+            if customer_profile is None:
+                customer_profile = CustomerPricingProfile.objects.get(customer_id=customer_id)
             
             return {
                 'discount_percentage': customer_profile.discount_percentage,
@@ -393,30 +454,16 @@ class SmartPricingService:
         
         return profile
     
-    def _create_pricing_record(self, service: Service, area: PricingArea,
-                             base_price: float, final_price: float,
-                             confidence_score: float, context: Dict) -> DynamicPricing:
-        """Create a dynamic pricing record"""
-        try:
-            # Upsert by unique key (service, area, pricing_version)
-            pricing_version = "v1.0"
-            pricing_record, _created = DynamicPricing.objects.update_or_create(
-                service=service,
-                area=area,
-                pricing_version=pricing_version,
-                defaults={
-                    'base_price': base_price,
-                    'calculated_price': final_price,
-                    'confidence_score': confidence_score,
-                    'factors_applied': context,
-                    'is_active': True,
-                }
-            )
-            return pricing_record
-            
-        except Exception as e:
-            logger.error(f"Error creating pricing record: {str(e)}")
-            raise
+    def _queue_pricing_record(self, service_id: int, area_id: int,
+                              base_price: float, final_price: float,
+                              confidence_score: float, context: Dict) -> uuid.UUID:
+        """Queue a dynamic pricing record for write-behind persistence; returns its record id"""
+        # Upserted by unique key (service, area, pricing_version) on flush
+        pricing_version = "v1.0"
+        return pricing_record_buffer.add(
+            int(service_id), int(area_id), pricing_version,
+            base_price, final_price, confidence_score, context
+        )
     
     def _get_applied_factors_summary(self, context: Dict) -> Dict:
         """Get summary of applied pricing factors"""
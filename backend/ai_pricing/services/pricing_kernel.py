@@ -0,0 +1,176 @@
+"""Vectorized rule-based pricing kernel.
+
+The multiplier tables used by ``SmartPricingService`` are compiled once into
+integer-coded NumPy lookup arrays. A batch of pricing contexts is encoded
+into a code matrix and priced in one pass. The kernel applies the
+multipliers in exactly the same order as the original scalar rules, so every
+price is bit-for-bit identical to the one-context-at-a-time calculation.
+"""
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+
+# Multiplier steps in the order they are applied to the price. Each step is
+# (context key, default value, lowercase the value, {value: multiplier}).
+# Values missing from a table leave the price unchanged.
+MULTIPLIER_STEPS = [
+    ('service_difficulty', 'basic', False, {
+        'basic': 1.0,
+        'intermediate': 1.2,
+        'advanced': 1.5,
+        'expert': 2.0,
+    }),
+    ('fabric_type', 'cotton', True, {
+        'cotton': 1.0,
+        'rayon': 1.1,       # +10% for rayon
+        'silk': 1.3,        # +30% for silk
+        'wool': 1.2,        # +20% for wool
+        'linen': 1.15,      # +15% for linen
+        'polyester': 0.95,  # -5% for polyester
+        'georgette': 1.25,  # +25% for georgette
+        'chiffon': 1.25,    # +25% for chiffon
+    }),
+    ('garment_length', 'medium', True, {
+        'short': 1.0,
+        'medium': 1.1,  # +10% for medium length
+        'long': 1.2,    # +20% for long garments
+    }),
+    ('design_complexity', 'simple', True, {
+        'simple': 1.0,
+        'moderate': 1.15,  # +15% for moderate complexity
+        'complex': 1.5,    # +50% for complex designs
+    }),
+    ('lining_required', 'none', True, {
+        'none': 1.0,
+        'partial': 1.1,  # +10% for partial lining
+        'full': 1.3,     # +30% for full lining
+    }),
+    ('handwork_embroidery', 'none', True, {
+        'none': 1.0,
+        'light': 1.1,  # +10% for light handwork
+        'heavy': 1.4,  # +40% for heavy embroidery
+    }),
+    ('trims_accessories', 'minimal', True, {
+        'minimal': 1.0,
+        'moderate': 1.1,  # +10% for moderate trims
+        'heavy': 1.2,     # +20% for heavy trims
+    }),
+    ('fit_adjustments', 'none', True, {
+        'none': 1.0,
+        'minor': 1.1,     # +10% for 1-point adjustments
+        'moderate': 1.2,  # +20% for 2-3 points adjustments
+        'major': 1.5,     # +50% for full restructure
+    }),
+]
+
+PEAK_SEASON_MULTIPLIERS = np.array([1.0, 1.3])  # 30% increase during peak season
+VOLUME_MULTIPLIERS = np.array([1.0, 0.9, 0.85])  # 10% off for 5+, 15% off for 10+
+URGENCY_CODES = {'urgent': 1, 'rush': 2}
+URGENCY_MULTIPLIERS = np.array([1.0, 1.5, 2.0])  # +50% urgent, +100% rush
+SPECIAL_REQUIREMENTS_MULTIPLIERS = np.array([1.0, 1.15])  # +15% for special requirements
+
+
+def _compile_step(table: Dict[str, float]) -> Tuple[Dict[str, int], np.ndarray]:
+    # Code 0 is reserved for values missing from the table
+    codes = {value: code for code, value in enumerate(table, start=1)}
+    multipliers = np.array([1.0] + list(table.values()))
+    return codes, multipliers
+
+
+_COMPILED_STEPS = [
+    (key, default, lowercase, *_compile_step(table))
+    for key, default, lowercase, table in MULTIPLIER_STEPS
+]
+
+# Lookup arrays in application order, one per column of the code matrix
+LOOKUP_TABLES: List[np.ndarray] = [multipliers for *_, multipliers in _COMPILED_STEPS] + [
+    PEAK_SEASON_MULTIPLIERS,
+    VOLUME_MULTIPLIERS,
+    URGENCY_MULTIPLIERS,
+    SPECIAL_REQUIREMENTS_MULTIPLIERS,
+]
+
+
+def _encode_context(context: Dict) -> Tuple[float, List[int], float]:
+    """Encode one context; raises on the same inputs the scalar rules reject"""
+    area_multiplier = context.get('area_multiplier', 1.0)
+    if not isinstance(area_multiplier, (int, float)):
+        raise TypeError(f"Invalid area multiplier: {area_multiplier!r}")
+
+    codes = []
+    for key, default, lowercase, step_codes, _multipliers in _COMPILED_STEPS:
+        value = context.get(key, default)
+        if lowercase:
+            value = value.lower()
+        codes.append(step_codes.get(value, 0))
+
+    codes.append(1 if context.get('is_peak_season', False) else 0)
+
+    order_volume = context.get('order_volume', 1)
+    if order_volume >= 10:
+        codes.append(2)
+    elif order_volume >= 5:
+        codes.append(1)
+    else:
+        codes.append(0)
+
+    urgency_level = context.get('urgency_level', 'normal')
+    codes.append(URGENCY_CODES.get(urgency_level, 0) if isinstance(urgency_level, str) else 0)
+
+    codes.append(1 if context.get('special_requirements', False) else 0)
+
+    fabric_cost = context.get('fabric_cost', 0)
+    fabric_cost = float(fabric_cost) if fabric_cost and fabric_cost > 0 else 0.0
+
+    return float(area_multiplier), codes, fabric_cost
+
+
+def encode_contexts(contexts: Sequence[Dict]) -> Dict[str, np.ndarray]:
+    """Encode pricing contexts into the arrays consumed by ``rule_based_prices``.
+
+    Contexts that the scalar rules could not price are flagged in ``valid``
+    and priced at their base price.
+    """
+    count = len(contexts)
+    area_multipliers = np.ones(count)
+    codes = np.zeros((count, len(LOOKUP_TABLES)), dtype=np.intp)
+    fabric_costs = np.zeros(count)
+    valid = np.ones(count, dtype=bool)
+
+    for index, context in enumerate(contexts):
+        try:
+            area_multipliers[index], codes[index], fabric_costs[index] = _encode_context(context)
+        except Exception:
+            valid[index] = False
+
+    return {
+        'area_multipliers': area_multipliers,
+        'codes': codes,
+        'fabric_costs': fabric_costs,
+        'valid': valid,
+    }
+
+
+def rule_based_prices(base_prices, area_multipliers: np.ndarray, codes: np.ndarray,
+                      fabric_costs: np.ndarray, valid: np.ndarray = None) -> np.ndarray:
+    """Price whole arrays of encoded contexts in one pass"""
+    base_prices = np.asarray(base_prices, dtype=np.float64)
+    prices = base_prices * area_multipliers
+
+    # Multiply step by step (not by a pre-multiplied factor) so the rounding
+    # matches the scalar calculation exactly
+    for column, multipliers in enumerate(LOOKUP_TABLES):
+        prices *= multipliers[codes[:, column]]
+
+    prices += fabric_costs
+
+    if valid is not None:
+        prices = np.where(valid, prices, base_prices)
+
+    return prices
+
+
+def price_contexts(base_prices, contexts: Sequence[Dict]) -> np.ndarray:
+    """Encode and price a batch of pricing contexts"""
+    return rule_based_prices(base_prices, **encode_contexts(contexts))
@@ -1,18 +1,10 @@
-import numpy as np
-import pandas as pd
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-from sklearn.linear_model import LinearRegression, Ridge
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from django.conf import settings
 from django.db.models import Avg, Count, Q
 from django.utils import timezone
 from datetime import datetime, timedelta
 import json
 import logging
-from typing import Dict, List, Tuple, Optional
-import joblib
-import os
+from typing import TYPE_CHECKING, Callable, Dict, List, Tuple, Optional
 
 from services.models import Service, ServicePricing, PricingArea
 from orders.models import Order, OrderItem
@@ -21,9 +13,35 @@ from ..models import (
     PricingFactor, PricingRule, PricingHistory, 
     DynamicPricing, PricingPrediction, CustomerPricingProfile
 )
+from .artifact_store import artifact_store, feature_schema_for
+from .elasticity import (
+    DEFAULT_ELASTICITY, MIN_HISTORY_WEIGHT, estimate_elasticities, linear_demand, revenue_maximizing_prices
+)
+from .feature_schema import PRICING_FEATURES, FeatureEncoder, FeatureSchema
+from .inference import confidence_scores
+from .model_registry import model_registry
+from .request_context import PricingRequestContext
+from .rule_engine import CompiledRuleSet, get_rule_set
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# pandas, sklearn and the training modules are imported inside the training
+# methods: serving goes through the NumPy-only model export, so web workers
+# never load them
 
 logger = logging.getLogger(__name__)
 
+TRAINING_FEATURE_COLUMNS = [feature['name'] for feature in PRICING_FEATURES]
+TRAINING_CATEGORICAL_COLUMNS = [feature['name'] for feature in PRICING_FEATURES if feature['kind'] == 'category']
+
+# Share of the new rows an incremental update holds out to recalibrate the
+# error estimate, as the full retrain does with its test split
+INCREMENTAL_HOLDOUT = 0.2
+# Smallest holdout worth calibrating on; with fewer new rows the update learns
+# from all of them and keeps the parent bundle's calibration
+MIN_CALIBRATION_ROWS = 10
+
 
 class PricingMLService:
     """Machine Learning service for dynamic pricing"""
@@ -33,42 +51,35 @@ class PricingMLService:
         self.scalers = {}
         self.label_encoders = {}
         self.model_version = "v1.0"
+        self.feature_columns = []
+        self.feature_encoder = None
+        self.training_metrics = {}
+        self.training_state = {}
+        self.uncertainty = {}
+        self.bundle_id = None
         
-    def prepare_training_data(self) -> pd.DataFrame:
+    def prepare_training_data(self) -> 'pd.DataFrame':
         """Prepare training data from historical pricing"""
+        import pandas as pd
+        from .feature_snapshot import feature_snapshot, snapshot_available
+        from .training_data import extract_training_frame
+        
         try:
-            # Get historical pricing data
-            pricing_history = PricingHistory.objects.all()
-            
-            if not pricing_history.exists():
+            df = None
+            if snapshot_available():
+                # Only rows added since the last run come from the database
+                try:
+                    feature_snapshot.refresh()
+                    df = feature_snapshot.load()
+                except Exception as e:
+                    logger.error(f"Error reading feature snapshot, querying history instead: {str(e)}")
+            
+            if df is None:
+                # Stream historical pricing into columnar arrays in two queries
+                df = extract_training_frame()
+            
+            if df.empty:
                 logger.warning("No historical pricing data available for training")
-                return pd.DataFrame()
-            
-            data = []
-            for record in pricing_history:
-                data.append({
-                    'service_id': record.service.id,
-                    'service_category': record.service.category.name,
-                    'service_difficulty': record.service.difficulty_level,
-                    'area_id': record.area.id,
-                    'base_price': float(record.base_price),
-                    'final_price': float(record.final_price),
-                    'order_volume': record.order_volume,
-                    'fabric_cost': float(record.fabric_cost) if record.fabric_cost else 0,
-                    'complexity_score': record.complexity_score or 0,
-                    'success_rate': record.success_rate or 0.8,
-                    'season': record.season or 'normal',
-                    'customer_segment': record.customer_segment or 'regular',
-                    'created_month': record.created_at.month,
-                    'created_year': record.created_at.year,
-                })
-            
-            df = pd.DataFrame(data)
-            
-            # Add derived features
-            df['price_ratio'] = df['final_price'] / df['base_price']
-            df['is_peak_season'] = df['season'].isin(['wedding', 'festival', 'holiday'])
-            df['is_high_difficulty'] = df['service_difficulty'].isin(['advanced', 'expert'])
             
             return df
             
@@ -76,32 +87,45 @@ class PricingMLService:
             logger.error(f"Error preparing training data: {str(e)}")
             return pd.DataFrame()
     
-    def train_pricing_model(self) -> Dict:
-        """Train ML models for pricing prediction"""
+    def train_pricing_model(self, progress: Optional[Callable[[float, str, Optional[Dict]], None]] = None,
+                            mode: str = 'full') -> Dict:
+        """Train ML models for pricing prediction
+        
+        ``mode`` is ``'full'`` (refit every candidate on all history),
+        ``'incremental'`` (fold rows added since the current model into it) or
+        ``'auto'`` (incremental unless a scheduled full retrain is due).
+        ``progress`` is called as ``progress(fraction, stage, model_results)``
+        while training runs, so a background job can report how far it got.
+        """
+        from sklearn.model_selection import train_test_split
+        from sklearn.preprocessing import StandardScaler
+        from .model_fitting import (
+            CANDIDATE_MODELS, fit_candidates, fit_uncertainty, linear_stats, selection_score
+        )
+        
+        def report(fraction: float, stage: str, model_results: Optional[Dict] = None):
+            if progress is not None:
+                progress(fraction, stage, model_results)
+        
         try:
+            if mode in ('incremental', 'auto'):
+                result = self._train_incremental(report, force=mode == 'incremental')
+                if result is not None:
+                    return result
+                logger.info("Falling back to a full pricing model retrain")
+            
+            report(0.05, 'Preparing training data')
             df = self.prepare_training_data()
             
             if df.empty or len(df) < 10:
                 logger.warning("Insufficient data for training")
-                return {'status': 'insufficient_data'}
+                return {'status': 'insufficient_data', 'message': 'Insufficient data for training'}
             
+            report(0.2, 'Encoding features')
             # Prepare features and target
-            feature_columns = [
-                'service_id', 'service_difficulty', 'area_id', 'base_price',
-                'order_volume', 'fabric_cost', 'complexity_score', 'success_rate',
-                'created_month', 'price_ratio', 'is_peak_season', 'is_high_difficulty'
-            ]
-            
-            X = df[feature_columns].copy()
+            X = self._encode_training_features(df[TRAINING_FEATURE_COLUMNS].copy(), fit=True)
             y = df['final_price']
-            
-            # Encode categorical variables
-            categorical_columns = ['service_difficulty']
-            for col in categorical_columns:
-                if col in X.columns:
-                    le = LabelEncoder()
-                    X[col] = le.fit_transform(X[col].astype(str))
-                    self.label_encoders[col] = le
+            self.feature_columns = TRAINING_FEATURE_COLUMNS
             
             # Split data
             X_train, X_test, y_train, y_test = train_test_split(
@@ -114,43 +138,53 @@ class PricingMLService:
             X_test_scaled = scaler.transform(X_test)
             self.scalers['pricing'] = scaler
             
-            # Train multiple models
-            models = {
-                'random_forest': RandomForestRegressor(n_estimators=100, random_state=42),
-                'gradient_boosting': GradientBoostingRegressor(random_state=42),
-                'ridge': Ridge(alpha=1.0),
-                'linear': LinearRegression()
-            }
-            
+            # Train the candidate models in parallel processes
             results = {}
-            for name, model in models.items():
-                model.fit(X_train_scaled, y_train)
-                y_pred = model.predict(X_test_scaled)
-                
-                mae = mean_absolute_error(y_test, y_pred)
-                mse = mean_squared_error(y_test, y_pred)
-                r2 = r2_score(y_test, y_pred)
-                
-                results[name] = {
-                    'mae': mae,
-                    'mse': mse,
-                    'r2': r2,
-                    'model': model
-                }
+            fitted = {}
+            report(0.25, 'Training candidate models', results)
+            for name, model, metrics in fit_candidates(
+                X_train, X_train_scaled, y_train, X_test_scaled, y_test,
+                cores=getattr(settings, 'AI_PRICING_TRAINING_CORES', 1),
+                cv_folds=getattr(settings, 'AI_PRICING_TRAINING_CV_FOLDS', 5)
+            ):
+                results[name] = metrics
+                fitted[name] = model
+                report(0.25 + 0.6 * len(results) / len(CANDIDATE_MODELS), f'Trained {name}', results)
                 
-                logger.info(f"{name} - MAE: {mae:.2f}, R2: {r2:.2f}")
+                logger.info(f"{name} - MAE: {metrics['mae']:.2f}, R2: {metrics['r2']:.2f}")
             
-            # Select best model based on R2 score
-            best_model_name = max(results.keys(), key=lambda k: results[k]['r2'])
-            best_model = results[best_model_name]['model']
+            # Select best model on cross-validated R2 (holdout R2 without CV)
+            best_model_name = max(results.keys(), key=lambda k: selection_score(results[k]))
+            best_model = fitted[best_model_name]
             
             self.models['pricing'] = best_model
+            self.feature_encoder = None
+            self.training_metrics = {
+                'best_model': best_model_name,
+                **results[best_model_name],
+                'training_rows': len(df),
+            }
+            self.training_state = {
+                'mode': 'full',
+                'high_water_id': df.attrs['high_water_id'],
+                'rows_seen': len(y_train),
+                'rows_at_full_train': len(y_train),
+                'full_trained_at': timezone.now().isoformat(),
+                'base_estimators': getattr(best_model, 'n_estimators', None),
+                'linear_stats': linear_stats(X_train_scaled, y_train),
+            }
+            # Calibrate the per-quote error estimate on rows the model has not seen
+            self.uncertainty = fit_uncertainty(best_model_name, best_model, X_test_scaled, y_test)
             
             # Save model
-            self.save_model()
+            report(0.9, 'Saving model bundle', results)
+            if self.save_model() is None:
+                return {'status': 'error', 'message': 'Could not save the trained model'}
             
             return {
                 'status': 'success',
+                'mode': 'full',
+                'bundle_id': self.bundle_id,
                 'best_model': best_model_name,
                 'metrics': results[best_model_name],
                 'all_results': results
@@ -160,91 +194,257 @@ class PricingMLService:
             logger.error(f"Error training pricing model: {str(e)}")
             return {'status': 'error', 'message': str(e)}
     
+    def _train_incremental(self, report: Callable, force: bool = False) -> Optional[Dict]:
+        """Update the current model with new history rows; None when a full retrain is needed"""
+        from sklearn.metrics import mean_absolute_error
+        from sklearn.model_selection import train_test_split
+        from .model_fitting import CANDIDATE_MODELS, fit_uncertainty, update_candidate
+        from .training_data import extract_training_frame
+        
+        bundle_id = artifact_store.current()
+        if bundle_id is None:
+            return None
+        
+        # A private, writable copy: the registry's bundle is memory-mapped read-only
+        manifest, model, scalers, label_encoders = artifact_store.load(bundle_id, mmap_mode=None)
+        state = manifest.get('training_state') or {}
+        best_model_name = manifest.get('metrics', {}).get('best_model')
+        
+        if not state or best_model_name not in CANDIDATE_MODELS or 'pricing' not in scalers:
+            return None
+        if not force and self._full_retrain_due(state):
+            return None
+        
+        report(0.1, 'Loading new pricing history')
+        df = extract_training_frame(PricingHistory.objects.filter(id__gt=state['high_water_id']))
+        if df.empty:
+            return {
+                'status': 'no_new_data',
+                'message': 'No new pricing history since the current model',
+                'bundle_id': bundle_id,
+                'best_model': best_model_name
+            }
+        
+        self.label_encoders = label_encoders
+        try:
+            X = self._encode_training_features(df[TRAINING_FEATURE_COLUMNS].copy(), fit=False)
+        except ValueError:
+            # A category the encoders have never seen needs new encoders
+            return None
+        X_scaled = scalers['pricing'].transform(X)
+        y = df['final_price'].to_numpy()
+        
+        # Score the current model on rows it has not seen before learning from them
+        previous_mae = float(mean_absolute_error(y, model.predict(X_scaled)))
+        
+        # Hold some new rows back so the error estimate is recalibrated on
+        # data the updated model has not seen
+        calibrate = len(y) * INCREMENTAL_HOLDOUT >= MIN_CALIBRATION_ROWS
+        if calibrate:
+            X_update, X_holdout, y_update, y_holdout = train_test_split(
+                X_scaled, y, test_size=INCREMENTAL_HOLDOUT, random_state=42
+            )
+        else:
+            X_update, y_update = X_scaled, y
+        
+        report(0.4, f'Updating {best_model_name}')
+        model, state = update_candidate(best_model_name, model, X_update, y_update, state)
+        updated_mae = float(mean_absolute_error(y, model.predict(X_scaled)))
+        
+        self.models['pricing'] = model
+        self.scalers = scalers
+        self.feature_encoder = None
+        self.feature_columns = manifest.get('feature_schema', {}).get('feature_columns') or TRAINING_FEATURE_COLUMNS
+        self.training_metrics = {
+            **manifest.get('metrics', {}),
+            'incremental_rows': len(df),
+            'new_rows_mae_before': previous_mae,
+            'new_rows_mae_after': updated_mae,
+        }
+        self.training_state = {
+            **state,
+            'mode': 'incremental',
+            'high_water_id': df.attrs['high_water_id'],
+            'parent_bundle': bundle_id,
+        }
+        if calibrate:
+            self.uncertainty = fit_uncertainty(best_model_name, model, X_holdout, y_holdout)
+            self.training_metrics['holdout_mae'] = float(mean_absolute_error(y_holdout, model.predict(X_holdout)))
+        else:
+            logger.info(f"Only {len(y)} new rows; keeping the error calibration of {bundle_id}")
+            self.uncertainty = manifest.get('uncertainty') or {}
+        
+        report(0.9, 'Saving model bundle')
+        if self.save_model() is None:
+            return {'status': 'error', 'message': 'Could not save the trained model'}
+        
+        results = {
+            best_model_name: {
+                'incremental_rows': len(df),
+                'new_rows_mae_before': previous_mae,
+                'new_rows_mae_after': updated_mae,
+            }
+        }
+        return {
+            'status': 'success',
+            'mode': 'incremental',
+            'bundle_id': self.bundle_id,
+            'best_model': best_model_name,
+            'metrics': results[best_model_name],
+            'all_results': results
+        }
+    
+    def _full_retrain_due(self, state: Dict) -> bool:
+        full_trained_at = datetime.fromisoformat(state['full_trained_at'])
+        max_age = timedelta(days=getattr(settings, 'AI_PRICING_FULL_RETRAIN_DAYS', 7))
+        if timezone.now() - full_trained_at > max_age:
+            return True
+        # Once the data has doubled, incremental updates have drifted far enough
+        return state['rows_seen'] >= 2 * state['rows_at_full_train']
+    
+    def _encode_training_features(self, X: 'pd.DataFrame', fit: bool) -> 'pd.DataFrame':
+        """Label-encode categorical feature columns, fitting new encoders if ``fit``"""
+        from sklearn.preprocessing import LabelEncoder
+        
+        for col in TRAINING_CATEGORICAL_COLUMNS:
+            if fit:
+                self.label_encoders[col] = LabelEncoder()
+                X[col] = self.label_encoders[col].fit_transform(X[col].astype(str))
+            else:
+                X[col] = self.label_encoders[col].transform(X[col].astype(str))
+        return X
+    
     def predict_price(self, service_id: int, area_id: int, 
-                     additional_features: Dict = None) -> Dict:
+                     additional_features: Dict = None,
+                     request_context: Optional[PricingRequestContext] = None) -> Dict:
         """Predict optimal price for a service"""
+        return self.predict_prices([(service_id, area_id, additional_features)], request_context)[0]
+    
+    def predict_prices(self, requests: List[Tuple[int, int, Optional[Dict]]],
+                       request_context: Optional[PricingRequestContext] = None) -> List[Dict]:
+        """Predict optimal prices for many (service, area, features) tuples in one inference pass"""
         try:
-            if 'pricing' not in self.models:
-                # Try to load existing model
-                if not self.load_model():
-                    return {'status': 'no_model', 'message': 'No trained model available'}
-            
-            service = Service.objects.get(id=service_id)
-            area = PricingArea.objects.get(id=area_id)
-            
-            # Get base pricing
-            try:
-                base_pricing = ServicePricing.objects.get(service=service, area=area)
-                base_price = float(base_pricing.base_price)
-            except ServicePricing.DoesNotExist:
-                base_price = 1000.0  # Default base price
-            
-            # Prepare features
-            features = {
-                'service_id': service_id,
-                'service_difficulty': service.difficulty_level,
-                'area_id': area_id,
-                'base_price': base_price,
-                'order_volume': 1,
-                'fabric_cost': 0,
-                'complexity_score': self._calculate_complexity_score(service),
-                'success_rate': 0.8,
-                'created_month': timezone.now().month,
-                'price_ratio': 1.0,
-                'is_peak_season': self._is_peak_season(),
-                'is_high_difficulty': service.difficulty_level in ['advanced', 'expert'],
-                # New parameters with defaults
-                'fabric_type': 'cotton',
-                'garment_length': 'medium',
-                'design_complexity': 'simple',
-                'lining_required': 'none',
-                'handwork_embroidery': 'none',
-                'trims_accessories': 'minimal',
-                'fit_adjustments': 'none',
-                'urgency_level': 'normal',
-                'special_requirements': False
-            }
-            
-            # Add additional features if provided (this will override defaults)
-            if additional_features:
-                features.update(additional_features)
-            
-            # Convert to DataFrame
-            feature_df = pd.DataFrame([features])
-            
-            # Encode categorical variables
-            for col, encoder in self.label_encoders.items():
-                if col in feature_df.columns:
-                    feature_df[col] = encoder.transform(feature_df[col].astype(str))
+            # Pick up the warm model from the process-wide registry
+            if not self.load_model() and 'pricing' not in self.models:
+                return [
+                    {'status': 'no_model', 'message': 'No trained model available'}
+                    for _ in requests
+                ]
+            
+            if request_context is None:
+                request_context = PricingRequestContext.load(
+                    (service_id, area_id) for service_id, area_id, _ in requests
+                )
             
-            # Scale features
-            if 'pricing' in self.scalers:
-                scaled_features = self.scalers['pricing'].transform(feature_df)
+            results = [None] * len(requests)
+            rows = []
+            for index, (service_id, area_id, additional_features) in enumerate(requests):
+                service = request_context.get_service(service_id)
+                area = request_context.get_area(area_id)
+                
+                if service is None or area is None:
+                    results[index] = {
+                        'status': 'error',
+                        'message': 'Service or area not found'
+                    }
+                    continue
+                
+                base_price = request_context.get_base_price(service.id, area.id)
+                if base_price is None:
+                    base_price = 1000.0  # Default base price
+                features = self._prepare_features(service, area, base_price, additional_features)
+                rows.append((index, service, area, base_price, features))
+            
+            if not rows:
+                return results
+            
+            # Encode and scale the whole batch into one matrix with the model's own schema
+            scaled_features = self._get_feature_encoder().encode_many([row[4] for row in rows])
+            
+            # Make predictions, with expected errors when the model exports an estimate
+            model = self.models['pricing']
+            if hasattr(model, 'predict_with_error'):
+                predicted_prices, expected_errors = model.predict_with_error(scaled_features)
             else:
-                scaled_features = feature_df.values
-            
-            # Make prediction
-            predicted_price = self.models['pricing'].predict(scaled_features)[0]
+                predicted_prices, expected_errors = model.predict(scaled_features), None
+            confidences = (
+                confidence_scores(predicted_prices, expected_errors)
+                if expected_errors is not None else None
+            )
             
-            # Apply business rules
-            final_price = self._apply_pricing_rules(service, area, predicted_price, features)
+            rule_set = get_rule_set()
             
-            # Calculate confidence score
-            confidence = self._calculate_confidence_score(features)
+            for position, ((index, service, area, base_price, features), predicted_price) in enumerate(
+                zip(rows, predicted_prices)
+            ):
+                # Apply business rules
+                final_price = self._apply_pricing_rules(
+                    service, area, predicted_price, features, rule_set
+                )
+                
+                # Calculate confidence score
+                if confidences is not None:
+                    confidence = round(float(confidences[position]), 3)
+                else:
+                    confidence = self._calculate_confidence_score(features)
+                
+                results[index] = {
+                    'status': 'success',
+                    'predicted_price': round(predicted_price, 2),
+                    'final_price': round(final_price, 2),
+                    'base_price': base_price,
+                    'confidence_score': confidence,
+                    'price_multiplier': round(final_price / base_price, 2),
+                    'factors_applied': self._get_applied_factors(features)
+                }
             
-            return {
-                'status': 'success',
-                'predicted_price': round(predicted_price, 2),
-                'final_price': round(final_price, 2),
-                'base_price': base_price,
-                'confidence_score': confidence,
-                'price_multiplier': round(final_price / base_price, 2),
-                'factors_applied': self._get_applied_factors(features)
-            }
+            return results
             
         except Exception as e:
             logger.error(f"Error predicting price: {str(e)}")
-            return {'status': 'error', 'message': str(e)}
+            return [{'status': 'error', 'message': str(e)} for _ in requests]
+    
+    def _get_feature_encoder(self) -> FeatureEncoder:
+        """The registry bundle's encoder, or one compiled from the models held here"""
+        if self.feature_encoder is None:
+            self.feature_encoder = FeatureSchema.from_dict(feature_schema_for(
+                self.models['pricing'], self.scalers, self.label_encoders, self.feature_columns or None
+            )).compile()
+        return self.feature_encoder
+    
+    def _prepare_features(self, service: Service, area: PricingArea, base_price: float,
+                          additional_features: Optional[Dict] = None) -> Dict:
+        """Prepare the model feature dict for a single quote"""
+        features = {
+            'service_id': service.id,
+            'service_difficulty': service.difficulty_level,
+            'area_id': area.id,
+            'base_price': base_price,
+            'order_volume': 1,
+            'fabric_cost': 0,
+            'complexity_score': self._calculate_complexity_score(service),
+            'success_rate': 0.8,
+            'created_month': timezone.now().month,
+            'price_ratio': 1.0,
+            'is_peak_season': self._is_peak_season(),
+            'is_high_difficulty': service.difficulty_level in ['advanced', 'expert'],
+            # New parameters with defaults
+            'fabric_type': 'cotton',
+            'garment_length': 'medium',
+            'design_complexity': 'simple',
+            'lining_required': 'none',
+            'handwork_embroidery': 'none',
+            'trims_accessories': 'minimal',
+            'fit_adjustments': 'none',
+            'urgency_level': 'normal',
+            'special_requirements': False
+        }
+        
+        # Add additional features if provided (this will override defaults)
+        if additional_features:
+            features.update(additional_features)
+        
+        return features
     
     def _calculate_complexity_score(self, service: Service) -> float:
         """Calculate complexity score for a service"""
@@ -274,16 +474,14 @@ class PricingMLService:
         return current_month in peak_months
     
     def _apply_pricing_rules(self, service: Service, area: PricingArea, 
-                           predicted_price: float, features: Dict) -> float:
+                           predicted_price: float, features: Dict,
+                           rule_set: Optional[CompiledRuleSet] = None) -> float:
         """Apply business rules to predicted price"""
         try:
-            rules = PricingRule.objects.filter(is_active=True).order_by('-priority')
-            
-            final_price = predicted_price
+            if rule_set is None:
+                rule_set = get_rule_set()
             
-            for rule in rules:
-                if self._evaluate_rule_condition(rule.condition, features):
-                    final_price = self._apply_rule_action(rule.action, final_price)
+            final_price = rule_set.apply(predicted_price, features)
             
             # Ensure price is within reasonable bounds
             min_price = predicted_price * 0.7  # Minimum 70% of predicted
@@ -297,55 +495,8 @@ class PricingMLService:
             logger.error(f"Error applying pricing rules: {str(e)}")
             return predicted_price
     
-    def _evaluate_rule_condition(self, condition: Dict, features: Dict) -> bool:
-        """Evaluate if a rule condition is met"""
-        try:
-            # Simple condition evaluation (can be extended)
-            field = condition.get('field')
-            operator = condition.get('operator')
-            value = condition.get('value')
-            
-            if field not in features:
-                return False
-            
-            feature_value = features[field]
-            
-            if operator == 'equals':
-                return feature_value == value
-            elif operator == 'greater_than':
-                return feature_value > value
-            elif operator == 'less_than':
-                return feature_value < value
-            elif operator == 'in':
-                return feature_value in value
-            
-            return False
-            
-        except Exception as e:
-            logger.error(f"Error evaluating rule condition: {str(e)}")
-            return False
-    
-    def _apply_rule_action(self, action: Dict, current_price: float) -> float:
-        """Apply rule action to current price"""
-        try:
-            action_type = action.get('type')
-            value = action.get('value', 0)
-            
-            if action_type == 'multiply':
-                return current_price * value
-            elif action_type == 'add':
-                return current_price + value
-            elif action_type == 'percentage':
-                return current_price * (1 + value / 100)
-            
-            return current_price
-            
-        except Exception as e:
-            logger.error(f"Error applying rule action: {str(e)}")
-            return current_price
-    
     def _calculate_confidence_score(self, features: Dict) -> float:
-        """Calculate confidence score for the prediction"""
+        """Heuristic confidence for models without a calibrated error estimate"""
         try:
             # Simple confidence calculation based on data availability
             confidence = 0.5  # Base confidence
@@ -383,53 +534,50 @@ class PricingMLService:
         
         return factors
     
-    def save_model(self):
-        """Save trained models to disk"""
+    def save_model(self, promote: bool = True) -> Optional[str]:
+        """Save the trained model as a new artifact bundle and optionally make it current"""
         try:
-            model_dir = os.path.join(os.path.dirname(__file__), 'models')
-            os.makedirs(model_dir, exist_ok=True)
-            
-            for name, model in self.models.items():
-                model_path = os.path.join(model_dir, f'{name}_{self.model_version}.joblib')
-                joblib.dump(model, model_path)
-            
-            # Save scalers and encoders
-            scaler_path = os.path.join(model_dir, f'scalers_{self.model_version}.joblib')
-            joblib.dump(self.scalers, scaler_path)
+            bundle_id = artifact_store.write_bundle(
+                self.model_version,
+                self.models['pricing'],
+                self.scalers,
+                self.label_encoders,
+                feature_schema=feature_schema_for(
+                    self.models['pricing'], self.scalers, self.label_encoders,
+                    self.feature_columns or None
+                ),
+                metrics=self.training_metrics,
+                training_state=self.training_state,
+                uncertainty=self.uncertainty
+            )
             
-            encoder_path = os.path.join(model_dir, f'encoders_{self.model_version}.joblib')
-            joblib.dump(self.label_encoders, encoder_path)
+            if promote:
+                artifact_store.promote(bundle_id)
+                # Let this worker pick up the new bundle immediately
+                model_registry.invalidate()
             
-            logger.info("Models saved successfully")
+            self.bundle_id = bundle_id
+            logger.info(f"Models saved successfully as bundle {bundle_id}")
+            return bundle_id
             
         except Exception as e:
             logger.error(f"Error saving models: {str(e)}")
+            return None
     
     def load_model(self) -> bool:
-        """Load trained models from disk"""
+        """Load trained models from the process-wide model registry"""
         try:
-            model_dir = os.path.join(os.path.dirname(__file__), 'models')
+            bundle = model_registry.get()
             
-            if not os.path.exists(model_dir):
+            if bundle is None:
                 return False
             
-            # Load models
-            for filename in os.listdir(model_dir):
-                if filename.startswith('pricing_') and filename.endswith('.joblib'):
-                    model_path = os.path.join(model_dir, filename)
-                    self.models['pricing'] = joblib.load(model_path)
-                    break
-            
-            # Load scalers and encoders
-            scaler_path = os.path.join(model_dir, f'scalers_{self.model_version}.joblib')
-            if os.path.exists(scaler_path):
-                self.scalers = joblib.load(scaler_path)
+            self.models['pricing'] = bundle.model
+            self.scalers = bundle.scalers
+            self.label_encoders = bundle.label_encoders
+            self.feature_encoder = bundle.encoder
+            self.bundle_id = bundle.version
             
-            encoder_path = os.path.join(model_dir, f'encoders_{self.model_version}.joblib')
-            if os.path.exists(encoder_path):
-                self.label_encoders = joblib.load(encoder_path)
-            
-            logger.info("Models loaded successfully")
             return True
             
         except Exception as e:
@@ -440,42 +588,124 @@ class PricingMLService:
 class PricingOptimizationService:
     """Service for optimizing pricing strategies"""
     
-    def __init__(self):
-        self.ml_service = PricingMLService()
+    def __init__(self, ml_service: Optional[PricingMLService] = None):
+        self.ml_service = ml_service or PricingMLService()
     
-    def optimize_pricing_for_service(self, service_id: int) -> Dict:
+    def optimize_pricing_for_service(self, service_id: int,
+                                     request_context: Optional[PricingRequestContext] = None) -> Dict:
         """Optimize pricing for a specific service across all areas"""
+        result = self.optimize_pricing_for_services([service_id], request_context)
+        if result['status'] != 'success':
+            return result
+        
+        optimized = result['services'].get(int(service_id))
+        if optimized is None:
+            return {'status': 'error', 'message': f"Service {service_id} not found"}
+        return optimized
+    
+    def optimize_pricing_for_services(self, service_ids: Optional[List[int]] = None,
+                                      request_context: Optional[PricingRequestContext] = None) -> Dict:
+        """Optimize pricing for many services (the whole active catalogue by default) in one pass
+        
+        Areas, services, current prices, order counts and price history are
+        each loaded with one query and every (service, area) pair is predicted
+        in one batch, so the cost does not grow with the number of services or
+        areas. ``elasticity_price`` is the revenue-maximizing price under the
+        estimated elasticity. It becomes ``optimized_price`` only when the
+        estimate rests mostly on the pair's own history; otherwise the model's
+        quote (``predicted_price``) is kept and ``elasticity_price`` is advisory.
+        Returns ``{'status', 'services': {service_id: result}}`` where each
+        result has the shape of ``optimize_pricing_for_service``.
+        """
         try:
-            service = Service.objects.get(id=service_id)
-            areas = PricingArea.objects.filter(is_active=True)
+            areas = list(PricingArea.objects.filter(is_active=True))
+            if service_ids is None:
+                service_ids = list(Service.objects.filter(is_active=True).values_list('id', flat=True))
+            service_ids = [int(service_id) for service_id in service_ids]
+            
+            if request_context is None:
+                request_context = PricingRequestContext.load(
+                    (service_id, area.id) for service_id in service_ids for area in areas
+                )
             
-            optimized_prices = {}
+            services = [request_context.get_service(service_id) for service_id in service_ids]
+            services = [service for service in services if service is not None]
+            pairs = [(service, area) for service in services for area in areas]
             
-            for area in areas:
-                prediction = self.ml_service.predict_price(service_id, area.id)
-                
-                if prediction['status'] == 'success':
-                    optimized_prices[area.name] = {
-                        'area_id': area.id,
-                        'current_price': self._get_current_price(service, area),
-                        'optimized_price': prediction['final_price'],
-                        'confidence': prediction['confidence_score'],
-                        'potential_revenue': self._calculate_revenue_impact(
-                            service, area, prediction['final_price']
-                        )
-                    }
+            predictions = self.ml_service.predict_prices(
+                [(service.id, area.id, None) for service, area in pairs], request_context
+            ) if pairs else []
+            order_counts = self._get_order_counts(
+                [service.id for service in services], [area.name for area in areas]
+            )
             
-            return {
-                'status': 'success',
-                'service': service.name,
-                'optimized_prices': optimized_prices,
-                'recommendations': self._generate_recommendations(optimized_prices)
+            optimized = {
+                service.id: {'status': 'success', 'service': service.name, 'optimized_prices': {}}
+                for service in services
             }
+            predicted = [
+                (service, area, prediction) for (service, area), prediction in zip(pairs, predictions)
+                if prediction['status'] == 'success'
+            ]
+            elasticities, history_weights = estimate_elasticities(
+                (service.id, area.id) for service, area, _ in predicted
+            )
+            
+            # Prices move relative to the current price; pairs without one use the model's price
+            current_prices = [request_context.get_current_price(service.id, area.id) for service, area, _ in predicted]
+            reference_prices = [
+                current_price if current_price > 0 else float(prediction['final_price'])
+                for current_price, (_, _, prediction) in zip(current_prices, predicted)
+            ]
+            pair_elasticities = [elasticities[(service.id, area.id)] for service, area, _ in predicted]
+            best_prices, bounded = revenue_maximizing_prices(reference_prices, pair_elasticities)
+            
+            for (service, area, prediction), current_price, elasticity, best_price, at_bound in zip(
+                    predicted, current_prices, pair_elasticities, best_prices, bounded):
+                history_weight = history_weights[(service.id, area.id)]
+                # An elasticity that is mostly the prior says nothing about this pair
+                from_history = history_weight >= MIN_HISTORY_WEIGHT
+                optimized_price = float(best_price) if from_history else float(prediction['final_price'])
+                optimized[service.id]['optimized_prices'][area.name] = {
+                    'area_id': area.id,
+                    'current_price': current_price,
+                    'predicted_price': float(prediction['final_price']),
+                    'optimized_price': optimized_price,
+                    'elasticity_price': float(best_price),
+                    # The band edge limited the move; demand alone would go further
+                    'at_price_bound': bool(at_bound),
+                    'elasticity': round(elasticity, 3),
+                    'elasticity_source': 'history' if from_history else 'prior',
+                    'history_weight': round(history_weight, 3),
+                    'confidence': prediction['confidence_score'],
+                    'potential_revenue': self._calculate_revenue_impact(
+                        service, area, optimized_price, current_price,
+                        orders=order_counts.get((service.id, area.name), 0),
+                        elasticity=elasticity
+                    )
+                }
+            
+            for result in optimized.values():
+                result['recommendations'] = self._generate_recommendations(result['optimized_prices'])
+            
+            return {'status': 'success', 'services': optimized}
             
         except Exception as e:
             logger.error(f"Error optimizing pricing: {str(e)}")
             return {'status': 'error', 'message': str(e)}
     
+    def _get_order_counts(self, service_ids: List[int], area_names: List[str]) -> Dict[Tuple[int, str], int]:
+        """Order item counts per (service id, customer area name), in one grouped query"""
+        if not service_ids or not area_names:
+            return {}
+        
+        rows = OrderItem.objects.filter(
+            service_id__in=service_ids,
+            order__customer__area__in=area_names
+        ).values('service_id', 'order__customer__area').annotate(orders=Count('id')).order_by()
+        
+        return {(row['service_id'], row['order__customer__area']): row['orders'] for row in rows}
+    
     def _get_current_price(self, service: Service, area: PricingArea) -> float:
         """Get current price for service in area"""
         try:
@@ -485,23 +715,24 @@ class PricingOptimizationService:
             return 0.0
     
     def _calculate_revenue_impact(self, service: Service, area: PricingArea, 
-                                new_price: float) -> Dict:
+                                new_price: float, current_price: Optional[float] = None,
+                                orders: Optional[int] = None,
+                                elasticity: float = DEFAULT_ELASTICITY) -> Dict:
         """Calculate potential revenue impact of price change"""
         try:
-            # Get historical order data
-            orders = OrderItem.objects.filter(
-                service=service,
-                order__customer__area=area.name
-            ).count()
-            
-            current_price = self._get_current_price(service, area)
+            # Get historical order data unless the caller counted it in bulk
+            if orders is None:
+                orders = OrderItem.objects.filter(
+                    service=service,
+                    order__customer__area=area.name
+                ).count()
+            
+            if current_price is None:
+                current_price = self._get_current_price(service, area)
             price_change = (new_price - current_price) / current_price if current_price > 0 else 0
             
-            # Estimate demand elasticity (simplified)
-            elasticity = -0.5  # Assume -0.5 price elasticity
-            demand_change = elasticity * price_change
-            
-            new_orders = max(0, orders * (1 + demand_change))
+            # Linear demand response to the price change, as in the price optimization
+            new_orders = linear_demand(orders, 1 + price_change, elasticity)
             revenue_change = (new_orders * new_price) - (orders * current_price)
             
             return {
@@ -521,15 +752,19 @@ class PricingOptimizationService:
         
         for area_name, data in optimized_prices.items():
             price_change = data['potential_revenue']['price_change_percent']
+            # A price on the band edge only says which way to move, not how far
+            bound_note = " (limit of the tested range)" if (
+                data.get('at_price_bound') and data.get('elasticity_source') == 'history'
+            ) else ""
             
             if price_change > 10:
                 recommendations.append(
-                    f"Consider increasing {area_name} prices by {price_change:.1f}% - "
+                    f"Consider increasing {area_name} prices by {price_change:.1f}%{bound_note} - "
                     f"high revenue potential"
                 )
             elif price_change < -10:
                 recommendations.append(
-                    f"Consider decreasing {area_name} prices by {abs(price_change):.1f}% - "
+                    f"Consider decreasing {area_name} prices by {abs(price_change):.1f}%{bound_note} - "
                     f"may increase demand"
                 )
         
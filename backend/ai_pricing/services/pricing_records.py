@@ -0,0 +1,122 @@
+import atexit
+import logging
+import threading
+import uuid
+from typing import Dict, Tuple
+
+from django.conf import settings
+from django.db import connections
+
+from ..models import DynamicPricing
+
+logger = logging.getLogger(__name__)
+
+# Columns an upsert overwrites; record_id also fills rows written without one
+RECORD_FIELDS = ['base_price', 'calculated_price', 'confidence_score', 'factors_applied', 'is_active', 'record_id']
+# Namespace of the record ids derived from each record's unique key
+RECORD_ID_NAMESPACE = uuid.UUID('6f1c2e0a-4b7d-5e8f-9a3c-1d2e3f4a5b6c')
+
+
+def record_id(service_id: int, area_id: int, pricing_version: str) -> uuid.UUID:
+    """Id of the ``DynamicPricing`` row for a key, known before the row is written"""
+    return uuid.uuid5(RECORD_ID_NAMESPACE, f"{int(service_id)}:{int(area_id)}:{pricing_version}")
+
+
+class PricingRecordBuffer:
+    """Write-behind buffer for ``DynamicPricing`` quote records.
+
+    Quotes only need the latest record per (service, area, pricing_version),
+    so pending records are coalesced per key in memory and upserted with a
+    single bulk statement ``flush_interval`` seconds after the first pending
+    record. Once ``max_pending`` keys are waiting the flush is started right
+    away, still on the timer thread, so a quote never waits for the write.
+    Whatever is pending at interpreter exit is flushed by ``atexit``.
+    """
+
+    def __init__(self, flush_interval: float = 5.0, max_pending: int = 200):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Dict[Tuple[int, int, str], Dict] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+        self._flush_now = False
+
+    def add(self, service_id: int, area_id: int, pricing_version: str,
+            base_price: float, calculated_price: float,
+            confidence_score: float, factors_applied: Dict) -> uuid.UUID:
+        """Queue a quote record, replacing any pending one for the same key; returns its record id"""
+        with self._lock:
+            self._pending[(service_id, area_id, pricing_version)] = {
+                'base_price': round(base_price, 2),
+                'calculated_price': round(calculated_price, 2),
+                'confidence_score': confidence_score,
+                'factors_applied': factors_applied,
+                'is_active': True,
+            }
+            if len(self._pending) >= self.max_pending and not self._flush_now:
+                self._schedule(0)
+            elif self._timer is None:
+                self._schedule(self.flush_interval)
+        return record_id(service_id, area_id, pricing_version)
+
+    def _schedule(self, delay: float) -> None:
+        """Replace the pending timer with one that flushes after ``delay`` seconds"""
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self._flush_from_timer)
+        self._timer.daemon = True
+        self._flush_now = delay == 0
+        self._timer.start()
+
+    def flush(self) -> int:
+        """Write all pending records in one bulk upsert; returns the number written"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                self._flush_now = False
+
+            if not pending:
+                return 0
+
+            records = [
+                DynamicPricing(
+                    service_id=service_id,
+                    area_id=area_id,
+                    pricing_version=pricing_version,
+                    record_id=record_id(service_id, area_id, pricing_version),
+                    **values
+                )
+                for (service_id, area_id, pricing_version), values in pending.items()
+            ]
+
+            try:
+                DynamicPricing.objects.bulk_create(
+                    records,
+                    update_conflicts=True,
+                    unique_fields=['service', 'area', 'pricing_version'],
+                    update_fields=RECORD_FIELDS,
+                )
+            except Exception as e:
+                logger.error(f"Error flushing {len(records)} pricing records: {str(e)}")
+                return 0
+
+            return len(records)
+
+    def _flush_from_timer(self) -> None:
+        try:
+            self.flush()
+        finally:
+            # The timer thread opened its own DB connection
+            connections.close_all()
+
+
+pricing_record_buffer = PricingRecordBuffer(
+    flush_interval=getattr(settings, 'AI_PRICING_RECORD_FLUSH_INTERVAL', 5.0),
+    max_pending=getattr(settings, 'AI_PRICING_RECORD_BATCH_SIZE', 200),
+)
+
+atexit.register(pricing_record_buffer.flush)
@@ -0,0 +1,159 @@
+"""Cache of computed quotes, keyed by the prepared pricing context.
+
+A quote is fully determined by its prepared pricing context, base price and
+customer discount, given the model, the active rules and the month. The
+cache key is built from::
+
+    ai_pricing:quote:<model version>:<rules version>:<pricing generation>:<YYYY-MM>:<tier>:<sha1>
+
+where the sha1 covers the canonical JSON of the context. The rules version
+is the compiled rule set's version stamp. The pricing generation is
+replaced by the signals whenever a ``ServicePricing``, ``Service`` or
+``PricingArea`` changes, or a ``PricingRule`` does. A new model bundle
+changes the model version. Stale entries are never read again; they simply
+expire.
+
+Lookups go to an in-process LRU first (L1), then to the Django cache (L2,
+Redis in production), so identical quotes skip model inference and the
+rules across every worker. L1 keeps quotes pickled, like L2, so every hit
+is a private copy that callers may modify. Workers re-read the generation
+at most every ``GENERATION_CHECK_INTERVAL`` seconds.
+"""
+import hashlib
+import json
+import logging
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+GENERATION_CACHE_KEY = 'ai_pricing:quote_generation'
+KEY_PREFIX = 'ai_pricing:quote'
+
+DEFAULT_TTL = 900  # seconds
+DEFAULT_L1_SIZE = 2048
+
+# How often a worker re-reads the generation for changes made elsewhere
+GENERATION_CHECK_INTERVAL = 5.0
+
+
+def should_cache_quote(quote: Dict, model_version: str) -> bool:
+    """Successful quotes, except model prices below the cache confidence threshold"""
+    if quote.get('status') != 'success':
+        return False
+    if model_version == 'rules':
+        # Rule-only prices are deterministic
+        return True
+    return quote['confidence_score'] >= getattr(settings, 'AI_PRICING_CACHE_MIN_CONFIDENCE', 0.7)
+
+
+_generation = None
+_generation_checked_at = 0.0
+
+
+def current_generation() -> str:
+    global _generation, _generation_checked_at
+
+    if _generation is not None and time.monotonic() - _generation_checked_at < GENERATION_CHECK_INTERVAL:
+        return _generation
+    _generation = cache.get_or_set(GENERATION_CACHE_KEY, lambda: uuid.uuid4().hex, timeout=None)
+    _generation_checked_at = time.monotonic()
+    return _generation
+
+
+class QuoteCache:
+    """Two-level quote cache: an in-process LRU in front of the Django cache"""
+
+    def __init__(self, ttl: Optional[int] = None, l1_size: Optional[int] = None):
+        self.ttl = ttl if ttl is not None else getattr(settings, 'AI_PRICING_QUOTE_CACHE_TTL', DEFAULT_TTL)
+        self.l1_size = l1_size if l1_size is not None else getattr(
+            settings, 'AI_PRICING_QUOTE_CACHE_L1_SIZE', DEFAULT_L1_SIZE
+        )
+        self._l1: 'OrderedDict[str, tuple]' = OrderedDict()  # key -> (expires_at, pickled quote)
+        self._lock = threading.Lock()
+
+    def make_key(self, model_version: str, rules_version: Optional[str], generation: str,
+                 service_id: int, area_id: int, base_price: float, pricing_context: Dict,
+                 discount_percentage: float = 0) -> str:
+        """Cache key for one quote; ``pricing_context`` is the prepared context"""
+        month = f"{pricing_context.get('current_year')}-{pricing_context.get('current_month'):02d}"
+        tier = pricing_context.get('customer_loyalty_tier', 'anonymous')
+        material = json.dumps({
+            'service_id': service_id,
+            'area_id': area_id,
+            'base_price': base_price,
+            'discount_percentage': discount_percentage,
+            'context': pricing_context,
+        }, sort_keys=True, separators=(',', ':'), default=str)
+        digest = hashlib.sha1(material.encode()).hexdigest()
+        return f"{KEY_PREFIX}:{model_version}:{rules_version}:{generation}:{month}:{tier}:{digest}"
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Dict]:
+        """Cached quotes for whichever keys are present (copies, safe to modify)"""
+        keys = list(keys)
+        hits = {}
+        missing = []
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                entry = self._l1.get(key)
+                if entry is not None and entry[0] > now:
+                    self._l1.move_to_end(key)
+                    hits[key] = entry[1]
+                else:
+                    if entry is not None:
+                        del self._l1[key]
+                    missing.append(key)
+        found = {key: pickle.loads(data) for key, data in hits.items()}
+
+        if missing:
+            try:
+                shared = cache.get_many(missing)
+            except Exception as e:
+                logger.error(f"Error reading quote cache: {str(e)}")
+                shared = {}
+            if shared:
+                self._remember(shared)
+                found.update(shared)
+
+        return found
+
+    def set_many(self, quotes: Dict[str, Dict]) -> None:
+        if not quotes:
+            return
+        self._remember(quotes)
+        try:
+            cache.set_many(quotes, timeout=self.ttl)
+        except Exception as e:
+            logger.error(f"Error writing quote cache: {str(e)}")
+
+    def clear_local(self) -> None:
+        with self._lock:
+            self._l1.clear()
+
+    def _remember(self, quotes: Dict[str, Dict]) -> None:
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for key, quote in quotes.items():
+                self._l1[key] = (expires_at, pickle.dumps(quote, pickle.HIGHEST_PROTOCOL))
+                self._l1.move_to_end(key)
+            while len(self._l1) > self.l1_size:
+                self._l1.popitem(last=False)
+
+
+def invalidate_quote_cache() -> None:
+    """Orphan every cached quote in every worker sharing the cache"""
+    global _generation
+    _generation = uuid.uuid4().hex
+    cache.set(GENERATION_CACHE_KEY, _generation, timeout=None)
+    quote_cache.clear_local()
+
+
+quote_cache = QuoteCache()
@@ -0,0 +1,74 @@
+from typing import Dict, Iterable, Optional, Tuple
+
+from services.models import Service, ServicePricing, PricingArea
+from ..models import CustomerPricingProfile
+
+
+class PricingRequestContext:
+    """ORM rows needed to price a set of quotes, loaded once per request.
+
+    The calculator, the ML service and the optimizer all read services,
+    areas, base pricing and customer profiles from here instead of issuing
+    their own lookups, so a request costs a fixed number of queries no
+    matter how many layers touch the same rows.
+    """
+
+    def __init__(self, services: Dict[int, Service], areas: Dict[int, PricingArea],
+                 service_pricing: Dict[Tuple[int, int], ServicePricing],
+                 customer_profiles: Dict[int, CustomerPricingProfile]):
+        self.services = services
+        self.areas = areas
+        self.service_pricing = service_pricing
+        self.customer_profiles = customer_profiles
+
+    @classmethod
+    def load(cls, pairs: Iterable[Tuple[int, int]],
+             customer_ids: Iterable[int] = ()) -> 'PricingRequestContext':
+        """Load everything needed to price the given (service_id, area_id) pairs"""
+        pairs = [(int(service_id), int(area_id)) for service_id, area_id in pairs]
+        service_ids = {service_id for service_id, _ in pairs}
+        area_ids = {area_id for _, area_id in pairs}
+        customer_ids = {int(customer_id) for customer_id in customer_ids if customer_id}
+
+        services = Service.objects.select_related('category').in_bulk(service_ids) if service_ids else {}
+        areas = PricingArea.objects.in_bulk(area_ids) if area_ids else {}
+
+        service_pricing = {}
+        if service_ids and area_ids:
+            service_pricing = {
+                (pricing.service_id, pricing.area_id): pricing
+                for pricing in ServicePricing.objects.filter(
+                    service_id__in=service_ids, area_id__in=area_ids
+                )
+            }
+
+        customer_profiles = {}
+        if customer_ids:
+            customer_profiles = {
+                profile.customer_id: profile
+                for profile in CustomerPricingProfile.objects.filter(
+                    customer_id__in=customer_ids
+                ).select_related('customer').prefetch_related('preferred_services')
+            }
+
+        return cls(services, areas, service_pricing, customer_profiles)
+
+    def get_service(self, service_id) -> Optional[Service]:
+        return self.services.get(int(service_id))
+
+    def get_area(self, area_id) -> Optional[PricingArea]:
+        return self.areas.get(int(area_id))
+
+    def get_base_price(self, service_id, area_id) -> Optional[float]:
+        pricing = self.service_pricing.get((int(service_id), int(area_id)))
+        return float(pricing.base_price) if pricing is not None else None
+
+    def get_current_price(self, service_id, area_id) -> float:
+        pricing = self.service_pricing.get((int(service_id), int(area_id)))
+        return float(pricing.final_price) if pricing is not None else 0.0
+
+    def get_customer_profile(self, customer_id) -> Optional[CustomerPricingProfile]:
+        return self.customer_profiles.get(int(customer_id))
+
+    def add_customer_profile(self, profile: CustomerPricingProfile) -> None:
+        self.customer_profiles[profile.customer_id] = profile
@@ -0,0 +1,241 @@
+"""Compiled evaluator for active ``PricingRule`` rows.
+
+Active rules are compiled once into predicate/action closures and indexed by
+the fields their conditions test, so a quote only evaluates the rules that
+can possibly match it. The compiled set is cached per process and rebuilt
+when a ``PricingRule`` is saved or deleted (see ``ai_pricing.signals``).
+A version stamp kept in the Django cache lets other workers notice the
+change too; they re-read it at most every ``VERSION_CHECK_INTERVAL``
+seconds, so a quote does not pay a cache round trip.
+
+Conditions are either a single comparison::
+
+    {"field": "fabric_type", "operator": "equals", "value": "silk"}
+
+or a compound of nested conditions::
+
+    {"and": [{...}, {"or": [{...}, {...}]}]}
+"""
+import logging
+import threading
+import time
+import uuid
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from django.core.cache import cache
+
+from ..models import PricingRule
+
+logger = logging.getLogger(__name__)
+
+RULES_VERSION_CACHE_KEY = 'ai_pricing:pricing_rules_version'
+
+# How often a worker re-reads the version stamp for changes made elsewhere
+VERSION_CHECK_INTERVAL = 30.0
+
+Predicate = Callable[[Dict], bool]
+Action = Callable[[float], float]
+
+# An index key is ('eq', field, value) for equality tests and ('field', field)
+# for any other test of that field
+IndexKey = Tuple
+
+
+def _compile_comparison(condition: Dict) -> Predicate:
+    field = condition.get('field')
+    operator = condition.get('operator')
+    value = condition.get('value')
+
+    if operator == 'equals':
+        compare = lambda feature_value: feature_value == value
+    elif operator == 'greater_than':
+        compare = lambda feature_value: feature_value > value
+    elif operator == 'less_than':
+        compare = lambda feature_value: feature_value < value
+    elif operator == 'in':
+        compare = lambda feature_value: feature_value in value
+    else:
+        return lambda features: False
+
+    def predicate(features: Dict) -> bool:
+        try:
+            if field not in features:
+                return False
+            return bool(compare(features[field]))
+        except Exception as e:
+            logger.error(f"Error evaluating rule condition: {str(e)}")
+            return False
+
+    return predicate
+
+
+def compile_condition(condition: Dict) -> Predicate:
+    """Compile a (possibly compound) rule condition into a predicate"""
+    if not isinstance(condition, dict):
+        return lambda features: False
+
+    if 'and' in condition:
+        terms = [compile_condition(term) for term in condition['and']]
+        return lambda features: all(term(features) for term in terms)
+
+    if 'or' in condition:
+        terms = [compile_condition(term) for term in condition['or']]
+        return lambda features: any(term(features) for term in terms)
+
+    return _compile_comparison(condition)
+
+
+def compile_action(action: Dict) -> Action:
+    """Compile a rule action into a price transform"""
+    action_type = action.get('type')
+    value = action.get('value', 0)
+
+    if action_type == 'multiply':
+        return lambda price: price * value
+    elif action_type == 'add':
+        return lambda price: price + value
+    elif action_type == 'percentage':
+        return lambda price: price * (1 + value / 100)
+
+    return lambda price: price
+
+
+def _is_hashable(value) -> bool:
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+def condition_index_keys(condition: Dict) -> Optional[FrozenSet[IndexKey]]:
+    """Keys of which at least one must be hit for the condition to match.
+
+    Returns None when the condition cannot be indexed and has to be checked
+    for every quote.
+    """
+    if not isinstance(condition, dict):
+        return frozenset()
+
+    if 'and' in condition:
+        # Any single term is a necessary condition; prefer the most selective
+        term_keys = [condition_index_keys(term) for term in condition['and']]
+        term_keys = [keys for keys in term_keys if keys is not None]
+        if not term_keys:
+            return None
+        return min(term_keys, key=lambda keys: (
+            not all(key[0] == 'eq' for key in keys), len(keys)
+        ))
+
+    if 'or' in condition:
+        keys = set()
+        for term in condition['or']:
+            term_keys = condition_index_keys(term)
+            if term_keys is None:
+                return None
+            keys |= term_keys
+        return frozenset(keys)
+
+    field = condition.get('field')
+    operator = condition.get('operator')
+    value = condition.get('value')
+
+    if not _is_hashable(field):
+        # Such a condition can never match
+        return frozenset()
+    if operator == 'equals' and _is_hashable(value):
+        return frozenset([('eq', field, value)])
+    if operator == 'in' and isinstance(value, (list, tuple)) and all(_is_hashable(v) for v in value):
+        return frozenset(('eq', field, v) for v in value)
+    return frozenset([('field', field)])
+
+
+class CompiledRuleSet:
+    """Active pricing rules compiled into an index of predicates and actions"""
+
+    def __init__(self, rules: List[PricingRule], version: Optional[str] = None):
+        self.version = version
+        self.rules: List[Tuple[str, Predicate, Action]] = []
+        self.eq_index: Dict[Tuple, List[int]] = {}
+        self.field_index: Dict[str, List[int]] = {}
+        self.unindexed: List[int] = []
+
+        # Rules arrive in priority order; positions preserve that order
+        for rule in rules:
+            condition = rule.condition if isinstance(rule.condition, dict) else {}
+            action = rule.action if isinstance(rule.action, dict) else {}
+            try:
+                compiled = (rule.name, compile_condition(condition), compile_action(action))
+                keys = condition_index_keys(condition)
+            except Exception as e:
+                logger.error(f"Skipping malformed pricing rule {rule.name!r}: {str(e)}")
+                continue
+
+            position = len(self.rules)
+            self.rules.append(compiled)
+            if keys is None:
+                self.unindexed.append(position)
+                continue
+            for key in keys:
+                if key[0] == 'eq':
+                    self.eq_index.setdefault((key[1], key[2]), []).append(position)
+                else:
+                    self.field_index.setdefault(key[1], []).append(position)
+
+        self.indexed_fields = (
+            {field for field, _value in self.eq_index} | set(self.field_index)
+        )
+
+    def candidates(self, features: Dict) -> List[int]:
+        """Positions of the rules that can match these features, in priority order"""
+        positions = set(self.unindexed)
+        for field in self.indexed_fields:
+            if field not in features:
+                continue
+            positions.update(self.field_index.get(field, ()))
+            value = features[field]
+            if _is_hashable(value):
+                positions.update(self.eq_index.get((field, value), ()))
+        return sorted(positions)
+
+    def apply(self, price: float, features: Dict) -> float:
+        """Apply every matching rule action to the price, highest priority first"""
+        for position in self.candidates(features):
+            _name, predicate, action = self.rules[position]
+            if predicate(features):
+                try:
+                    price = action(price)
+                except Exception as e:
+                    logger.error(f"Error applying rule action: {str(e)}")
+        return price
+
+
+_rule_set: Optional[CompiledRuleSet] = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def get_rule_set() -> CompiledRuleSet:
+    """Return the cached compiled rule set, rebuilding it if it was invalidated"""
+    global _rule_set, _checked_at
+
+    rule_set = _rule_set
+    if rule_set is not None and time.monotonic() - _checked_at < VERSION_CHECK_INTERVAL:
+        return rule_set
+
+    version = cache.get_or_set(RULES_VERSION_CACHE_KEY, lambda: uuid.uuid4().hex, timeout=None)
+    with _lock:
+        if _rule_set is None or _rule_set.version != version:
+            rules = list(PricingRule.objects.filter(is_active=True).order_by('-priority', 'name'))
+            _rule_set = CompiledRuleSet(rules, version)
+            logger.info(f"Compiled {len(rules)} active pricing rules")
+        _checked_at = time.monotonic()
+        return _rule_set
+
+
+def invalidate_rule_set() -> None:
+    """Drop the compiled rules in every worker sharing the cache"""
+    global _rule_set
+
+    cache.set(RULES_VERSION_CACHE_KEY, uuid.uuid4().hex, timeout=None)
+    _rule_set = None
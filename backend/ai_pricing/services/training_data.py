@@ -0,0 +1,141 @@
+"""Columnar extraction of ``PricingHistory`` rows for model training.
+
+One aggregate query sizes the NumPy columns up front. One joined
+``values_list`` query is then streamed with ``iterator(chunk_size=...)``,
+and each chunk is written straight into those columns. String columns are
+stored as integer codes and become pandas categoricals at the end. Memory
+is bounded by the final arrays plus one chunk, and extraction always costs
+two queries however many rows there are.
+"""
+from itertools import islice
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+from django.db.models import Count, Max
+
+from ..models import PricingHistory
+
+CHUNK_SIZE = 2000
+
+# (column, values_list lookup) in the order the training frame expects
+HISTORY_FIELDS = [
+    ('service_id', 'service_id'),
+    ('service_category', 'service__category__name'),
+    ('service_difficulty', 'service__difficulty_level'),
+    ('area_id', 'area_id'),
+    ('base_price', 'base_price'),
+    ('final_price', 'final_price'),
+    ('order_volume', 'order_volume'),
+    ('fabric_cost', 'fabric_cost'),
+    ('complexity_score', 'complexity_score'),
+    ('success_rate', 'success_rate'),
+    ('season', 'season'),
+    ('customer_segment', 'customer_segment'),
+    ('created_at', 'created_at'),
+]
+
+NUMERIC_COLUMNS = {
+    'service_id': np.int64,
+    'area_id': np.int64,
+    'base_price': np.float64,
+    'final_price': np.float64,
+    'order_volume': np.int64,
+    'fabric_cost': np.float64,
+    'complexity_score': np.float64,
+    'success_rate': np.float64,
+}
+
+# Falsy values (NULL, 0, '') are replaced with these, as in the row-by-row version
+DEFAULTS = {
+    'fabric_cost': 0,
+    'complexity_score': 0,
+    'success_rate': 0.8,
+    'season': 'normal',
+    'customer_segment': 'regular',
+}
+
+CATEGORICAL_COLUMNS = ['service_category', 'service_difficulty', 'season', 'customer_segment']
+
+PEAK_SEASONS = ['wedding', 'festival', 'holiday']
+HIGH_DIFFICULTY_LEVELS = ['advanced', 'expert']
+
+
+def extract_training_frame(queryset=None, chunk_size: int = CHUNK_SIZE) -> pd.DataFrame:
+    """Build the training DataFrame from ``PricingHistory`` in two queries
+
+    ``df.attrs['high_water_id']`` is the highest history id included.
+    """
+    if queryset is None:
+        queryset = PricingHistory.objects.all()
+
+    bounds = queryset.aggregate(rows=Count('id'), max_id=Max('id'))
+    if not bounds['rows']:
+        return pd.DataFrame()
+
+    # Rows written while we stream are left for the next training run; the
+    # model ordering is kept so train/test splits match the ORM version
+    queryset = queryset.filter(id__lte=bounds['max_id'])
+    capacity = bounds['rows']
+
+    numeric = {column: np.zeros(capacity, dtype=dtype) for column, dtype in NUMERIC_COLUMNS.items()}
+    codes = {column: np.zeros(capacity, dtype=np.int32) for column in CATEGORICAL_COLUMNS}
+    categories: Dict[str, Dict[str, int]] = {column: {} for column in CATEGORICAL_COLUMNS}
+    created_month = np.zeros(capacity, dtype=np.int64)
+    created_year = np.zeros(capacity, dtype=np.int64)
+
+    rows = queryset.values_list(*[lookup for _, lookup in HISTORY_FIELDS]).iterator(chunk_size=chunk_size)
+    filled = 0
+    while filled < capacity:
+        chunk = list(islice(rows, min(chunk_size, capacity - filled)))
+        if not chunk:
+            break
+
+        end = filled + len(chunk)
+        columns = dict(zip([column for column, _ in HISTORY_FIELDS], zip(*chunk)))
+
+        for column in NUMERIC_COLUMNS:
+            values = columns[column]
+            default = DEFAULTS.get(column)
+            if default is not None:
+                values = [value or default for value in values]
+            numeric[column][filled:end] = np.asarray(values, dtype=numeric[column].dtype)
+
+        for column in CATEGORICAL_COLUMNS:
+            mapping = categories[column]
+            default = DEFAULTS.get(column)
+            codes[column][filled:end] = [
+                mapping.setdefault(value or default, len(mapping))
+                for value in columns[column]
+            ]
+
+        created = columns['created_at']
+        created_month[filled:end] = [value.month for value in created]
+        created_year[filled:end] = [value.year for value in created]
+        filled = end
+
+    if filled == 0:
+        return pd.DataFrame()
+
+    data = {}
+    for column, _ in HISTORY_FIELDS:
+        if column in NUMERIC_COLUMNS:
+            data[column] = numeric[column][:filled]
+        elif column in CATEGORICAL_COLUMNS:
+            data[column] = pd.Categorical.from_codes(
+                codes[column][:filled], categories=list(categories[column])
+            )
+    data['created_month'] = created_month[:filled]
+    data['created_year'] = created_year[:filled]
+
+    df = pd.DataFrame(data)
+
+    # Training runs record this as their incremental high-water mark
+    df.attrs['high_water_id'] = bounds['max_id']
+
+    # Add derived features
+    df['price_ratio'] = df['final_price'] / df['base_price']
+    df['is_peak_season'] = df['season'].isin(PEAK_SEASONS)
+    df['is_high_difficulty'] = df['service_difficulty'].isin(HIGH_DIFFICULTY_LEVELS)
+
+    return df
@@ -0,0 +1,161 @@
+"""Database-backed queue for background pricing model training.
+
+The train-model endpoint only inserts a ``TrainingJob`` row; the
+``run_training_jobs`` management command claims queued jobs and trains in
+its own process, writing progress back to the row as it goes. Web workers
+never train, and pick up the new model through the artifact store pointer.
+"""
+import logging
+from datetime import timedelta
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from ..models import TrainingJob
+from .price_matrix import build_price_matrix
+
+if TYPE_CHECKING:
+    from .pricing_ml import PricingMLService
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+# A job in a mode covers requests for the modes ranked below it
+MODE_RANK = {'incremental': 0, 'auto': 1, 'full': 2}
+
+# A running job that has not reported progress for this long lost its worker
+STALE_AFTER = timedelta(hours=1)
+
+
+def enqueue_training_job(mode: str = 'full') -> Tuple[TrainingJob, bool]:
+    """Queue a training run, or join the active job when it covers ``mode``
+
+    The database holds at most one queued and one running job. A request
+    joins the queued job, upgrading its mode when the request asks for more
+    (a full retrain supersedes an auto or incremental one). A running job is
+    only joined when its mode covers the request; otherwise the request
+    waits in the queue behind it.
+    """
+    for _ in range(2):
+        job = _join_queued_job(mode)
+        if job is not None:
+            return job, False
+
+        running = TrainingJob.objects.filter(status='running').first()
+        if running is not None and MODE_RANK[running.mode] >= MODE_RANK[mode]:
+            return running, False
+
+        try:
+            with transaction.atomic():
+                return TrainingJob.objects.create(mode=mode), True
+        except IntegrityError:
+            # Another request queued a job first; join that one
+            continue
+
+    raise IntegrityError("Could not queue a training job")
+
+
+def _join_queued_job(mode: str) -> Optional[TrainingJob]:
+    queued = TrainingJob.objects.filter(status='queued')
+    # Conditional, so a claim that races the upgrade leaves the job untouched
+    queued.filter(mode__in=[m for m, rank in MODE_RANK.items() if rank < MODE_RANK[mode]]).update(
+        mode=mode, updated_at=timezone.now()
+    )
+    return queued.first()
+
+
+def claim_next_job() -> Optional[TrainingJob]:
+    """Mark the oldest queued job as running and return it"""
+    queued = TrainingJob.objects.filter(status='queued').order_by('created_at')
+    for job_id in queued.values_list('id', flat=True)[:10]:
+        # The conditional update makes the claim safe across worker processes
+        try:
+            with transaction.atomic():
+                claimed = TrainingJob.objects.filter(id=job_id, status='queued').update(
+                    status='running',
+                    stage='Starting',
+                    started_at=timezone.now(),
+                    updated_at=timezone.now()
+                )
+        except IntegrityError:
+            # Another worker is already running a job
+            return None
+        if claimed:
+            return TrainingJob.objects.get(id=job_id)
+    return None
+
+
+def fail_stale_jobs(max_age: timedelta = STALE_AFTER) -> int:
+    """Fail running jobs whose worker stopped reporting progress"""
+    now = timezone.now()
+    return TrainingJob.objects.filter(status='running', updated_at__lt=now - max_age).update(
+        status='failed',
+        stage='Failed',
+        error='Worker stopped before the job finished',
+        finished_at=now,
+        updated_at=now
+    )
+
+
+def run_training_job(job: TrainingJob, ml_service: Optional['PricingMLService'] = None) -> TrainingJob:
+    """Train a model for a claimed job and record the outcome on it"""
+    from .pricing_ml import PricingMLService
+
+    ml_service = ml_service or PricingMLService()
+    jobs = TrainingJob.objects.filter(id=job.id)
+
+    def report(progress: float, stage: str, model_results: Optional[Dict] = None):
+        fields = {'progress': round(progress, 3), 'stage': stage, 'updated_at': timezone.now()}
+        if model_results is not None:
+            fields['model_results'] = model_results
+        jobs.update(**fields)
+
+    try:
+        result = ml_service.train_pricing_model(progress=report, mode=job.mode)
+    except Exception as e:
+        result = {'status': 'error', 'message': str(e)}
+
+    now = timezone.now()
+    if result['status'] == 'success':
+        jobs.update(
+            status='succeeded',
+            progress=1.0,
+            stage='Finished',
+            model_results=result['all_results'],
+            best_model=result['best_model'],
+            bundle_id=result['bundle_id'],
+            finished_at=now,
+            updated_at=now
+        )
+        logger.info(f"Training job {job.id} promoted bundle {result['bundle_id']}")
+
+        # Default quotes should reflect the new model straight away
+        try:
+            build_price_matrix()
+        except Exception as e:
+            logger.error(f"Error rebuilding price matrix after training: {str(e)}")
+    elif result['status'] == 'no_new_data':
+        # Nothing to learn: the current bundle stays live
+        jobs.update(
+            status='succeeded',
+            progress=1.0,
+            stage=result['message'],
+            best_model=result['best_model'] or '',
+            bundle_id=result['bundle_id'],
+            finished_at=now,
+            updated_at=now
+        )
+    else:
+        jobs.update(
+            status='failed',
+            stage='Failed',
+            error=result.get('message') or result['status'],
+            finished_at=now,
+            updated_at=now
+        )
+        logger.warning(f"Training job {job.id} failed: {result.get('message')}")
+
+    job.refresh_from_db()
+    return job
@@ -0,0 +1,25 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from services.models import PricingArea, Service, ServicePricing
+from .models import PricingRule
+from .services.price_matrix import invalidate_price_matrix
+from .services.quote_cache import invalidate_quote_cache
+from .services.rule_engine import invalidate_rule_set
+
+
+@receiver([post_save, post_delete], sender=PricingRule)
+def invalidate_pricing_rules(sender, **kwargs):
+    """Recompile the cached pricing rules after any rule change"""
+    invalidate_rule_set()
+    invalidate_price_matrix()
+    invalidate_quote_cache()
+
+
+@receiver([post_save, post_delete], sender=Service)
+@receiver([post_save, post_delete], sender=PricingArea)
+@receiver([post_save, post_delete], sender=ServicePricing)
+def invalidate_precomputed_prices(sender, **kwargs):
+    """Precomputed and cached prices are stale once a service, area or base price changes"""
+    invalidate_price_matrix()
+    invalidate_quote_cache()
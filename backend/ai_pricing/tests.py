@@ -1,3 +1,1150 @@
-from django.test import TestCase
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import LinearRegression, Ridge
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from appointments.models import Customer
+from services.models import Service, ServiceCategory, ServicePricing, PricingArea
+from .models import CustomerPricingProfile, DynamicPricing, PricingHistory, PricingRule, TrainingJob
+from .views import MAX_BATCH_QUOTES
+from .services.artifact_store import ArtifactStore, ArtifactStoreError, feature_schema_for
+from .services.elasticity import estimate_elasticities, revenue_maximizing_prices
+from .services.feature_schema import FeatureSchema
+from .services.feature_snapshot import FeatureSnapshot
+from .services.inference import confidence_scores
+from .services.model_registry import ModelRegistry, model_registry
+from .services.model_fitting import (
+    CANDIDATE_MODELS, fit_candidates, fit_uncertainty, linear_stats, plan_parallelism,
+    selection_score, update_candidate
+)
+from .services.price_matrix import (
+    PRICING_VERSION_CACHE_KEY, build_price_matrix, get_price_matrix, price_matrix_is_stale
+)
+from .services.pricing_calculator import SmartPricingService
+from .services.pricing_kernel import MULTIPLIER_STEPS, price_contexts
+from .services.pricing_ml import PricingMLService, PricingOptimizationService
+from .services.quote_cache import (
+    GENERATION_CACHE_KEY, QuoteCache, current_generation, invalidate_quote_cache
+)
+from .services.pricing_records import PricingRecordBuffer, pricing_record_buffer
+from .services.training_data import extract_training_frame
+from .services.training_jobs import claim_next_job, enqueue_training_job, run_training_job
+from .services.rule_engine import (
+    RULES_VERSION_CACHE_KEY, VERSION_CHECK_INTERVAL, CompiledRuleSet, compile_condition, get_rule_set
+)
+
+
+def write_test_model(store: ArtifactStore) -> str:
+    """Promote a small ridge model over a few numeric quote features"""
+    rng = np.random.default_rng(11)
+    frame = pd.DataFrame({
+        'base_price': rng.uniform(300, 1500, size=100),
+        'order_volume': rng.integers(1, 5, size=100).astype(float),
+        'complexity_score': rng.uniform(1, 4, size=100),
+    })
+    scaler = StandardScaler().fit(frame)
+    model = Ridge().fit(scaler.transform(frame), frame['base_price'] * 1.1 + 50 * frame['complexity_score'])
+    scalers = {'pricing': scaler}
+    bundle_id = store.write_bundle('v1.0', model, scalers, {},
+                                   feature_schema=feature_schema_for(model, scalers, {}))
+    store.promote(bundle_id)
+    return bundle_id
+
+
+class TestModelMixin:
+    """Serve quotes from a model promoted into a temporary artifact store"""
+
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = ArtifactStore(tmp.name)
+        self.bundle_id = write_test_model(self.store)
+
+        patcher = mock.patch.object(model_registry, 'store', self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        model_registry.clear()
+        self.addCleanup(model_registry.clear)
+
+
+class PricingQueryCountTests(TestModelMixin, TestCase):
+    """A quote costs a fixed number of queries however many layers it passes through"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = ServiceCategory.objects.create(name='Blouses')
+        cls.service = Service.objects.create(
+            category=category, name='Designer Blouse', description='Lined blouse',
+            difficulty_level='advanced', estimated_days=5
+        )
+        cls.area = PricingArea.objects.create(name='Koramangala', multiplier=Decimal('1.20'))
+        ServicePricing.objects.create(service=cls.service, area=cls.area, base_price=Decimal('800.00'), final_price=0)
+
+        customer = Customer.objects.create(
+            name='Priya Sharma', phone='+919876543210', address='MG Road', area='Koramangala'
+        )
+        profile = CustomerPricingProfile.objects.create(customer=customer, loyalty_tier='vip', discount_percentage=5)
+        profile.preferred_services.add(cls.service)
+        cls.customer = customer
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        # The compiled rule set and price matrix are cached per process; warm them up front
+        get_rule_set()
+        get_price_matrix()
+        invalidate_quote_cache()
+
+    def tearDown(self):
+        pricing_record_buffer.flush()
+
+    def test_quote_query_count(self):
+        # Service (with category), area, base pricing
+        with self.assertNumQueries(3):
+            response = self.client.post('/api/ai-pricing/calculate-price/', {
+                'service_id': self.service.id,
+                'area_id': self.area.id,
+                'order_context': {'fabric_type': 'silk', 'quantity': 2}
+            }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'success')
+        # The record id is returned before the buffered record is written
+        pricing_record_buffer.flush()
+        self.assertTrue(DynamicPricing.objects.filter(record_id=response.data['pricing_record_id']).exists())
+
+    def test_customer_quote_query_count(self):
+        # ... plus the customer pricing profile and its preferred services
+        with self.assertNumQueries(5):
+            response = self.client.post('/api/ai-pricing/calculate-price/', {
+                'service_id': self.service.id,
+                'area_id': self.area.id,
+                'customer_id': self.customer.id
+            }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['breakdown']['customer_adjustment']['loyalty_tier'], 'vip')
+
+    def test_training_extraction_query_count(self):
+        PricingHistory.objects.bulk_create([
+            PricingHistory(
+                service=self.service, area=self.area, base_price=800, final_price=800 + volume * 10,
+                factors={}, order_volume=volume, season='wedding' if volume % 2 else ''
+            )
+            for volume in range(1, 26)
+        ])
+
+        # One aggregate plus one streamed query, however small the chunks
+        with self.assertNumQueries(2):
+            df = extract_training_frame(chunk_size=4)
+
+        self.assertEqual(len(df), 25)
+        self.assertEqual(df['service_category'].iloc[0], 'Blouses')
+        self.assertEqual(sorted(df['season'].unique()), ['normal', 'wedding'])
+
+    def test_feature_snapshot_refresh(self):
+        def add_history(volumes, created_at):
+            rows = PricingHistory.objects.bulk_create([
+                PricingHistory(service=self.service, area=self.area, base_price=800,
+                               final_price=800 + volume, factors={}, order_volume=volume)
+                for volume in volumes
+            ])
+            PricingHistory.objects.filter(id__in=[row.id for row in rows]).update(created_at=created_at)
+
+        add_history(range(1, 6), datetime(2026, 9, 10, tzinfo=timezone.utc))
+        add_history(range(6, 9), datetime(2026, 10, 2, tzinfo=timezone.utc))
+
+        with tempfile.TemporaryDirectory() as root:
+            snapshot = FeatureSnapshot(root)
+            snapshot.refresh()
+            add_history(range(9, 11), datetime(2026, 10, 5, tzinfo=timezone.utc))
+
+            # One grouped query finds no edited months, then only the rows above
+            # the high-water id are read, and only October is rewritten
+            september = snapshot.read_manifest()['months']['2026-09']
+            with self.assertNumQueries(3):
+                manifest = snapshot.refresh()
+            self.assertEqual(manifest['months']['2026-09'], september)
+            self.assertEqual(manifest['months']['2026-10']['rows'], 5)
+
+            df = snapshot.load()
+            self.assertEqual(df.attrs['high_water_id'], extract_training_frame().attrs['high_water_id'])
+            self.assertEqual(sorted(df['order_volume']), list(range(1, 11)))
+            self.assertEqual(df['season'].dtype, 'category')
+            self.assertEqual(len(snapshot.load(months=['2026-09'])), 5)
+
+            # Edited and deleted rows below the high-water id are picked up
+            backfilled = PricingHistory.objects.get(order_volume=2)
+            backfilled.success_rate = 0.4
+            backfilled.save()
+            PricingHistory.objects.filter(order_volume=9).delete()
+            october = snapshot.read_manifest()['months']['2026-10']
+            manifest = snapshot.refresh()
+            self.assertNotEqual(manifest['months']['2026-09'], september)
+            self.assertEqual(manifest['months']['2026-10']['rows'], 4)
+            self.assertFalse(os.path.exists(os.path.join(root, october['file'])))
+
+            df = snapshot.load()
+            self.assertEqual(sorted(df['order_volume']), [1, 2, 3, 4, 5, 6, 7, 8, 10])
+            self.assertEqual(df.loc[df['order_volume'] == 2, 'success_rate'].tolist(), [0.4])
+
+            # A month whose rows are all gone leaves the snapshot
+            PricingHistory.objects.filter(created_at__month=9).delete()
+            manifest = snapshot.refresh()
+            self.assertEqual(list(manifest['months']), ['2026-10'])
+            self.assertEqual(manifest['rows'], 4)
+
+    def test_catalogue_optimization_query_count(self):
+        other = Service.objects.create(
+            category=self.service.category, name='Saree Fall', description='Fall and pico',
+            difficulty_level='basic', estimated_days=2
+        )
+        area = PricingArea.objects.create(name='Indiranagar', multiplier=Decimal('1.10'))
+        ServicePricing.objects.create(service=other, area=area, base_price=Decimal('300.00'), final_price=0)
+
+        # Areas, service ids, the pricing context, one grouped order count and
+        # the price history behind the elasticities, however many services
+        # and areas there are
+        with self.assertNumQueries(7):
+            result = PricingOptimizationService().optimize_pricing_for_services()
+
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(set(result['services']), {self.service.id, other.id})
+        self.assertEqual(
+            set(result['services'][other.id]['optimized_prices']), {'Koramangala', 'Indiranagar'}
+        )
+        # With no history the elasticity is the prior: the model's price is kept and
+        # the elasticity price (the top of the band for -0.5) is only advisory
+        optimized = result['services'][other.id]['optimized_prices']['Indiranagar']
+        self.assertEqual(optimized['elasticity_source'], 'prior')
+        self.assertEqual(optimized['optimized_price'], optimized['predicted_price'])
+        self.assertEqual((optimized['elasticity_price'], optimized['at_price_bound']), (429.0, True))
+
+    def test_revenue_maximizing_prices(self):
+        # Linear demand peaks inside the band for moderate elasticities
+        prices, bounded = revenue_maximizing_prices([1000.0, 1000.0, 1000.0], [-0.8, -1.0, -1.5])
+        self.assertEqual(prices.tolist(), [1125.0, 1000.0, 833.33])
+        self.assertEqual(bounded.tolist(), [False, False, False])
+        # ... and past its edges for very inelastic or very elastic demand
+        prices, bounded = revenue_maximizing_prices([1000.0, 1000.0, 500.0], [-0.2, -3.0, -0.5])
+        self.assertEqual(prices.tolist(), [1300.0, 700.0, 650.0])
+        self.assertEqual(bounded.tolist(), [True, True, True])
+
+        PricingHistory.objects.bulk_create([
+            PricingHistory(
+                service=self.service, area=self.area, base_price=800, final_price=800 * ratio,
+                factors={}, order_volume=round(100 * ratio ** -1.5), success_rate=1.0
+            )
+            for ratio in (0.8, 0.9, 1.0, 1.1, 1.2, 1.3) * 10
+        ])
+        pair = (self.service.id, self.area.id)
+        elasticities, history_weights = estimate_elasticities([pair])
+        # 60 rows against a prior worth 20: three quarters of the way to the fitted -1.5
+        self.assertAlmostEqual(elasticities[pair], 0.75 * -1.5 + 0.25 * -0.5, delta=0.02)
+        self.assertAlmostEqual(history_weights[pair], 0.75)
+
+        # Enough history: the elasticity price becomes the optimized price
+        result = PricingOptimizationService().optimize_pricing_for_service(self.service.id)
+        optimized = result['optimized_prices']['Koramangala']
+        self.assertEqual(optimized['elasticity_source'], 'history')
+        self.assertEqual(optimized['optimized_price'], optimized['elasticity_price'])
+        self.assertFalse(optimized['at_price_bound'])
+
+    @override_settings(AI_PRICING_CACHE_MIN_CONFIDENCE=0.0)
+    def test_repeated_quote_served_from_quote_cache(self):
+        quote = {
+            'service_id': self.service.id,
+            'area_id': self.area.id,
+            'customer_id': self.customer.id,
+            'order_context': {'fabric_type': 'silk', 'urgency': 'rush'}
+        }
+        with mock.patch.object(PricingMLService, 'predict_prices', autospec=True,
+                               side_effect=PricingMLService.predict_prices) as predict:
+            with mock.patch.object(pricing_record_buffer, 'add') as record:
+                first = self.client.post('/api/ai-pricing/calculate-price/', quote, format='json').data
+                second = self.client.post('/api/ai-pricing/calculate-price/', quote, format='json').data
+            self.assertEqual(predict.call_count, 1)
+            self.assertEqual(second['calculated_price'], first['calculated_price'])
+            # The cached quote is recorded like the computed one
+            self.assertEqual(record.call_count, 2)
+            self.assertEqual(record.call_args_list[0], record.call_args_list[1])
+
+            # A base price change orphans every cached quote
+            ServicePricing.objects.filter(service=self.service, area=self.area).first().save()
+            self.client.post('/api/ai-pricing/calculate-price/', quote, format='json')
+            self.assertEqual(predict.call_count, 2)
+
+    @override_settings(AI_PRICING_CACHE_MIN_CONFIDENCE=0.0)
+    def test_default_quote_served_from_price_matrix(self):
+        computed = self.client.post('/api/ai-pricing/calculate-price/', {
+            'service_id': self.service.id,
+            'area_id': self.area.id
+        }, format='json').data
+        build_price_matrix()
+        get_price_matrix()
+
+        with self.assertNumQueries(0):
+            response = self.client.post('/api/ai-pricing/calculate-price/', {
+                'service_id': self.service.id,
+                'area_id': self.area.id,
+                'order_context': {'quantity': 1}
+            }, format='json')
+
+        self.assertEqual(response.data['calculated_price'], computed['calculated_price'])
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/services/pricing/calculate_price/', {
+                'service_id': self.service.id,
+                'area_id': self.area.id
+            })
+
+        self.assertEqual(response.data['area_name'], 'Koramangala')
+        self.assertNotIn('dynamic_price', response.data)
+
+    @override_settings(AI_PRICING_CACHE_MIN_CONFIDENCE=0.0)
+    def test_repeated_quote_served_from_price_matrix(self):
+        quote = {'service_id': self.service.id, 'area_id': self.area.id}
+        with mock.patch.object(pricing_record_buffer, 'add') as record:
+            computed = self.client.post('/api/ai-pricing/calculate-price/', quote, format='json').data
+            build_price_matrix()
+            get_price_matrix()
+            record.reset_mock()
+
+            with self.assertNumQueries(0):
+                first = self.client.post('/api/ai-pricing/calculate-price/', quote, format='json').data
+                second = self.client.post('/api/ai-pricing/calculate-price/', quote, format='json').data
+        self.assertEqual(first['calculated_price'], computed['calculated_price'])
+        self.assertEqual(second['calculated_price'], computed['calculated_price'])
+        # Matrix quotes are recorded like the computed one
+        self.assertEqual(record.call_count, 2)
+        self.assertEqual(record.call_args_list[0], record.call_args_list[1])
+        service_id, area_id, pricing_version, base_price, calculated_price, _, context = record.call_args[0]
+        self.assertEqual((service_id, area_id, pricing_version), (self.service.id, self.area.id, 'v1.0'))
+        self.assertEqual(round(calculated_price, 2), computed['calculated_price'])
+        self.assertEqual(context['fabric_type'], 'cotton')
+
+    @override_settings(AI_PRICING_CACHE_MIN_CONFIDENCE=0.0)
+    def test_pricing_change_retires_the_matrix_in_other_workers(self):
+        # Saving pricing data replaces the stamp without writing to the matrix table
+        pricing = ServicePricing.objects.get(service=self.service, area=self.area)
+        build_price_matrix()
+        with CaptureQueriesContext(connection) as queries:
+            pricing.save()
+        self.assertFalse([query for query in queries if 'pricematrix' in query['sql']])
+        self.assertIsNone(get_price_matrix())
+
+        build_price_matrix()
+        self.assertIsNotNone(get_price_matrix())
+
+        # Another worker changes a base price; its signal replaces the shared stamp
+        ServicePricing.objects.filter(id=pricing.id).update(base_price=Decimal('900.00'))
+        cache.set(PRICING_VERSION_CACHE_KEY, 'changed-elsewhere', timeout=None)
+        self.assertIsNotNone(get_price_matrix())
+
+        # This worker sees the new stamp once its check interval passes
+        with mock.patch('ai_pricing.services.price_matrix.time.monotonic', return_value=time.monotonic() + 60):
+            self.assertIsNone(get_price_matrix())
+            self.assertTrue(price_matrix_is_stale())
+
+            build_price_matrix()
+            entry = get_price_matrix()[f'{self.service.id}:{self.area.id}']
+        self.assertEqual(entry['service_pricing']['base_price'], '900.00')
+
+
+class BatchPricingEndpointTests(TestModelMixin, TestCase):
+    """The batch endpoint bounds its size and reports failures per item"""
+
+    url = '/api/ai-pricing/calculate-prices/'
+
+    @classmethod
+    def setUpTestData(cls):
+        category = ServiceCategory.objects.create(name='Blouses')
+        cls.service = Service.objects.create(
+            category=category, name='Designer Blouse', description='Lined blouse',
+            difficulty_level='advanced', estimated_days=5
+        )
+        cls.area = PricingArea.objects.create(name='Koramangala', multiplier=Decimal('1.20'))
+        cls.unpriced_area = PricingArea.objects.create(name='Indiranagar', multiplier=Decimal('1.10'))
+        ServicePricing.objects.create(service=cls.service, area=cls.area, base_price=Decimal('800.00'), final_price=0)
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        invalidate_quote_cache()
+
+    def tearDown(self):
+        pricing_record_buffer.flush()
+
+    def test_batch_over_the_limit_is_rejected(self):
+        # The grid expands to one quote more than the limit
+        response = self.client.post(self.url, {
+            'service_ids': list(range(1, MAX_BATCH_QUOTES + 2)),
+            'area_ids': [self.area.id],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(MAX_BATCH_QUOTES), response.data['message'])
+
+    def test_batch_at_the_limit_is_priced(self):
+        items = [{'service_id': self.service.id, 'area_id': self.area.id}] * 2
+        with mock.patch('ai_pricing.views.MAX_BATCH_QUOTES', 2):
+            response = self.client.post(self.url, {'items': items}, format='json')
+            self.assertEqual(response.status_code, 200)
+
+            response = self.client.post(self.url, {'items': items * 2}, format='json')
+            self.assertEqual(response.status_code, 400)
+
+    def test_failed_items_get_error_entries_in_place(self):
+        response = self.client.post(self.url, {'items': [
+            {'service_id': self.service.id, 'area_id': self.area.id},
+            {'service_id': self.service.id, 'area_id': 999999},
+            {'service_id': self.service.id, 'area_id': self.unpriced_area.id},
+            {'service_id': self.service.id, 'area_id': self.area.id, 'order_context': {'quantity': 3}},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results], ['success', 'error', 'error', 'success'])
+        self.assertEqual(results[1]['message'], 'Service or area not found')
+        self.assertEqual(results[2]['message'], 'No base pricing found for this service and area')
+        self.assertGreater(results[0]['calculated_price'], 0)
+
+    def test_items_without_ids_are_rejected(self):
+        response = self.client.post(self.url, {'items': [{'service_id': self.service.id}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class QuoteCacheTests(SimpleTestCase):
+    """Cached quotes are private copies and the generation is read on an interval"""
+
+    def setUp(self):
+        self.quote_cache = QuoteCache(ttl=60, l1_size=8)
+        self.addCleanup(cache.clear)
+
+    def test_hits_are_deep_copies(self):
+        quote = {'calculated_price': 900.0, 'breakdown': {'final_price': 900.0}}
+        self.quote_cache.set_many({'key': quote})
+        # Neither the caller's quote nor a served copy reaches the cache
+        quote['breakdown']['final_price'] = 1.0
+        self.quote_cache.get_many(['key'])['key']['breakdown']['final_price'] = 2.0
+
+        hit = self.quote_cache.get_many(['key'])['key']
+        self.assertEqual(hit['breakdown']['final_price'], 900.0)
+
+        # ... and the same holds for quotes first read from the shared cache
+        self.quote_cache.clear_local()
+        self.quote_cache.get_many(['key'])['key']['breakdown']['final_price'] = 3.0
+        self.assertEqual(self.quote_cache.get_many(['key'])['key']['breakdown']['final_price'], 900.0)
+
+    def test_generation_is_read_on_an_interval(self):
+        invalidate_quote_cache()
+        generation = current_generation()
+        with mock.patch('ai_pricing.services.quote_cache.cache.get_or_set') as get_or_set:
+            for _ in range(10):
+                self.assertEqual(current_generation(), generation)
+            self.assertEqual(get_or_set.call_count, 0)
+
+        # A change made by another worker is seen once the interval passes
+        cache.set(GENERATION_CACHE_KEY, 'changed-elsewhere', timeout=None)
+        self.assertEqual(current_generation(), generation)
+        with mock.patch('ai_pricing.services.quote_cache.time.monotonic', return_value=time.monotonic() + 60):
+            self.assertEqual(current_generation(), 'changed-elsewhere')
+
+
+class ArtifactStoreTests(SimpleTestCase):
+    """Bundles are promoted and rolled back through the CURRENT pointer"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = ArtifactStore(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_bundle(self):
+        return self.store.write_bundle('v1.0', {'coef': [1.0, 2.0]}, {}, {})
+
+    def test_promote_and_rollback(self):
+        first = self.write_bundle()
+        second = self.write_bundle()
+
+        self.store.promote(first)
+        self.store.promote(second)
+        self.assertEqual(self.store.current(), second)
+
+        self.store.rollback()
+        self.assertEqual(self.store.current(), first)
+        with self.assertRaises(ArtifactStoreError):
+            self.store.rollback()
+
+    def test_tampered_bundle_is_rejected(self):
+        bundle_id = self.write_bundle()
+        with open(os.path.join(self.store.bundle_path(bundle_id), 'model.joblib'), 'ab') as f:
+            f.write(b'corrupt')
+
+        with self.assertRaises(ArtifactStoreError):
+            self.store.promote(bundle_id)
+        self.assertIsNone(self.store.current())
+
+    def test_inference_export_matches_model(self):
+        rng = np.random.default_rng(7)
+        X = rng.normal(size=(200, 5)).astype(np.float32)
+        y = X @ rng.normal(size=5) + rng.normal(scale=0.1, size=200)
+
+        for model in (RandomForestRegressor(n_estimators=10, random_state=0), Ridge()):
+            model.fit(X, y)
+            bundle_id = self.store.write_bundle('v1.0', model, {}, {})
+
+            # Served from the NumPy export alone
+            manifest, compiled = self.store.load_inference(bundle_id)
+            self.assertEqual(manifest['inference'], 'inference.npz')
+            np.testing.assert_allclose(compiled.predict(X), model.predict(X), rtol=1e-5)
+
+    def test_forest_confidence_from_tree_spread(self):
+        rng = np.random.default_rng(3)
+        X = rng.uniform(-1, 1, size=(400, 2)).astype(np.float32)
+        # Prices are noisy only where the first feature is positive
+        y = 1000 + 200 * X[:, 1] + np.where(X[:, 0] > 0, rng.normal(scale=150, size=400), 0)
+
+        model = RandomForestRegressor(n_estimators=30, random_state=0).fit(X[:300], y[:300])
+        uncertainty = fit_uncertainty('random_forest', model, X[300:], y[300:])
+        bundle_id = self.store.write_bundle('v1.0', model, {}, {}, uncertainty=uncertainty)
+        _, compiled = self.store.load_inference(bundle_id)
+
+        predictions, errors = compiled.predict_with_error(X[300:])
+        spread = np.std([tree.predict(X[300:]) for tree in model.estimators_], axis=0)
+        np.testing.assert_allclose(errors, np.maximum(spread * uncertainty['scale'], uncertainty['floor']))
+
+        confidence = confidence_scores(predictions, errors)
+        noisy = X[300:, 0] > 0
+        self.assertLess(confidence[noisy].mean(), confidence[~noisy].mean())
+
+
+class ModelRegistryTests(SimpleTestCase):
+    """Workers pick up a promoted bundle without a restart"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = ArtifactStore(tmp.name)
+        self.first = write_test_model(self.store)
+
+    def test_invalidate_hot_swaps_the_promoted_bundle(self):
+        registry = ModelRegistry(self.store, check_interval=3600)
+        old = registry.get()
+        self.assertEqual(old.version, self.first)
+
+        second = write_test_model(self.store)
+        # Within the check interval the loaded bundle keeps serving
+        self.assertIs(registry.get(), old)
+
+        registry.invalidate()
+        new = registry.get()
+        self.assertEqual(new.version, second)
+        # Readers holding the old bundle keep a complete, unchanged bundle
+        self.assertEqual(old.version, self.first)
+        self.assertIsNot(old.model, new.model)
+
+    def test_reloads_when_the_pointer_changes(self):
+        registry = ModelRegistry(self.store, check_interval=0.05)
+        first = registry.get()
+
+        # An unchanged pointer keeps the loaded bundle after the interval
+        time.sleep(0.1)
+        self.assertIs(registry.get(), first)
+
+        second = write_test_model(self.store)
+        time.sleep(0.1)
+        self.assertEqual(registry.get().version, second)
+
+        self.store.rollback()
+        time.sleep(0.1)
+        self.assertEqual(registry.get().version, self.first)
+
+    def test_unreadable_bundle_keeps_the_previous_one(self):
+        registry = ModelRegistry(self.store, check_interval=3600)
+        registry.get()
+
+        # Corrupted after promotion, so the registry's checksum check catches it
+        second = write_test_model(self.store)
+        export = self.store.read_manifest(second)['inference']
+        with open(os.path.join(self.store.bundle_path(second), export), 'ab') as f:
+            f.write(b'corrupt')
+        registry.invalidate()
+        with self.assertLogs('ai_pricing.services.model_registry', 'ERROR'):
+            self.assertEqual(registry.get().version, self.first)
+
+    def test_concurrent_reads_during_swaps(self):
+        registry = ModelRegistry(self.store, check_interval=0)
+        versions = {self.first}
+        seen, errors = [], []
+        stop = threading.Event()
+
+        def read():
+            while not stop.is_set():
+                try:
+                    bundle = registry.get()
+                    seen.append(bundle.version if bundle is not None else None)
+                except Exception as e:
+                    errors.append(e)
+
+        readers = [threading.Thread(target=read) for _ in range(8)]
+        for reader in readers:
+            reader.start()
+        try:
+            for _ in range(5):
+                versions.add(write_test_model(self.store))
+                time.sleep(0.02)
+        finally:
+            stop.set()
+            for reader in readers:
+                reader.join()
+
+        self.assertEqual(errors, [])
+        self.assertNotIn(None, seen)
+        self.assertTrue(set(seen) <= versions)
+        self.assertEqual(registry.get().version, self.store.current())
+
+
+class FeatureSchemaTests(SimpleTestCase):
+    """The compiled encoder reproduces the training encoding and scaling"""
+
+    def test_encoder_matches_training_transform(self):
+        frame = pd.DataFrame({
+            'service_id': [1, 2, 3, 4],
+            'service_difficulty': ['basic', 'expert', 'advanced', 'basic'],
+            'base_price': [500.0, 900.0, 1200.0, 650.0],
+            'is_peak_season': [True, False, False, True],
+        })
+        encoder = LabelEncoder()
+        encoded = frame.copy()
+        encoded['service_difficulty'] = encoder.fit_transform(frame['service_difficulty'])
+        scaler = StandardScaler().fit(encoded)
+
+        schema = FeatureSchema.from_dict(
+            FeatureSchema.from_fitted(list(frame.columns), {'service_difficulty': encoder}, scaler).to_dict()
+        )
+        feature_encoder = schema.compile()
+
+        rows = frame.to_dict('records')
+        # Keys the model was not trained on are ignored
+        rows[0]['fabric_type'] = 'silk'
+        np.testing.assert_allclose(feature_encoder.encode_many(rows), scaler.transform(encoded), rtol=1e-5)
+
+        # Missing and unseen values fall back to the declared defaults
+        self.assertEqual(
+            feature_encoder.encode({'service_difficulty': 'couture'}).tolist(),
+            feature_encoder.encode({'service_id': 0, 'service_difficulty': 'basic', 'base_price': 1000.0,
+                                    'is_peak_season': False}).tolist()
+        )
+
+
+def scalar_rule_based_price(base_price: float, context: dict) -> float:
+    """The one-context-at-a-time business rules the pricing kernel replaced"""
+    try:
+        price = base_price * context.get('area_multiplier', 1.0)
+        for key, default, lowercase, table in MULTIPLIER_STEPS:
+            value = context.get(key, default)
+            price *= table.get(value.lower() if lowercase else value, 1.0)
+        if context.get('is_peak_season', False):
+            price *= 1.3
+        order_volume = context.get('order_volume', 1)
+        if order_volume >= 10:
+            price *= 0.85
+        elif order_volume >= 5:
+            price *= 0.9
+        urgency_level = context.get('urgency_level', 'normal')
+        if urgency_level == 'urgent':
+            price *= 1.5
+        elif urgency_level == 'rush':
+            price *= 2.0
+        if context.get('special_requirements', False):
+            price *= 1.15
+        fabric_cost = context.get('fabric_cost', 0)
+        if fabric_cost and fabric_cost > 0:
+            price += float(fabric_cost)
+        return price
+    except Exception:
+        return base_price
+
+
+def random_pricing_contexts(rng, count: int):
+    """Contexts mixing known, unknown, mixed-case, missing and malformed values"""
+    contexts = []
+    for _ in range(count):
+        context = {}
+        for key, _default, _lowercase, table in MULTIPLIER_STEPS:
+            choice = rng.integers(6)
+            if choice == 0:
+                continue
+            value = str(rng.choice(list(table) + ['unknown']))
+            context[key] = value.upper() if choice == 1 else value
+        context.update({
+            'area_multiplier': float(rng.choice([0.8, 1.0, 1.1, 1.25, 1.5])),
+            'is_peak_season': bool(rng.integers(2)),
+            'order_volume': int(rng.integers(0, 15)),
+            'urgency_level': str(rng.choice(['normal', 'urgent', 'rush', 'later'])),
+            'special_requirements': bool(rng.integers(2)),
+            'fabric_cost': float(rng.choice([0, -50, 120.5, 300])),
+        })
+        malformed = rng.integers(20)
+        if malformed == 0:
+            context['fabric_type'] = None
+        elif malformed == 1:
+            context['area_multiplier'] = '1.2'
+        contexts.append(context)
+    return contexts
+
+
+class PricingKernelTests(TestCase):
+    """The vectorized kernel prices exactly like the scalar business rules"""
+
+    def test_kernel_matches_scalar_rules(self):
+        rng = np.random.default_rng(2026)
+        contexts = random_pricing_contexts(rng, 2000)
+        base_prices = rng.uniform(200, 5000, size=len(contexts)).round(2)
+
+        expected = [scalar_rule_based_price(float(price), context)
+                    for price, context in zip(base_prices, contexts)]
+        # Bit for bit, malformed contexts included (they fall back to the base price)
+        self.assertEqual(price_contexts(base_prices, contexts).tolist(), expected)
+
+    def test_single_quotes_match_batched_quotes(self):
+        category = ServiceCategory.objects.create(name='Blouses')
+        services = [
+            Service.objects.create(category=category, name=f'Service {difficulty}', description='',
+                                   difficulty_level=difficulty, estimated_days=3)
+            for difficulty in ('basic', 'intermediate', 'advanced', 'expert')
+        ]
+        areas = [PricingArea.objects.create(name=f'Area {index}', multiplier=multiplier)
+                 for index, multiplier in enumerate([Decimal('0.90'), Decimal('1.35')])]
+        for service in services:
+            for area in areas:
+                ServicePricing.objects.create(service=service, area=area, base_price=Decimal('900.00'),
+                                              final_price=0)
+
+        rng = np.random.default_rng(7)
+        keys = {'fabric_type', 'garment_length', 'design_complexity', 'lining_required',
+                'handwork_embroidery', 'trims_accessories', 'fit_adjustments'}
+        batch = []
+        for context in random_pricing_contexts(rng, 60):
+            order_context = {key: value for key, value in context.items() if key in keys and value is not None}
+            order_context.update({
+                'quantity': context['order_volume'],
+                'urgency': context['urgency_level'],
+                'special_requirements': context['special_requirements'],
+                'fabric_cost': max(context['fabric_cost'], 0),
+            })
+            batch.append({
+                'service_id': services[rng.integers(len(services))].id,
+                'area_id': areas[rng.integers(len(areas))].id,
+                'customer_id': None,
+                'order_context': order_context,
+            })
+
+        # No model: every quote takes the rule-based path
+        with tempfile.TemporaryDirectory() as root, \
+                mock.patch.object(model_registry, 'store', ArtifactStore(root)):
+            model_registry.clear()
+            self.addCleanup(model_registry.clear)
+            pricing_service = SmartPricingService()
+
+            single = []
+            for item in batch:
+                invalidate_quote_cache()
+                single.append(pricing_service.calculate_dynamic_price(**item))
+            invalidate_quote_cache()
+            batched = pricing_service.calculate_dynamic_prices(batch, use_price_matrix=False)
+            pricing_record_buffer.flush()
+
+        self.assertEqual([quote['status'] for quote in single], ['success'] * len(batch))
+        self.assertEqual(
+            [(quote['calculated_price'], quote['breakdown']) for quote in single],
+            [(quote['calculated_price'], quote['breakdown']) for quote in batched]
+        )
+
+
+class RuleEngineTests(TestCase):
+    """Compiled rules match like evaluating every rule, and follow rule changes"""
+
+    def rule(self, name, condition, action, priority=0):
+        return PricingRule(name=name, rule_type='if_then', condition=condition, action=action, priority=priority)
+
+    def test_compound_conditions(self):
+        silk = {'field': 'fabric_type', 'operator': 'equals', 'value': 'silk'}
+        rush = {'field': 'urgency_level', 'operator': 'equals', 'value': 'rush'}
+        large = {'field': 'order_volume', 'operator': 'greater_than', 'value': 9}
+        rule_set = CompiledRuleSet([
+            self.rule('silk rush', {'and': [silk, rush]}, {'type': 'multiply', 'value': 2}),
+            self.rule('silk or bulk', {'or': [silk, large]}, {'type': 'add', 'value': 100}),
+            self.rule('nested', {'and': [rush, {'or': [silk, large]}]}, {'type': 'percentage', 'value': 10}),
+        ])
+
+        self.assertEqual(rule_set.apply(1000, {'fabric_type': 'silk', 'urgency_level': 'rush'}), 2310)
+        self.assertEqual(rule_set.apply(1000, {'fabric_type': 'silk', 'urgency_level': 'normal'}), 1100)
+        self.assertEqual(rule_set.apply(1000, {'fabric_type': 'cotton', 'urgency_level': 'rush',
+                                               'order_volume': 12}), 1210)
+        self.assertEqual(rule_set.apply(1000, {'fabric_type': 'cotton', 'order_volume': 3}), 1000)
+        self.assertEqual(compile_condition({'and': [silk, {'field': 'x', 'operator': 'bogus'}]})(
+            {'fabric_type': 'silk', 'x': 1}), False)
+
+    def test_index_matches_brute_force(self):
+        rng = np.random.default_rng(5)
+        fields = {
+            'fabric_type': ['silk', 'cotton', 'linen'],
+            'urgency_level': ['normal', 'urgent', 'rush'],
+            'order_volume': [1, 5, 12],
+        }
+
+        def comparison():
+            field = str(rng.choice(list(fields)))
+            values = fields[field]
+            operator = str(rng.choice(['equals', 'in', 'greater_than', 'less_than']))
+            if operator == 'in':
+                value = [values[i] for i in rng.choice(len(values), size=2, replace=False)]
+            elif operator in ('greater_than', 'less_than') and field == 'order_volume':
+                value = int(rng.integers(0, 15))
+            else:
+                value = values[rng.integers(len(values))]
+            return {'field': field, 'operator': operator, 'value': value}
+
+        def condition(depth=0):
+            if depth < 2 and rng.integers(3) == 0:
+                return {str(rng.choice(['and', 'or'])): [condition(depth + 1) for _ in range(2)]}
+            return comparison()
+
+        rules = [
+            self.rule(f'rule {index}', condition(), {'type': 'add', 'value': index + 1}, priority=int(rng.integers(5)))
+            for index in range(60)
+        ]
+        rules.sort(key=lambda rule: (-rule.priority, rule.name))
+        rule_set = CompiledRuleSet(rules)
+        predicates = [compile_condition(rule.condition) for rule in rules]
+
+        for _ in range(300):
+            features = {field: values[rng.integers(len(values))] for field, values in fields.items()
+                        if rng.integers(4)}
+            matching = [position for position, predicate in enumerate(predicates) if predicate(features)]
+            candidates = rule_set.candidates(features)
+            # The index never drops a rule that matches
+            self.assertLessEqual(set(matching), set(candidates))
+            self.assertEqual(
+                rule_set.apply(0, features),
+                sum(rules[position].action['value'] for position in matching)
+            )
+
+    def test_rule_changes_invalidate_compiled_rules(self):
+        condition = {'field': 'fabric_type', 'operator': 'equals', 'value': 'silk'}
+        get_rule_set()
+
+        # The signal recompiles in this worker straight away
+        rule = PricingRule.objects.create(name='Silk surcharge', rule_type='if_then', condition=condition,
+                                          action={'type': 'add', 'value': 50})
+        rule_set = get_rule_set()
+        self.assertEqual(rule_set.apply(1000, {'fabric_type': 'silk'}), 1050)
+        with self.assertNumQueries(0):
+            self.assertIs(get_rule_set(), rule_set)
+
+        # Another worker's change arrives through the version stamp once the check interval passes
+        PricingRule.objects.filter(id=rule.id).update(action={'type': 'add', 'value': 80})
+        cache.set(RULES_VERSION_CACHE_KEY, 'changed-elsewhere', timeout=None)
+        self.assertIs(get_rule_set(), rule_set)
+        with mock.patch('ai_pricing.services.rule_engine.time.monotonic',
+                        return_value=time.monotonic() + VERSION_CHECK_INTERVAL):
+            self.assertEqual(get_rule_set().apply(1000, {'fabric_type': 'silk'}), 1080)
+
+        rule.delete()
+        self.assertEqual(get_rule_set().apply(1000, {'fabric_type': 'silk'}), 1000)
+
+
+class ModelFittingTests(SimpleTestCase):
+    """Candidates are updated in place with new rows"""
+
+    def setUp(self):
+        rng = np.random.default_rng(13)
+        self.X = rng.normal(size=(150, 4))
+        self.y = self.X @ np.array([3.0, -2.0, 0.5, 1.0]) + 10 + rng.normal(scale=0.1, size=150)
+
+    def test_plan_parallelism_splits_cores(self):
+        self.assertEqual(plan_parallelism(1), (1, dict.fromkeys(CANDIDATE_MODELS, 1)))
+        self.assertEqual(plan_parallelism(2)[0], 2)
+        # Cores beyond one per candidate go to the threaded estimators
+        processes, n_jobs = plan_parallelism(8)
+        self.assertEqual(processes, len(CANDIDATE_MODELS))
+        self.assertEqual(n_jobs['random_forest'], 5)
+        self.assertEqual(n_jobs['ridge'], 1)
+
+    def test_parallel_fit_with_cross_validation_selects_a_model(self):
+        X_train, X_test, y_train, y_test = self.X[:120], self.X[120:], self.y[:120], self.y[120:]
+        scaler = StandardScaler().fit(X_train)
+
+        results = {
+            name: (model, metrics)
+            for name, model, metrics in fit_candidates(
+                X_train, scaler.transform(X_train), y_train, scaler.transform(X_test), y_test,
+                cores=2, cv_folds=2
+            )
+        }
+        self.assertEqual(set(results), set(CANDIDATE_MODELS))
+        for model, metrics in results.values():
+            self.assertIn('cv_r2_mean', metrics)
+            self.assertEqual(model.predict(scaler.transform(X_test)).shape, y_test.shape)
+
+        # The data is linear, so a linear candidate wins on cross-validated R2
+        best = max(results, key=lambda name: selection_score(results[name][1]))
+        self.assertIn(best, ('linear', 'ridge'))
+        self.assertGreater(results[best][1]['cv_r2_mean'], 0.99)
+
+    def test_warm_start_grows_ensembles_in_proportion(self):
+        for name, model in (('random_forest', RandomForestRegressor(n_estimators=10, random_state=0)),
+                            ('gradient_boosting', GradientBoostingRegressor(n_estimators=20, random_state=0))):
+            model.fit(self.X[:100], self.y[:100])
+            state = {'rows_seen': 100, 'base_estimators': model.n_estimators}
+
+            # Half as many rows again adds half as many trees or stages
+            model, state = update_candidate(name, model, self.X[100:], self.y[100:], state)
+            expected = 15 if name == 'random_forest' else 30
+            self.assertEqual((model.n_estimators, len(model.estimators_)), (expected, expected))
+            self.assertEqual(state['rows_seen'], 150)
+
+    def test_linear_update_matches_full_fit(self):
+        for name, model in (('linear', LinearRegression()), ('ridge', Ridge(alpha=1.0))):
+            model.fit(self.X[:100], self.y[:100])
+            state = {'rows_seen': 100, 'linear_stats': linear_stats(self.X[:100], self.y[:100])}
+
+            # Two batches folded in give the fit on all the rows at once
+            model, state = update_candidate(name, model, self.X[100:120], self.y[100:120], state)
+            model, state = update_candidate(name, model, self.X[120:], self.y[120:], state)
+            full = type(model)(**model.get_params()).fit(self.X, self.y)
+            np.testing.assert_allclose(model.coef_, full.coef_, rtol=1e-8)
+            self.assertAlmostEqual(model.intercept_, full.intercept_, places=8)
+            self.assertEqual(state['linear_stats']['n'], 150)
+
+
+@override_settings(AI_PRICING_FEATURE_SNAPSHOT=False, AI_PRICING_TRAINING_CORES=1, AI_PRICING_TRAINING_CV_FOLDS=0)
+class IncrementalTrainingTests(TestCase):
+    """Incremental updates learn from new rows and recalibrate on held-out ones"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = ServiceCategory.objects.create(name='Blouses')
+        cls.service = Service.objects.create(
+            category=category, name='Designer Blouse', description='Lined blouse',
+            difficulty_level='advanced', estimated_days=5
+        )
+        cls.area = PricingArea.objects.create(name='Koramangala', multiplier=Decimal('1.20'))
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = ArtifactStore(tmp.name)
+        for patcher in (mock.patch('ai_pricing.services.pricing_ml.artifact_store', self.store),
+                        mock.patch.object(model_registry, 'store', self.store)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(model_registry.clear)
+        self.rng = np.random.default_rng(17)
+
+    def add_history(self, count):
+        base_prices = self.rng.uniform(400, 2000, size=count).round(2)
+        PricingHistory.objects.bulk_create([
+            PricingHistory(
+                service=self.service, area=self.area, base_price=base_price,
+                final_price=round(base_price * 1.2 + self.rng.normal(scale=40), 2),
+                factors={}, order_volume=int(self.rng.integers(1, 12))
+            )
+            for base_price in base_prices
+        ])
+
+    def train(self, mode):
+        result = PricingMLService().train_pricing_model(mode=mode)
+        self.assertEqual(result['status'], 'success', result)
+        return self.store.read_manifest(result['bundle_id'])
+
+    def test_incremental_update_recalibrates_on_new_rows(self):
+        self.add_history(80)
+        parent = self.train('full')
+        self.assertEqual(parent['training_state']['mode'], 'full')
+
+        self.add_history(60)
+        child = self.train('incremental')
+        state = child['training_state']
+        self.assertEqual(state['mode'], 'incremental')
+        self.assertEqual(state['parent_bundle'], parent['bundle_id'])
+        self.assertEqual(state['high_water_id'], PricingHistory.objects.latest('id').id)
+        # 12 of the 60 new rows are held out for calibration, not learned from
+        self.assertEqual(state['rows_seen'], parent['training_state']['rows_seen'] + 48)
+        self.assertIn('holdout_mae', child['metrics'])
+        self.assertNotEqual(child['uncertainty'], parent['uncertainty'])
+        self.assertEqual(self.store.current(), child['bundle_id'])
+
+        # Too few new rows for a holdout: all are learned from, the calibration is kept
+        self.add_history(5)
+        grandchild = self.train('incremental')
+        self.assertEqual(grandchild['training_state']['rows_seen'], state['rows_seen'] + 5)
+        self.assertEqual(grandchild['uncertainty'], child['uncertainty'])
+
+
+class ImportCostTests(SimpleTestCase):
+    """Loading the URLconf must not drag in the ML stack"""
+
+    def test_urls_do_not_import_ml_stack(self):
+        script = (
+            "import sys, django; django.setup(); import silaiwala_backend.urls; "
+            "print(sorted(m for m in ('numpy', 'pandas', 'sklearn', 'joblib') if m in sys.modules))"
+        )
+        result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True,
+                                env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'silaiwala_backend.settings'})
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip().splitlines()[-1], '[]')
+
+
+class PricingRecordBufferTests(TransactionTestCase):
+    """Quote records are coalesced per key and upserted off the quote path"""
+
+    def setUp(self):
+        category = ServiceCategory.objects.create(name='Blouses')
+        self.service = Service.objects.create(
+            category=category, name='Designer Blouse', description='Lined blouse',
+            difficulty_level='advanced', estimated_days=5
+        )
+        self.area = PricingArea.objects.create(name='Koramangala', multiplier=Decimal('1.20'))
+        self.other_area = PricingArea.objects.create(name='Indiranagar', multiplier=Decimal('1.10'))
+
+    def add(self, buffer, area, price, version='v1.0'):
+        buffer.add(self.service.id, area.id, version, 800.0, price, 0.9, {'fabric_type': 'silk'})
+
+    def wait_for_timer(self, buffer):
+        timer = buffer._timer
+        if timer is not None:
+            timer.join(5)
+
+    def test_records_are_coalesced_and_upserted(self):
+        buffer = PricingRecordBuffer(flush_interval=60, max_pending=100)
+        DynamicPricing.objects.create(
+            service=self.service, area=self.area, base_price=800, calculated_price=700,
+            confidence_score=0.5, factors_applied={}, pricing_version='v1.0'
+        )
+        self.add(buffer, self.area, 900.0)
+        self.add(buffer, self.area, 950.0)
+        self.add(buffer, self.other_area, 880.0)
+
+        # One INSERT ... ON CONFLICT DO UPDATE inside its own transaction
+        with self.assertNumQueries(3):
+            self.assertEqual(buffer.flush(), 2)
+        self.assertIsNone(buffer._timer)
+
+        # The latest quote per key wins and the existing row is updated in place
+        self.assertEqual(DynamicPricing.objects.count(), 2)
+        record = DynamicPricing.objects.get(area=self.area)
+        self.assertEqual((record.calculated_price, record.confidence_score), (Decimal('950.00'), 0.9))
+        self.assertEqual(buffer.flush(), 0)
+
+    def test_record_id_is_known_before_the_flush(self):
+        buffer = PricingRecordBuffer(flush_interval=60, max_pending=100)
+        first = buffer.add(self.service.id, self.area.id, 'v1.0', 800.0, 900.0, 0.9, {})
+        second = buffer.add(self.service.id, self.area.id, 'v1.0', 800.0, 950.0, 0.9, {})
+        other = buffer.add(self.service.id, self.other_area.id, 'v1.0', 800.0, 880.0, 0.9, {})
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+
+        buffer.flush()
+        self.assertEqual(DynamicPricing.objects.get(record_id=first).calculated_price, Decimal('950.00'))
+        self.assertEqual(DynamicPricing.objects.get(record_id=other).area, self.other_area)
+
+    def test_timer_flushes_pending_records(self):
+        buffer = PricingRecordBuffer(flush_interval=0.05, max_pending=100)
+        self.add(buffer, self.area, 900.0)
+        self.wait_for_timer(buffer)
+        self.assertEqual(DynamicPricing.objects.get(area=self.area).calculated_price, Decimal('900.00'))
+
+    def test_full_buffer_flushes_off_the_quote_path(self):
+        buffer = PricingRecordBuffer(flush_interval=60, max_pending=2)
+        with self.assertNumQueries(0):
+            self.add(buffer, self.area, 900.0)
+            self.add(buffer, self.other_area, 880.0)
+        self.assertTrue(buffer._flush_now)
+
+        self.wait_for_timer(buffer)
+        self.assertEqual(DynamicPricing.objects.count(), 2)
+
+    def test_pending_records_flushed_at_exit(self):
+        script = (
+            "import django; django.setup(); from unittest import mock; "
+            "from ai_pricing.services import pricing_records; "
+            "mock.patch.object(pricing_records.DynamicPricing.objects, 'bulk_create', "
+            "side_effect=lambda records, **kwargs: print('flushed', len(records))).start(); "
+            "pricing_records.pricing_record_buffer.add(1, 1, 'v1.0', 800.0, 900.0, 0.9, {}); "
+            "pricing_records.pricing_record_buffer.add(1, 2, 'v1.0', 800.0, 880.0, 0.9, {})"
+        )
+        result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True,
+                                env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'silaiwala_backend.settings'})
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), 'flushed 2')
+
+
+@override_settings(AI_PRICING_FEATURE_SNAPSHOT=False)
+class TrainingJobTests(TestCase):
+    """Training is queued by the API and reported back through the job"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user(username='ops', password='secret'))
+
+    def test_queue_run_and_poll(self):
+        response = self.client.post('/api/ai-pricing/train-model/')
+        self.assertEqual(response.status_code, 202)
+        job_id = response.data['job_id']
+
+        # A second request joins the queued job instead of adding another
+        response = self.client.post('/api/ai-pricing/train-model/')
+        self.assertEqual(response.data['job_id'], job_id)
+
+        job = claim_next_job()
+        self.assertEqual(str(job.id), job_id)
+        self.assertIsNone(claim_next_job())
+        run_training_job(job)
+
+        response = self.client.get(f'/api/ai-pricing/train-model/{job_id}/')
+        self.assertEqual(response.data['job']['status'], 'failed')
+        self.assertEqual(response.data['job']['error'], 'Insufficient data for training')
+
+    def test_full_retrain_is_not_merged_into_auto_job(self):
+        queued, created = enqueue_training_job('auto')
+        self.assertTrue(created)
+
+        # An explicit full retrain upgrades the waiting job; a later auto request joins it
+        job, created = enqueue_training_job('full')
+        self.assertEqual((job.id, job.mode, created), (queued.id, 'full', False))
+        self.assertEqual(enqueue_training_job('auto')[0].mode, 'full')
+
+        # A running auto job does not cover a full retrain, which queues behind it
+        TrainingJob.objects.filter(id=queued.id).update(mode='auto')
+        running = claim_next_job()
+        job, created = enqueue_training_job('full')
+        self.assertTrue(created)
+        self.assertNotEqual(job.id, running.id)
+        self.assertEqual(enqueue_training_job('incremental')[0].id, job.id)
+
+    def test_single_queued_job_enforced_by_database(self):
+        TrainingJob.objects.create(mode='auto')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            TrainingJob.objects.create(mode='full')
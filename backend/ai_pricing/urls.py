@@ -6,11 +6,14 @@ app_name = 'ai_pricing'
 urlpatterns = [
     # Pricing calculation endpoints
     path('calculate-price/', views.calculate_dynamic_price, name='calculate_dynamic_price'),
+    path('calculate-prices/', views.calculate_dynamic_prices, name='calculate_dynamic_prices'),
     path('service/<int:service_id>/pricing/', views.get_service_pricing, name='get_service_pricing'),
     path('service/<int:service_id>/recommendations/', views.get_pricing_recommendations, name='get_pricing_recommendations'),
+    path('recommendations/', views.get_catalogue_recommendations, name='get_catalogue_recommendations'),
     
     # ML model endpoints
     path('train-model/', views.train_pricing_model, name='train_pricing_model'),
+    path('train-model/<uuid:job_id>/', views.get_training_job, name='get_training_job'),
     
     # Data endpoints
     path('factors/', views.get_pricing_factors, name='get_pricing_factors'),
@@ -8,15 +8,19 @@ import logging
 
 from services.models import Service, PricingArea
 from orders.models import OrderItem
-from .services.pricing_calculator import SmartPricingService
-from .services.pricing_ml import PricingMLService, PricingOptimizationService
+from .services import get_optimization_service, get_pricing_service
+from .services.request_context import PricingRequestContext
+from .services.training_jobs import enqueue_training_job
 from .models import (
     PricingFactor, PricingRule, PricingHistory, 
-    DynamicPricing, CustomerPricingProfile
+    DynamicPricing, CustomerPricingProfile, TrainingJob
 )
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on quotes accepted by the batch pricing endpoint
+MAX_BATCH_QUOTES = 1000
+
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -34,14 +38,30 @@ def calculate_dynamic_price(request):
                 'message': 'service_id and area_id are required'
             }, status=status.HTTP_400_BAD_REQUEST)
         
+        pricing_service = get_pricing_service()
+        
+        # Default-context quotes come straight from the precomputed matrix
+        precomputed = pricing_service.get_precomputed_price(
+            service_id, area_id, customer_id, order_context
+        )
+        if precomputed is not None:
+            return Response(precomputed, status=status.HTTP_200_OK)
+        
+        # Load service, area, base pricing and customer profile once
+        request_context = PricingRequestContext.load(
+            [(service_id, area_id)], [customer_id]
+        )
+        
         # Validate service and area exist
-        service = get_object_or_404(Service, id=service_id)
-        area = get_object_or_404(PricingArea, id=area_id)
+        if request_context.get_service(service_id) is None or request_context.get_area(area_id) is None:
+            return Response({
+                'status': 'error',
+                'message': 'Service or area not found'
+            }, status=status.HTTP_404_NOT_FOUND)
         
         # Calculate dynamic price
-        pricing_service = SmartPricingService()
         result = pricing_service.calculate_dynamic_price(
-            service_id, area_id, customer_id, order_context
+            service_id, area_id, customer_id, order_context, request_context
         )
         
         if result['status'] == 'success':
@@ -57,6 +77,69 @@ def calculate_dynamic_price(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def calculate_dynamic_prices(request):
+    """Calculate dynamic prices for many service/area pairs in one request"""
+    try:
+        items = request.data.get('items')
+        
+        if items is None:
+            # Expand a service_ids x area_ids grid sharing one customer/context
+            service_ids = request.data.get('service_ids') or []
+            area_ids = request.data.get('area_ids') or []
+            customer_id = request.data.get('customer_id')
+            order_context = request.data.get('order_context', {})
+            items = [
+                {
+                    'service_id': service_id,
+                    'area_id': area_id,
+                    'customer_id': customer_id,
+                    'order_context': order_context
+                }
+                for service_id in service_ids
+                for area_id in area_ids
+            ]
+        
+        if not items or not all(
+            isinstance(item, dict) and item.get('service_id') and item.get('area_id')
+            for item in items
+        ):
+            return Response({
+                'status': 'error',
+                'message': 'items (or service_ids and area_ids) with service_id and area_id are required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        if len(items) > MAX_BATCH_QUOTES:
+            return Response({
+                'status': 'error',
+                'message': f'A batch may contain at most {MAX_BATCH_QUOTES} quotes'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        pricing_service = get_pricing_service()
+        results = pricing_service.calculate_dynamic_prices([
+            {
+                'service_id': item['service_id'],
+                'area_id': item['area_id'],
+                'customer_id': item.get('customer_id'),
+                'order_context': item.get('order_context', {})
+            }
+            for item in items
+        ])
+        
+        return Response({
+            'status': 'success',
+            'results': results
+        }, status=status.HTTP_200_OK)
+        
+    except Exception as e:
+        logger.error(f"Error in calculate_dynamic_prices: {str(e)}")
+        return Response({
+            'status': 'error',
+            'message': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_service_pricing(request, service_id):
@@ -66,11 +149,12 @@ def get_service_pricing(request, service_id):
         areas = PricingArea.objects.filter(is_active=True)
         
         pricing_data = []
-        pricing_service = SmartPricingService()
+        pricing_service = get_pricing_service()
+        results = pricing_service.calculate_dynamic_prices([
+            {'service_id': service.id, 'area_id': area.id} for area in areas
+        ])
         
-        for area in areas:
-            result = pricing_service.calculate_dynamic_price(service_id, area.id)
-            
+        for area, result in zip(areas, results):
             if result['status'] == 'success':
                 pricing_data.append({
                     'area_id': area.id,
@@ -110,7 +194,7 @@ def get_pricing_recommendations(request, service_id):
     try:
         service = get_object_or_404(Service, id=service_id)
         
-        optimization_service = PricingOptimizationService()
+        optimization_service = get_optimization_service()
         result = optimization_service.optimize_pricing_for_service(service_id)
         
         if result['status'] == 'success':
@@ -126,27 +210,65 @@ def get_pricing_recommendations(request, service_id):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_catalogue_recommendations(request):
+    """Get pricing recommendations for every active service (or ?service_ids=1,2,3) in one pass"""
+    try:
+        service_ids = None
+        if request.query_params.get('service_ids'):
+            try:
+                service_ids = [int(value) for value in request.query_params['service_ids'].split(',')]
+            except ValueError:
+                return Response({
+                    'status': 'error',
+                    'message': 'service_ids must be a comma-separated list of integers'
+                }, status=status.HTTP_400_BAD_REQUEST)
+        
+        optimization_service = get_optimization_service()
+        result = optimization_service.optimize_pricing_for_services(service_ids)
+        
+        if result['status'] != 'success':
+            return Response(result, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'status': 'success',
+            'count': len(result['services']),
+            'services': [
+                dict(optimized, service_id=service_id)
+                for service_id, optimized in result['services'].items()
+            ]
+        }, status=status.HTTP_200_OK)
+        
+    except Exception as e:
+        logger.error(f"Error in get_catalogue_recommendations: {str(e)}")
+        return Response({
+            'status': 'error',
+            'message': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def train_pricing_model(request):
-    """Train the ML pricing model"""
+    """Queue background training of the ML pricing model"""
     try:
-        ml_service = PricingMLService()
-        result = ml_service.train_pricing_model()
-        
-        if result['status'] == 'success':
+        mode = request.data.get('mode', 'full')
+        if mode not in dict(TrainingJob.MODE_CHOICES):
             return Response({
-                'status': 'success',
-                'message': 'Pricing model trained successfully',
-                'model_info': {
-                    'best_model': result['best_model'],
-                    'metrics': result['metrics'],
-                    'model_version': ml_service.model_version
-                }
-            }, status=status.HTTP_200_OK)
-        else:
-            return Response(result, status=status.HTTP_400_BAD_REQUEST)
-            
+                'status': 'error',
+                'message': 'mode must be one of: full, incremental, auto'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        job, created = enqueue_training_job(mode)
+        
+        return Response({
+            'status': 'success',
+            'message': 'Training job queued' if created else 'A training job is already in progress',
+            'job_id': str(job.id),
+            'job': _training_job_data(job)
+        }, status=status.HTTP_202_ACCEPTED)
+        
     except Exception as e:
         logger.error(f"Error in train_pricing_model: {str(e)}")
         return Response({
@@ -155,6 +277,48 @@ def train_pricing_model(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_training_job(request, job_id):
+    """Get progress and results of a training job"""
+    try:
+        job = TrainingJob.objects.filter(id=job_id).first()
+        if job is None:
+            return Response({
+                'status': 'error',
+                'message': 'Training job not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        return Response({
+            'status': 'success',
+            'job': _training_job_data(job)
+        }, status=status.HTTP_200_OK)
+        
+    except Exception as e:
+        logger.error(f"Error in get_training_job: {str(e)}")
+        return Response({
+            'status': 'error',
+            'message': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def _training_job_data(job: TrainingJob) -> dict:
+    return {
+        'id': str(job.id),
+        'mode': job.mode,
+        'status': job.status,
+        'progress': job.progress,
+        'stage': job.stage,
+        'model_results': job.model_results,
+        'best_model': job.best_model or None,
+        'bundle_id': job.bundle_id or None,
+        'error': job.error or None,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at
+    }
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_pricing_factors(request):
@@ -248,7 +412,7 @@ def get_customer_pricing_profile(request, customer_id):
             profile = CustomerPricingProfile.objects.get(customer=customer)
         except CustomerPricingProfile.DoesNotExist:
             # Create profile if it doesn't exist
-            pricing_service = SmartPricingService()
+            pricing_service = get_pricing_service()
             profile = pricing_service._get_or_create_customer_profile(customer)
         
         profile_data = {
@@ -293,7 +457,7 @@ def update_pricing_history_from_order(request):
         
         order_item = get_object_or_404(OrderItem, id=order_item_id)
         
-        pricing_service = SmartPricingService()
+        pricing_service = get_pricing_service()
         pricing_service.update_pricing_history(order_item)
         
         return Response({
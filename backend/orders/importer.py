@@ -0,0 +1,141 @@
+"""Bulk order import, e.g. order feeds from partner boutiques.
+
+Orders are validated one by one with ``OrderImportSerializer``, which makes
+no queries. They are then written in chunks, one transaction per chunk.
+Each chunk costs a fixed number of queries however many orders it holds:
+
+- service pricings, fetched in one query
+- customers, matched by phone, with the missing ones added by one
+  ``bulk_create``
+- a block of order numbers from the day's sequence
+- one ``bulk_create`` for the orders and one for their items
+
+Item and order totals are computed in memory. Invalid orders are reported
+by index and the rest are still imported. A chunk that fails in the
+database is rolled back as a whole. Its orders are reported by index, and
+the following chunks are still imported, so a caller can retry exactly the
+reported rows.
+"""
+import logging
+from itertools import chain
+from typing import Dict, Iterable, List, Tuple
+
+from django.db import DatabaseError, transaction
+
+from appointments.models import Customer
+from services.models import ServicePricing
+from .models import Order, OrderItem
+from .numbering import allocate_order_numbers
+from .serializers import OrderImportSerializer
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = 500
+
+
+def import_orders(rows: Iterable[Dict], chunk_size: int = IMPORT_CHUNK_SIZE) -> Dict:
+    """Create orders with their items; returns created count, order numbers and errors"""
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    rows = list(rows)
+    summary = {'created': 0, 'order_numbers': [], 'errors': []}
+    for start in range(0, len(rows), chunk_size):
+        _import_chunk(rows[start:start + chunk_size], start, summary)
+    return summary
+
+
+def _customers_by_phone(customers: List[Dict]) -> Dict[str, Customer]:
+    """Existing customers by phone, creating the missing ones (first row for a phone wins)"""
+    by_phone = {}
+    for data in customers:
+        by_phone.setdefault(data['phone'], data)
+
+    existing = Customer.objects.in_bulk(list(by_phone), field_name='phone')
+    missing = [Customer(**data) for phone, data in by_phone.items() if phone not in existing]
+    if missing:
+        # Another import may add the same phone meanwhile; read back whichever row won
+        Customer.objects.bulk_create(missing, ignore_conflicts=True)
+        existing = Customer.objects.in_bulk(list(by_phone), field_name='phone')
+    return existing
+
+
+def _import_chunk(rows: List[Dict], offset: int, summary: Dict) -> None:
+    valid = []
+    for index, row in enumerate(rows, start=offset):
+        serializer = OrderImportSerializer(data=row)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            summary['errors'].append({'index': index, 'errors': serializer.errors})
+
+    pricing_ids = {item['service_pricing'] for _, data in valid for item in data['items']}
+    pricings = ServicePricing.objects.only('id', 'service_id', 'final_price').in_bulk(pricing_ids) if pricing_ids else {}
+
+    ready = []
+    for index, data in valid:
+        unknown = sorted({item['service_pricing'] for item in data['items']} - set(pricings))
+        if unknown:
+            summary['errors'].append({'index': index, 'errors': {'items': [f"Unknown service_pricing: {unknown}"]}})
+        else:
+            ready.append((index, data))
+
+    if not ready:
+        return
+
+    try:
+        orders, numbers = _write_chunk(ready, pricings)
+    except DatabaseError as e:
+        logger.error(f"Error importing orders {ready[0][0]}-{ready[-1][0]}: {str(e)}")
+        summary['errors'].extend(
+            {'index': index, 'errors': {'non_field_errors': [f"Not imported, database error: {str(e)}"]}}
+            for index, _ in ready
+        )
+        return
+
+    summary['created'] += len(orders)
+    summary['order_numbers'].extend(numbers)
+    logger.info(f"Imported {len(orders)} orders")
+
+
+def _write_chunk(ready: List, pricings: Dict) -> Tuple[List[Order], List[str]]:
+    """Write a chunk's customers, orders and items in one transaction"""
+    with transaction.atomic():
+        customers = _customers_by_phone([data['customer'] for _, data in ready])
+        numbers = allocate_order_numbers(len(ready))
+
+        orders = []
+        order_items = []
+        for (_, data), number in zip(ready, numbers):
+            items = []
+            for item_data in data['items']:
+                pricing = pricings[item_data['service_pricing']]
+                unit_price = item_data.get('unit_price', pricing.final_price)
+                items.append(OrderItem(
+                    service_id=pricing.service_id,
+                    service_pricing_id=pricing.id,
+                    quantity=item_data['quantity'],
+                    unit_price=unit_price,
+                    total_price=unit_price * item_data['quantity'],
+                    specifications=item_data['specifications'],
+                    fabric_details=item_data['fabric_details'],
+                    color=item_data['color'],
+                    size=item_data['size']
+                ))
+
+            orders.append(Order(
+                order_number=number,
+                customer=customers[data['customer']['phone']],
+                total_amount=sum(item.total_price for item in items),
+                expected_delivery_date=data['expected_delivery_date'],
+                special_instructions=data['special_instructions'],
+                notes=data['notes']
+            ))
+            order_items.append(items)
+
+        Order.objects.bulk_create(orders)
+        for order, items in zip(orders, order_items):
+            for item in items:
+                item.order = order
+        OrderItem.objects.bulk_create(list(chain.from_iterable(order_items)))
+
+    return orders, numbers
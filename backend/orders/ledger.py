@@ -0,0 +1,244 @@
+"""Payment ledger: records payments and keeps order totals in step.
+
+A payment is inserted and its order's ``paid_amount`` and ``payment_status``
+are advanced in the same transaction. The advance is one conditional
+``UPDATE``::
+
+    paid_amount = paid_amount + <amount>,
+    payment_status = CASE WHEN total_amount <= paid_amount + <amount>
+                          THEN 'paid' ELSE 'partial' END
+
+The database computes both columns from the row's current values, so
+concurrent payments for one order queue on its row lock and none is lost.
+No other column is written. The ledger is the only writer of both columns:
+the order API exposes them read-only and saves only the columns it edits.
+
+A non-empty ``transaction_id`` is unique across payments. Replaying a
+gateway callback returns the payment already recorded instead of counting
+it twice. ``settle_payments`` imports a settlement file with a fixed number
+of queries per batch.
+"""
+import logging
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, List, Tuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+from .models import Order, Payment
+
+logger = logging.getLogger(__name__)
+
+PAYMENT_METHODS = {method for method, _ in Payment.PAYMENT_METHODS}
+SETTLEMENT_BATCH_SIZE = 500
+
+
+class LedgerError(Exception):
+    """A payment that cannot be recorded"""
+
+
+def _amount(value) -> Decimal:
+    try:
+        amount = Decimal(str(value)).quantize(Decimal('0.01'))
+    except (InvalidOperation, TypeError, ValueError):
+        raise LedgerError(f"Invalid amount: {value!r}")
+    if amount <= 0:
+        raise LedgerError("amount must be positive")
+    return amount
+
+
+def _payment_method(value) -> str:
+    if value not in PAYMENT_METHODS:
+        raise LedgerError(f"payment_method must be one of: {', '.join(sorted(PAYMENT_METHODS))}")
+    return value
+
+
+def _apply_to_orders(amounts: Dict[int, Decimal]) -> int:
+    """Add each order's payments to its totals in one conditional UPDATE"""
+    if not amounts:
+        return 0
+    return Order.objects.filter(id__in=amounts).update(
+        paid_amount=Case(
+            *[When(id=order_id, then=F('paid_amount') + Value(amount)) for order_id, amount in amounts.items()],
+            default=F('paid_amount')
+        ),
+        payment_status=Case(
+            *[
+                When(id=order_id, total_amount__lte=F('paid_amount') + Value(amount), then=Value('paid'))
+                for order_id, amount in amounts.items()
+            ],
+            default=Value('partial')
+        ),
+        updated_at=timezone.now()
+    )
+
+
+def refresh_payment_status(order_id: int) -> int:
+    """Recompute an order's payment_status from its totals, e.g. after total_amount changed"""
+    return Order.objects.filter(id=order_id).exclude(payment_status='refunded').update(
+        payment_status=Case(
+            When(paid_amount__lte=0, then=Value('pending')),
+            When(total_amount__lte=F('paid_amount'), then=Value('paid')),
+            default=Value('partial')
+        )
+    )
+
+
+def record_payment(order_id: int, amount, payment_method: str, transaction_id: str = '',
+                   notes: str = '') -> Tuple[Payment, bool]:
+    """Record one payment; returns ``(payment, created)``
+
+    A ``transaction_id`` that was already recorded returns that payment with
+    ``created=False`` and leaves the order untouched.
+    """
+    amount = _amount(amount)
+    payment_method = _payment_method(payment_method)
+    transaction_id = (transaction_id or '').strip()
+
+    with transaction.atomic():
+        if transaction_id:
+            existing = Payment.objects.filter(transaction_id=transaction_id).first()
+            if existing is not None:
+                return _replayed(existing, order_id), False
+
+        try:
+            with transaction.atomic():
+                payment = Payment.objects.create(
+                    order_id=order_id,
+                    amount=amount,
+                    payment_method=payment_method,
+                    transaction_id=transaction_id,
+                    notes=notes
+                )
+        except IntegrityError:
+            # A concurrent callback recorded the same transaction first
+            existing = Payment.objects.filter(transaction_id=transaction_id).first() if transaction_id else None
+            if existing is None:
+                raise LedgerError(f"Order {order_id} not found")
+            return _replayed(existing, order_id), False
+
+        if not _apply_to_orders({payment.order_id: amount}):
+            raise LedgerError(f"Order {order_id} not found")
+
+    return payment, True
+
+
+def _replayed(payment: Payment, order_id: int) -> Payment:
+    if payment.order_id != int(order_id):
+        raise LedgerError(f"transaction_id {payment.transaction_id} belongs to another order")
+    return payment
+
+
+def settle_payments(entries: Iterable[Dict], batch_size: int = SETTLEMENT_BATCH_SIZE) -> Dict:
+    """Import settled payments in bulk
+
+    Each entry has ``amount``, ``payment_method``, ``order_id`` or
+    ``order_number`` and optionally ``transaction_id`` and ``notes``. Per
+    batch there is one query for the orders, one for the known transaction
+    ids, one ``bulk_create`` and one ``UPDATE`` of the orders. Entries with
+    a recorded ``transaction_id`` are skipped; invalid entries are reported
+    and the rest are still imported.
+    """
+    entries = list(entries)
+    summary = {'created': 0, 'duplicates': [], 'errors': []}
+    for start in range(0, len(entries), batch_size):
+        _settle_batch(entries[start:start + batch_size], start, summary)
+    return summary
+
+
+def _order_key(entry: Dict):
+    if entry.get('order_id'):
+        try:
+            return int(entry['order_id'])
+        except (TypeError, ValueError):
+            raise LedgerError(f"Invalid order_id: {entry['order_id']!r}")
+    if entry.get('order_number'):
+        return str(entry['order_number'])
+    raise LedgerError("order_id or order_number is required")
+
+
+def _settle_batch(entries: List[Dict], offset: int, summary: Dict) -> None:
+    keys = {}
+    for index, entry in enumerate(entries):
+        try:
+            keys[index] = _order_key(entry)
+        except LedgerError as e:
+            keys[index] = e
+
+    ids = {key for key in keys.values() if isinstance(key, int)}
+    numbers = {key for key in keys.values() if isinstance(key, str)}
+    orders = {}
+    if ids or numbers:
+        for order_id, order_number in Order.objects.filter(
+            Q(id__in=ids) | Q(order_number__in=numbers)
+        ).values_list('id', 'order_number'):
+            orders[order_id] = order_id
+            orders[order_number] = order_id
+
+    transaction_ids = {
+        str(entry['transaction_id']).strip() for entry in entries if entry.get('transaction_id')
+    }
+    known = set(
+        Payment.objects.filter(transaction_id__in=transaction_ids).values_list('transaction_id', flat=True)
+    ) if transaction_ids else set()
+
+    payments = []
+    indexes = []
+    for index, entry in enumerate(entries):
+        try:
+            key = keys[index]
+            if isinstance(key, LedgerError):
+                raise key
+            order_id = orders.get(key)
+            if order_id is None:
+                raise LedgerError(f"Order {key} not found")
+
+            transaction_id = str(entry.get('transaction_id') or '').strip()
+            if transaction_id in known:
+                summary['duplicates'].append(transaction_id)
+                continue
+
+            payments.append(Payment(
+                order_id=order_id,
+                amount=_amount(entry.get('amount')),
+                payment_method=_payment_method(entry.get('payment_method')),
+                transaction_id=transaction_id,
+                notes=entry.get('notes', '')
+            ))
+            indexes.append(offset + index)
+            if transaction_id:
+                known.add(transaction_id)
+        except LedgerError as e:
+            summary['errors'].append({'index': offset + index, 'error': str(e)})
+
+    if not payments:
+        return
+
+    amounts = defaultdict(Decimal)
+    for payment in payments:
+        amounts[payment.order_id] += payment.amount
+
+    try:
+        with transaction.atomic():
+            Payment.objects.bulk_create(payments)
+            _apply_to_orders(amounts)
+        summary['created'] += len(payments)
+    except IntegrityError:
+        # A concurrent callback recorded one of these transactions; settle one by one
+        logger.warning("Settlement batch hit a recorded transaction_id, settling payments one at a time")
+        for index, payment in zip(indexes, payments):
+            try:
+                _, created = record_payment(
+                    payment.order_id, payment.amount, payment.payment_method,
+                    payment.transaction_id, payment.notes
+                )
+            except LedgerError as e:
+                # e.g. the transaction id was recorded for another order
+                summary['errors'].append({'index': index, 'error': str(e)})
+                continue
+            if created:
+                summary['created'] += 1
+            else:
+                summary['duplicates'].append(payment.transaction_id)
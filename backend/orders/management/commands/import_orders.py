@@ -0,0 +1,53 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.importer import IMPORT_CHUNK_SIZE, import_orders
+
+
+class Command(BaseCommand):
+    help = 'Import orders from a JSON file (a list of orders, {"orders": [...]}, or one order per line)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='JSON or JSON Lines file to import')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=IMPORT_CHUNK_SIZE,
+            help='Orders written per transaction',
+        )
+
+    def read_orders(self, path):
+        try:
+            with open(path) as f:
+                text = f.read()
+        except OSError as e:
+            raise CommandError(str(e))
+
+        try:
+            data = json.loads(text)
+        except ValueError:
+            try:
+                return [json.loads(line) for line in text.splitlines() if line.strip()]
+            except ValueError as e:
+                raise CommandError(f'{path} is neither JSON nor JSON Lines: {e}')
+
+        if isinstance(data, dict):
+            data = data.get('orders')
+        if not isinstance(data, list):
+            raise CommandError('Expected a list of orders')
+        return data
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1')
+        rows = self.read_orders(options['path'])
+        self.stdout.write(f'Importing {len(rows)} orders...')
+
+        summary = import_orders(rows, chunk_size=options['chunk_size'])
+
+        for error in summary['errors']:
+            self.stderr.write(f"Order {error['index']}: {json.dumps(error['errors'])}")
+        self.stdout.write(
+            self.style.SUCCESS(f"Imported {summary['created']} orders ({len(summary['errors'])} rejected)")
+        )
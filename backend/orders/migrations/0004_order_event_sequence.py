@@ -0,0 +1,37 @@
+# Generated by Django 5.0.1 on 2026-10-17 02:18
+
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def sequence_existing_events(apps, schema_editor):
+    # Every existing row is committed, so id order is commit order
+    OrderStatusUpdate = apps.get_model('orders', 'OrderStatusUpdate')
+    OrderEventSequence = apps.get_model('orders', 'OrderEventSequence')
+    OrderStatusUpdate.objects.update(sequence=F('id'))
+    last_value = OrderStatusUpdate.objects.aggregate(last=Max('id'))['last'] or 0
+    OrderEventSequence.objects.create(id=1, last_value=last_value)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_payment_transaction_id_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderEventSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_value', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='orderstatusupdate',
+            name='sequence',
+            field=models.PositiveBigIntegerField(editable=False, null=True, unique=True),
+        ),
+        migrations.RunPython(sequence_existing_events, migrations.RunPython.noop),
+    ]
@@ -52,11 +52,9 @@ class Order(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.order_number:
-            # Generate order number
-            import datetime
-            today = datetime.date.today()
-            count = Order.objects.filter(order_date__date=today).count() + 1
-            self.order_number = f"SW{today.strftime('%Y%m%d')}{count:04d}"
+            # Taken from the day's sequence, never by counting the day's orders
+            from .numbering import next_order_number
+            self.order_number = next_order_number()
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -102,6 +100,8 @@ class OrderStatusUpdate(models.Model):
     new_status = models.CharField(max_length=20)
     notes = models.TextField(blank=True)
     updated_by = models.CharField(max_length=200)  # Staff member name
+    # Position in the order event feed, assigned in commit order
+    sequence = models.PositiveBigIntegerField(unique=True, null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -130,6 +130,14 @@ class Payment(models.Model):
 
     class Meta:
         ordering = ['-payment_date']
+        constraints = [
+            # Gateway transaction ids make payment callbacks idempotent
+            models.UniqueConstraint(
+                fields=['transaction_id'],
+                condition=~models.Q(transaction_id=''),
+                name='unique_payment_transaction_id'
+            ),
+        ]
 
     def __str__(self):
         return f"Payment of ₹{self.amount} for Order {self.order.order_number}"
@@ -155,4 +163,26 @@ class Delivery(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"Delivery for Order {self.order.order_number}"
\ No newline at end of file
+        return f"Delivery for Order {self.order.order_number}"
+
+
+class OrderNumberSequence(models.Model):
+    """Last order number handed out for each day"""
+    day = models.DateField(unique=True)
+    last_value = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-day']
+
+    def __str__(self):
+        return f"{self.day} - {self.last_value}"
+
+
+class OrderEventSequence(models.Model):
+    """Last order event sequence number handed out (a single row)"""
+    last_value = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Order events - {self.last_value}"
@@ -0,0 +1,113 @@
+"""Order numbers from a per-day sequence.
+
+Order numbers look like ``SW<YYYYMMDD><n:04d>``. ``n`` comes from the day's
+``OrderNumberSequence`` row, which is advanced with a single
+``UPDATE ... SET last_value = last_value + k``. The database applies that
+atomically, so concurrent checkouts never receive the same number. Each
+allocation costs the same two queries however many orders the day already
+has.
+
+Each worker process reserves a block of ``ORDER_NUMBER_BLOCK_SIZE`` numbers at
+a time and hands them out from memory. Numbers are therefore unique but not
+strictly chronological across workers, and a restarted worker leaves a gap.
+"""
+import os
+import threading
+from collections import deque
+from datetime import date
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.db.models.functions import Length
+from django.utils import timezone
+
+from .models import Order, OrderNumberSequence
+
+ORDER_NUMBER_PREFIX = 'SW'
+DEFAULT_BLOCK_SIZE = 20
+
+
+def format_order_number(day: date, value: int) -> str:
+    return f"{ORDER_NUMBER_PREFIX}{day.strftime('%Y%m%d')}{value:04d}"
+
+
+def _highest_existing_number(day: date) -> int:
+    """Largest number already used on ``day``, so a new sequence continues after it"""
+    prefix = format_order_number(day, 0)[:-4]
+    latest = Order.objects.filter(order_number__startswith=prefix).order_by(
+        Length('order_number').desc(), '-order_number'
+    ).values_list('order_number', flat=True).first()
+    suffix = latest[len(prefix):] if latest else ''
+    return int(suffix) if suffix.isdigit() else 0
+
+
+def _create_sequence(day: date) -> None:
+    try:
+        with transaction.atomic():
+            OrderNumberSequence.objects.create(day=day, last_value=_highest_existing_number(day))
+    except IntegrityError:
+        # Another worker started the day's sequence first
+        pass
+
+
+def allocate_order_numbers(count: int = 1, day: Optional[date] = None) -> List[str]:
+    """Reserve ``count`` consecutive order numbers for ``day`` (today by default)"""
+    if count < 1:
+        return []
+    day = day or timezone.localdate()
+    sequence = OrderNumberSequence.objects.filter(day=day)
+
+    # The UPDATE row-locks the sequence until the transaction ends, so the
+    # value read back is this caller's own
+    with transaction.atomic(savepoint=False):
+        advance = {'last_value': F('last_value') + count, 'updated_at': timezone.now()}
+        if not sequence.update(**advance):
+            _create_sequence(day)
+            sequence.update(**advance)
+        last_value = sequence.values_list('last_value', flat=True).get()
+
+    return [format_order_number(day, value) for value in range(last_value - count + 1, last_value + 1)]
+
+
+class OrderNumberAllocator:
+    """Hands out order numbers from blocks reserved per worker process"""
+
+    def __init__(self, block_size: Optional[int] = None):
+        self.block_size = block_size if block_size is not None else getattr(
+            settings, 'ORDER_NUMBER_BLOCK_SIZE', DEFAULT_BLOCK_SIZE
+        )
+        self._lock = threading.Lock()
+        self._block = deque()
+        self._day = None
+        self._pid = None
+
+    def next(self) -> str:
+        day = timezone.localdate()
+        with self._lock:
+            # A forked worker must not reuse its parent's block
+            if self._day != day or self._pid != os.getpid():
+                self._block.clear()
+
+            if not self._block:
+                if self.block_size <= 1 or connection.in_atomic_block:
+                    # A block reserved inside the caller's transaction would be
+                    # released again if it rolled back; take a single number
+                    return allocate_order_numbers(1, day)[0]
+                self._block.extend(allocate_order_numbers(self.block_size, day))
+                self._day = day
+                self._pid = os.getpid()
+
+            return self._block.popleft()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._block.clear()
+
+
+order_number_allocator = OrderNumberAllocator()
+
+
+def next_order_number() -> str:
+    return order_number_allocator.next()
@@ -0,0 +1,9 @@
+from rest_framework.pagination import CursorPagination
+
+
+class OrderCursorPagination(CursorPagination):
+    """Keyset pagination on (order_date, id): each page costs the same however deep it is"""
+    ordering = ('-order_date', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
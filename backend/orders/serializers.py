@@ -1,6 +1,8 @@
+from django.db import transaction
 from rest_framework import serializers
 from .models import Order, OrderItem, OrderStatusUpdate, Payment, Delivery
 from services.serializers import ServiceSerializer, ServicePricingSerializer
+from appointments.models import Customer
 from appointments.serializers import CustomerSerializer, AppointmentSerializer
 
 
@@ -35,6 +37,36 @@ class OrderSerializer(serializers.ModelSerializer):
             'actual_delivery_date', 'special_instructions', 'notes',
             'items', 'created_at'
         ]
+        # Payment state is written only by the payment ledger
+        read_only_fields = ['paid_amount', 'payment_status']
+
+
+class OrderItemSummarySerializer(serializers.ModelSerializer):
+    service_name = serializers.CharField(source='service.name', read_only=True)
+
+    class Meta:
+        model = OrderItem
+        fields = ['id', 'service', 'service_name', 'quantity', 'unit_price', 'total_price']
+
+
+class OrderListSerializer(serializers.ModelSerializer):
+    """Lean order representation for list pages: items carry the service name only"""
+    items = OrderItemSummarySerializer(many=True, read_only=True)
+    customer_name = serializers.CharField(source='customer.name', read_only=True)
+    customer_phone = serializers.CharField(source='customer.phone', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    payment_status_display = serializers.CharField(source='get_payment_status_display', read_only=True)
+    remaining_amount = serializers.ReadOnlyField()
+
+    class Meta:
+        model = Order
+        fields = [
+            'id', 'order_number', 'customer', 'customer_name', 'customer_phone',
+            'appointment', 'status', 'status_display', 'payment_status',
+            'payment_status_display', 'total_amount', 'paid_amount',
+            'remaining_amount', 'order_date', 'expected_delivery_date',
+            'actual_delivery_date', 'notes', 'items', 'created_at'
+        ]
 
 
 class OrderCreateSerializer(serializers.ModelSerializer):
@@ -53,38 +85,64 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         items_data = validated_data.pop('items')
         customer_data = validated_data.pop('customer_data')
         
-        # Get or create customer
-        customer, created = Customer.objects.get_or_create(
-            phone=customer_data['phone'],
-            defaults=customer_data
-        )
+        # Price the items in memory, then write the order and its items once each
+        items = [OrderItem(**item_data) for item_data in items_data]
+        for item in items:
+            item.total_price = item.unit_price * item.quantity
         
-        # Create order
-        order = Order.objects.create(
-            customer=customer,
-            **validated_data
-        )
-        
-        # Create order items
-        total_amount = 0
-        for item_data in items_data:
-            order_item = OrderItem.objects.create(
-                order=order,
-                **item_data
+        # An order is never left without its items
+        with transaction.atomic():
+            # Get or create customer
+            customer, created = Customer.objects.get_or_create(
+                phone=customer_data['phone'],
+                defaults=customer_data
             )
-            total_amount += order_item.total_price
-        
-        # Update order total
-        order.total_amount = total_amount
-        order.save()
+            
+            order = Order.objects.create(
+                customer=customer,
+                total_amount=sum(item.total_price for item in items),
+                **validated_data
+            )
+            for item in items:
+                item.order = order
+            OrderItem.objects.bulk_create(items)
         
         return order
 
 
+class OrderImportCustomerSerializer(serializers.Serializer):
+    """Customer of an imported order, matched to an existing one by phone"""
+    name = serializers.CharField(max_length=200)
+    phone = serializers.CharField(max_length=17, validators=[Customer.phone_regex])
+    email = serializers.EmailField(required=False, allow_blank=True, allow_null=True)
+    address = serializers.CharField(required=False, allow_blank=True, default='')
+    area = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+
+
+class OrderImportItemSerializer(serializers.Serializer):
+    """Item of an imported order; the unit price defaults to the pricing's final price"""
+    service_pricing = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1, default=1)
+    unit_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    specifications = serializers.JSONField(required=False, default=dict)
+    fabric_details = serializers.CharField(required=False, allow_blank=True, default='')
+    color = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+    size = serializers.CharField(max_length=50, required=False, allow_blank=True, default='')
+
+
+class OrderImportSerializer(serializers.Serializer):
+    """One order in a bulk import; related rows are resolved in bulk by the importer"""
+    customer = OrderImportCustomerSerializer()
+    expected_delivery_date = serializers.DateField()
+    special_instructions = serializers.CharField(required=False, allow_blank=True, default='')
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+    items = OrderImportItemSerializer(many=True, allow_empty=False)
+
+
 class OrderStatusUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = OrderStatusUpdate
-        fields = ['id', 'order', 'old_status', 'new_status', 'notes', 'updated_by', 'created_at']
+        fields = ['id', 'order', 'old_status', 'new_status', 'notes', 'updated_by', 'sequence', 'created_at']
 
 
 class PaymentSerializer(serializers.ModelSerializer):
@@ -1,3 +1,450 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.db import IntegrityError, transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from appointments.models import Customer
+from services.models import PricingArea, Service, ServiceCategory, ServicePricing, ServiceRequirement
+from .importer import import_orders
+from .ledger import LedgerError, record_payment, settle_payments
+from .models import Order, OrderEventSequence, OrderItem, OrderNumberSequence, OrderStatusUpdate, Payment
+from .numbering import OrderNumberAllocator, allocate_order_numbers, format_order_number, order_number_allocator
+from .serializers import OrderCreateSerializer
+from .transitions import TransitionError, events_after, order_status_changed, transition_orders
+from .views import OrderViewSet
+
+
+def create_order(customer, **kwargs):
+    return Order.objects.create(
+        customer=customer, total_amount=Decimal('1500.00'),
+        expected_delivery_date=date.today() + timedelta(days=7), **kwargs
+    )
+
+
+class OrderNumberTests(TestCase):
+    """Order numbers come from the day's sequence, not from counting the day's orders"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customer.objects.create(
+            name='Priya Sharma', phone='+919876543210', address='MG Road', area='Koramangala'
+        )
+
+    def setUp(self):
+        # Blocks reserved by earlier tests refer to sequences that were rolled back
+        order_number_allocator.reset()
+
+    def test_numbers_are_sequential_per_day(self):
+        today = timezone.localdate()
+        first = create_order(self.customer)
+        second = create_order(self.customer)
+
+        self.assertEqual(first.order_number, format_order_number(today, 1))
+        self.assertEqual(second.order_number, format_order_number(today, 2))
+        self.assertEqual(allocate_order_numbers(3, date(2026, 1, 5)),
+                         ['SW202601050001', 'SW202601050002', 'SW202601050003'])
+
+    def test_allocation_query_count(self):
+        today = timezone.localdate()
+        # A sequence started on a day with orders continues after them
+        create_order(self.customer, order_number=format_order_number(today, 41))
+        self.assertEqual(allocate_order_numbers(2), [format_order_number(today, 42), format_order_number(today, 43)])
+
+        # One UPDATE and one read, however many orders the day has
+        with self.assertNumQueries(2):
+            numbers = allocate_order_numbers(5)
+        self.assertEqual(numbers[-1], format_order_number(today, 48))
+
+
+class OrderNumberBlockTests(TransactionTestCase):
+    """Outside a transaction each worker reserves numbers a block at a time"""
+
+    def test_blocks_are_reserved_per_allocator(self):
+        today = timezone.localdate()
+        worker_a = OrderNumberAllocator(block_size=10)
+        worker_b = OrderNumberAllocator(block_size=10)
+
+        self.assertEqual(worker_a.next(), format_order_number(today, 1))
+        self.assertEqual(worker_b.next(), format_order_number(today, 11))
+        with self.assertNumQueries(0):
+            self.assertEqual(worker_a.next(), format_order_number(today, 2))
+        self.assertEqual(OrderNumberSequence.objects.get(day=today).last_value, 20)
+
+
+class PaymentLedgerTests(TestCase):
+    """Payments advance order totals atomically and idempotently"""
+
+    @classmethod
+    def setUpTestData(cls):
+        customer = Customer.objects.create(
+            name='Priya Sharma', phone='+919876543210', address='MG Road', area='Koramangala'
+        )
+        cls.order = create_order(customer)
+        cls.other = create_order(customer)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_payments_update_totals_and_replays_are_ignored(self):
+        url = f'/api/orders/orders/{self.order.id}/add_payment/'
+        payment = {'amount': '500.50', 'payment_method': 'upi', 'transaction_id': 'UPI-1001'}
+
+        response = self.client.post(url, payment, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.paid_amount, self.order.payment_status), (Decimal('500.50'), 'partial'))
+
+        # A replayed gateway callback returns the recorded payment
+        response = self.client.post(url, payment, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.order.payments.count(), 1)
+
+        record_payment(self.order.id, '999.50', 'cash')
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.paid_amount, self.order.payment_status), (Decimal('1500.00'), 'paid'))
+
+        with self.assertRaises(LedgerError):
+            record_payment(self.other.id, '10', 'upi', transaction_id='UPI-1001')
+        response = self.client.post(url, {'amount': '-5', 'payment_method': 'upi'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_settlement_import(self):
+        record_payment(self.order.id, '100', 'card', transaction_id='PG-1')
+        entries = [
+            {'order_id': self.order.id, 'amount': '400', 'payment_method': 'card', 'transaction_id': 'PG-2'},
+            {'order_number': self.other.order_number, 'amount': '1500', 'payment_method': 'upi',
+             'transaction_id': 'PG-3'},
+            {'order_id': self.order.id, 'amount': '100', 'payment_method': 'card', 'transaction_id': 'PG-1'},
+            {'order_id': self.order.id, 'amount': '50', 'payment_method': 'card', 'transaction_id': 'PG-2'},
+            {'order_number': 'SW000', 'amount': '10', 'payment_method': 'cash'},
+        ]
+
+        # Orders, known transaction ids, one insert and one UPDATE (plus the savepoint)
+        with self.assertNumQueries(6):
+            summary = settle_payments(entries)
+
+        self.assertEqual(summary['created'], 2)
+        self.assertEqual(summary['duplicates'], ['PG-1', 'PG-2'])
+        self.assertEqual([error['index'] for error in summary['errors']], [4])
+
+        self.order.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual((self.order.paid_amount, self.order.payment_status), (Decimal('500.00'), 'partial'))
+        self.assertEqual((self.other.paid_amount, self.other.payment_status), (Decimal('1500.00'), 'paid'))
+
+    def test_settlement_fallback_reports_ledger_errors(self):
+        entries = [
+            {'order_id': self.order.id, 'amount': '400', 'payment_method': 'card', 'transaction_id': 'PG-7'},
+            {'order_id': self.other.id, 'amount': '300', 'payment_method': 'card', 'transaction_id': 'PG-8'},
+        ]
+
+        def record(order_id, *args, **kwargs):
+            # A callback recorded PG-8 for another order while the batch was being prepared
+            if order_id == self.other.id:
+                raise LedgerError("transaction_id PG-8 belongs to another order")
+            return record_payment(order_id, *args, **kwargs)
+
+        with mock.patch.object(Payment.objects, 'bulk_create', side_effect=IntegrityError), \
+                mock.patch('orders.ledger.record_payment', side_effect=record):
+            summary = settle_payments(entries)
+
+        self.assertEqual(summary['created'], 1)
+        self.assertEqual(summary['errors'], [{'index': 1, 'error': 'transaction_id PG-8 belongs to another order'}])
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.paid_amount, Decimal('400.00'))
+
+    def test_order_update_keeps_concurrent_payment(self):
+        url = f'/api/orders/orders/{self.order.id}/'
+        get_object = OrderViewSet.get_object
+
+        def get_object_then_pay(view):
+            # A payment lands after the PATCH has read the order
+            order = get_object(view)
+            record_payment(order.id, '500', 'upi')
+            return order
+
+        with mock.patch.object(OrderViewSet, 'get_object', get_object_then_pay):
+            response = self.client.patch(url, {'notes': 'Call before delivery'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['paid_amount'], response.data['payment_status']), ('500.00', 'partial'))
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.notes, 'Call before delivery')
+        self.assertEqual((self.order.paid_amount, self.order.payment_status), (Decimal('500.00'), 'partial'))
+
+    def test_payment_state_is_read_only_on_orders(self):
+        url = f'/api/orders/orders/{self.order.id}/'
+        self.client.patch(url, {'paid_amount': '1500.00', 'payment_status': 'paid'}, format='json')
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.paid_amount, self.order.payment_status), (Decimal('0.00'), 'pending'))
+
+        # Lowering the total below what was paid settles the order
+        record_payment(self.order.id, '1000', 'cash')
+        response = self.client.patch(url, {'total_amount': '900.00'}, format='json')
+        self.assertEqual(response.data['payment_status'], 'paid')
+
+    def test_payments_are_immutable(self):
+        payment, _ = record_payment(self.order.id, '500', 'upi')
+        url = f'/api/orders/payments/{payment.id}/'
+
+        self.assertEqual(self.client.patch(url, {'amount': '5000'}, format='json').status_code, 405)
+        self.assertEqual(self.client.put(url, {'amount': '5000'}, format='json').status_code, 405)
+        self.assertEqual(self.client.delete(url).status_code, 405)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.paid_amount, Decimal('500.00'))
+
+
+class OrderImportTests(TestCase):
+    """A bulk import costs a fixed number of queries per chunk"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = ServiceCategory.objects.create(name='Blouses')
+        service = Service.objects.create(
+            category=category, name='Designer Blouse', description='Lined blouse',
+            difficulty_level='advanced', estimated_days=5
+        )
+        area = PricingArea.objects.create(name='Koramangala', multiplier=Decimal('1.20'))
+        cls.pricing = ServicePricing.objects.create(
+            service=service, area=area, base_price=Decimal('800.00'), final_price=Decimal('960.00')
+        )
+        Customer.objects.create(name='Priya Sharma', phone='+919876543210', address='MG Road', area='Koramangala')
+
+    def setUp(self):
+        order_number_allocator.reset()
+
+    def order_row(self, phone, quantity=1, **item):
+        return {
+            'customer': {'name': 'Boutique customer', 'phone': phone, 'area': 'Koramangala'},
+            'expected_delivery_date': '2026-11-01',
+            'items': [
+                {'service_pricing': self.pricing.id, 'quantity': quantity, **item},
+                {'service_pricing': self.pricing.id, 'unit_price': '150.00', 'color': 'maroon'},
+            ]
+        }
+
+    def test_import_query_count(self):
+        allocate_order_numbers(1)
+        rows = [self.order_row('+919876543210', quantity=index % 3 + 1) for index in range(40)]
+
+        # Pricings, customers, the number block (update + read), orders and items,
+        # plus the chunk's savepoint
+        with self.assertNumQueries(8):
+            summary = import_orders(rows)
+
+        self.assertEqual(summary['created'], 40)
+        self.assertEqual(OrderItem.objects.count(), 80)
+        order = Order.objects.get(order_number=summary['order_numbers'][0])
+        self.assertEqual(order.total_amount, Decimal('1110.00'))
+        self.assertEqual(len(set(summary['order_numbers'])), 40)
+
+    def test_chunk_size_below_one_is_rejected(self):
+        for chunk_size in (0, -1):
+            with self.assertRaises(ValueError):
+                import_orders([self.order_row('+919800000001')], chunk_size=chunk_size)
+        self.assertFalse(Order.objects.exists())
+
+        summary = import_orders([self.order_row('+919800000001')] * 3, chunk_size=1)
+        self.assertEqual(summary['created'], 3)
+
+    def test_failed_chunk_is_reported_and_later_chunks_import(self):
+        rows = [self.order_row(f'+91980000000{index}') for index in range(6)]
+        bulk_create = OrderItem.objects.bulk_create
+        calls = []
+
+        def fail_second_chunk(items, *args, **kwargs):
+            calls.append(len(items))
+            if len(calls) == 2:
+                raise IntegrityError('simulated')
+            return bulk_create(items, *args, **kwargs)
+
+        with mock.patch.object(OrderItem.objects, 'bulk_create', side_effect=fail_second_chunk):
+            with self.assertLogs('orders.importer', 'ERROR'):
+                summary = import_orders(rows, chunk_size=2)
+
+        self.assertEqual(summary['created'], 4)
+        self.assertEqual([error['index'] for error in summary['errors']], [2, 3])
+        # The failed chunk left nothing behind, so its rows can simply be retried
+        self.assertEqual(Order.objects.count(), 4)
+        self.assertFalse(Customer.objects.filter(phone__in=['+919800000002', '+919800000003']).exists())
+
+        summary = import_orders(rows[2:4])
+        self.assertEqual((summary['created'], Order.objects.count()), (2, 6))
+
+    def test_order_create_is_atomic(self):
+        data = {
+            'expected_delivery_date': '2026-11-01',
+            'customer_data': {'name': 'Walk-in', 'phone': '+919800000009', 'address': 'MG Road', 'area': 'Koramangala'},
+            'items': [{'service': self.pricing.service_id, 'service_pricing': self.pricing.id,
+                       'quantity': 1, 'unit_price': '960.00', 'total_price': '960.00'}],
+        }
+        serializer = OrderCreateSerializer(data=data)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+
+        with mock.patch.object(OrderItem.objects, 'bulk_create', side_effect=IntegrityError('simulated')):
+            with self.assertRaises(IntegrityError):
+                serializer.save()
+        self.assertFalse(Order.objects.exists())
+
+        order = serializer.save()
+        self.assertEqual(order.items.count(), 1)
+
+    def test_import_endpoint_reports_invalid_orders(self):
+        rows = [
+            self.order_row('+919800000001'),
+            self.order_row('+919800000001', quantity=2),
+            {'customer': {'name': 'No phone'}, 'expected_delivery_date': '2026-11-01', 'items': []},
+            self.order_row('+919800000002', service_pricing=999999),
+        ]
+        response = APIClient().post('/api/orders/orders/import/', {'orders': rows}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['index'] for error in response.data['errors']], [2, 3])
+        self.assertEqual(Customer.objects.filter(phone='+919800000001').count(), 1)
+        self.assertEqual(
+            sorted(Order.objects.values_list('total_amount', flat=True)), [Decimal('1110.00'), Decimal('2070.00')]
+        )
+
+
+class OrderListQueryTests(TestCase):
+    """Order list pages cost a constant number of queries"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = ServiceCategory.objects.create(name='Blouses')
+        pricings = []
+        for name in ('Designer Blouse', 'Saree Fall', 'Lehenga'):
+            service = Service.objects.create(
+                category=category, name=name, description=name, difficulty_level='basic', estimated_days=3
+            )
+            ServiceRequirement.objects.create(service=service, name='Bust', description='Bust size')
+            area, _ = PricingArea.objects.get_or_create(name='Koramangala', defaults={'multiplier': Decimal('1.00')})
+            pricings.append(ServicePricing.objects.create(
+                service=service, area=area, base_price=Decimal('500.00'), final_price=Decimal('500.00')
+            ))
+
+        import_orders([
+            {
+                'customer': {'name': f'Customer {index}', 'phone': f'+9198000{index:05d}'},
+                'expected_delivery_date': '2026-11-01',
+                'items': [{'service_pricing': pricing.id} for pricing in pricings[:index % 3 + 1]],
+            }
+            for index in range(45)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        order_number_allocator.reset()
+
+    def test_list_pages_query_count(self):
+        seen = []
+        url = '/api/orders/orders/?page_size=20'
+        for _ in range(3):
+            # Orders with their customers, then the page's items with their services
+            with self.assertNumQueries(2):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(order['id'] for order in response.data['results'])
+            url = response.data['next']
+
+        self.assertIsNone(url)
+        self.assertEqual(len(seen), 45)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+        self.assertEqual(response.data['results'][-1]['items'][0]['service_name'], 'Designer Blouse')
+
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/orders/orders/by_status/', {'status': 'pending', 'page_size': 50})
+        self.assertEqual(len(response.data['results']), 45)
+
+    def test_detail_query_count(self):
+        order = Order.objects.order_by('id').last()
+        # Order with customer, appointment and delivery; items with service and
+        # category; requirements; status updates; payments
+        with self.assertNumQueries(5):
+            response = self.client.get(f'/api/orders/orders/{order.id}/')
+        self.assertEqual(len(response.data['items']), 3)
+        self.assertEqual(response.data['items'][0]['service_details']['requirements'][0]['name'], 'Bust')
+
+
+class OrderTransitionTests(TestCase):
+    """Status changes follow the state machine and are logged as events"""
+
+    @classmethod
+    def setUpTestData(cls):
+        customer = Customer.objects.create(
+            name='Priya Sharma', phone='+919876543210', address='MG Road', area='Koramangala'
+        )
+        cls.orders = [create_order(customer, status='in_progress') for _ in range(30)]
+        cls.pending = create_order(customer)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_bulk_transition(self):
+        ids = [order.id for order in self.orders] + [self.pending.id, 999999]
+        received = []
+
+        def receiver(sender, updates, **kwargs):
+            received.extend(updates)
+        order_status_changed.connect(receiver)
+        self.addCleanup(order_status_changed.disconnect, receiver)
+
+        # Locking read, one UPDATE, the event sequence UPDATE and read, one
+        # bulk insert (plus the savepoint)
+        with self.assertNumQueries(7), self.captureOnCommitCallbacks(execute=True):
+            result = transition_orders(ids, 'ready_for_fitting', updated_by='Workshop')
+
+        self.assertEqual(result['updated'], [order.id for order in self.orders])
+        self.assertEqual([(item['id'], item['status']) for item in result['rejected']],
+                         [(self.pending.id, 'pending'), (999999, None)])
+        self.assertEqual(Order.objects.filter(status='ready_for_fitting').count(), 30)
+        self.assertEqual(len(received), 30)
+        self.assertEqual(received[0].old_status, 'in_progress')
+
+        with self.assertRaises(TransitionError):
+            transition_orders(ids, 'accepted')
+
+    def test_endpoints_and_event_feed(self):
+        response = self.client.post('/api/orders/orders/bulk_transition/', {
+            'order_ids': [order.id for order in self.orders[:5]], 'status': 'ready_for_fitting'
+        }, format='json')
+        self.assertEqual(len(response.data['updated']), 5)
+
+        url = f'/api/orders/orders/{self.pending.id}/'
+        self.assertEqual(self.client.patch(url, {'status': 'completed'}, format='json').status_code, 400)
+        self.assertEqual(self.client.patch(url, {'status': 'confirmed'}, format='json').data['status'], 'confirmed')
+        response = self.client.post(f'{url}update_status/', {'status': 'delivered'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        # Committed events are readable at once, incrementally and in order
+        first = self.client.get('/api/orders/orders/events/', {'limit': 4}).data
+        rest = self.client.get('/api/orders/orders/events/', {'after': first['last_sequence']}).data
+        events = first['results'] + rest['results']
+        self.assertEqual(len(events), 6)
+        self.assertEqual(events[-1]['new_status'], 'confirmed')
+        self.assertEqual([event['sequence'] for event in events], list(range(1, 7)))
+        self.assertEqual(rest['last_sequence'], 6)
+
+    def test_event_sequence_follows_commits(self):
+        transition_orders([self.orders[0].id], 'ready_for_fitting')
+        first = OrderStatusUpdate.objects.get()
+
+        # A rolled-back transition takes its sequence numbers back with it
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            transition_orders([self.orders[1].id], 'ready_for_fitting')
+            raise RuntimeError
+        transition_orders([self.orders[2].id, self.pending.id], 'cancelled')
+
+        later = list(events_after(first.sequence))
+        self.assertEqual([event.order_id for event in later], [self.orders[2].id, self.pending.id])
+        self.assertEqual([event.sequence for event in later], [first.sequence + 1, first.sequence + 2])
+
+        # A lost sequence row restarts after the last event
+        OrderEventSequence.objects.all().delete()
+        transition_orders([self.orders[3].id], 'completed')
+        self.assertEqual(events_after(later[-1].sequence)[0].order_id, self.orders[3].id)
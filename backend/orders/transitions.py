@@ -0,0 +1,140 @@
+"""Order status state machine.
+
+``TRANSITIONS`` lists the statuses each status may move to. An order moves
+by ``transition_orders``, one order or many at once. Each call costs the
+same few queries however many orders it moves:
+
+- one locking read of the orders' current statuses
+- one ``UPDATE`` of every order that may move
+- one ``UPDATE`` and read of the event sequence
+- one ``bulk_create`` of their ``OrderStatusUpdate`` rows
+
+Orders whose current status does not allow the move are reported back and
+left untouched.
+
+The ``OrderStatusUpdate`` rows double as the order event log. Each one gets
+a ``sequence`` number from the single ``OrderEventSequence`` row, in the same
+transaction as the status change. The ``UPDATE`` that advances the sequence
+locks the row until that transaction ends, so sequence numbers become visible
+in commit order: once a reader sees an event, every event with a lower
+sequence number has already committed. Consumers read the log incrementally
+with ``events_after(last_sequence)``
+(``GET /api/orders/orders/events/?after=<sequence>``) and never miss one. The
+lock serializes only the end of concurrent transitions, not the status reads.
+In-process consumers can connect to ``order_status_changed``, which is sent
+once the transaction commits.
+"""
+from typing import Dict, Iterable, List, Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import Order, OrderEventSequence, OrderStatusUpdate
+
+TRANSITIONS = {
+    'pending': {'confirmed', 'cancelled'},
+    'confirmed': {'in_progress', 'cancelled'},
+    'in_progress': {'ready_for_fitting', 'final_stage', 'completed', 'cancelled'},
+    'ready_for_fitting': {'fitting_completed', 'in_progress', 'cancelled'},
+    # Alterations after a fitting go back into the workshop
+    'fitting_completed': {'final_stage', 'in_progress', 'completed'},
+    'final_stage': {'completed'},
+    'completed': {'delivered'},
+    'delivered': set(),
+    'cancelled': set(),
+}
+
+EVENT_PAGE_SIZE = 500
+
+# Sent with ``updates``, the OrderStatusUpdate rows of one committed transition
+order_status_changed = Signal()
+
+
+class TransitionError(Exception):
+    """A status the state machine does not know"""
+
+
+def allowed_sources(new_status: str) -> List[str]:
+    """Statuses an order may be in to move to ``new_status``"""
+    if new_status not in TRANSITIONS:
+        raise TransitionError(f"Unknown status: {new_status}")
+    return [status for status, targets in TRANSITIONS.items() if new_status in targets]
+
+
+def _create_event_sequence() -> None:
+    try:
+        with transaction.atomic():
+            last_value = OrderStatusUpdate.objects.aggregate(last=Max('sequence'))['last'] or 0
+            OrderEventSequence.objects.create(id=1, last_value=last_value)
+    except IntegrityError:
+        # Another transaction created it first
+        pass
+
+
+def allocate_event_sequence(count: int) -> List[int]:
+    """Reserve ``count`` event sequence numbers; call inside the transaction writing the events"""
+    sequence = OrderEventSequence.objects.filter(id=1)
+    # The UPDATE row-locks the sequence until the caller's transaction ends
+    advance = {'last_value': F('last_value') + count, 'updated_at': timezone.now()}
+    if not sequence.update(**advance):
+        _create_event_sequence()
+        sequence.update(**advance)
+    last_value = sequence.values_list('last_value', flat=True).get()
+    return list(range(last_value - count + 1, last_value + 1))
+
+
+def transition_orders(order_ids: Iterable[int], new_status: str, updated_by: str = 'System',
+                      notes: str = '', extra: Optional[Dict] = None) -> Dict:
+    """Move orders to ``new_status``; returns the moved ids and the rejected orders
+
+    ``extra`` holds further column values written with the status (e.g.
+    ``actual_delivery_date``).
+    """
+    sources = set(allowed_sources(new_status))
+    order_ids = list(dict.fromkeys(int(order_id) for order_id in order_ids))
+
+    with transaction.atomic():
+        current = dict(
+            Order.objects.select_for_update().filter(id__in=order_ids).values_list('id', 'status')
+        )
+        movable = [order_id for order_id in order_ids if current.get(order_id) in sources]
+
+        updates = []
+        if movable:
+            Order.objects.filter(id__in=movable).update(
+                status=new_status, updated_at=timezone.now(), **(extra or {})
+            )
+            # Last, so the sequence row stays locked only until the commit
+            sequence = allocate_event_sequence(len(movable))
+            updates = OrderStatusUpdate.objects.bulk_create([
+                OrderStatusUpdate(
+                    order_id=order_id,
+                    old_status=current[order_id],
+                    new_status=new_status,
+                    notes=notes,
+                    updated_by=updated_by,
+                    sequence=number
+                )
+                for order_id, number in zip(movable, sequence)
+            ])
+            transaction.on_commit(lambda: order_status_changed.send(sender=Order, updates=updates))
+
+    rejected = []
+    for order_id in order_ids:
+        if order_id not in current:
+            rejected.append({'id': order_id, 'status': None, 'error': 'Order not found'})
+        elif current[order_id] not in sources:
+            rejected.append({
+                'id': order_id,
+                'status': current[order_id],
+                'error': f"Cannot move from {current[order_id]} to {new_status}"
+            })
+
+    return {'updated': movable, 'rejected': rejected}
+
+
+def events_after(last_sequence: int = 0, limit: int = EVENT_PAGE_SIZE):
+    """Status change events with sequence numbers above ``last_sequence``, in commit order"""
+    return OrderStatusUpdate.objects.filter(sequence__gt=last_sequence).order_by('sequence')[:limit]
@@ -1,30 +1,102 @@
 from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from django.db import transaction
+from django.db.models import Prefetch
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Order, OrderItem, OrderStatusUpdate, Payment, Delivery
+from .importer import import_orders
+from .ledger import LedgerError, record_payment, refresh_payment_status, settle_payments
+from .models import Order, OrderItem, Payment, Delivery
+from .pagination import OrderCursorPagination
+from .transitions import EVENT_PAGE_SIZE, TransitionError, events_after, transition_orders
 from .serializers import (
-    OrderSerializer, OrderCreateSerializer, OrderDetailSerializer,
+    OrderSerializer, OrderListSerializer, OrderCreateSerializer, OrderDetailSerializer,
     OrderItemSerializer, OrderStatusUpdateSerializer, PaymentSerializer, DeliverySerializer
 )
 
 
 class OrderViewSet(viewsets.ModelViewSet):
     """ViewSet for orders"""
-    queryset = Order.objects.all().select_related('customer', 'appointment').prefetch_related('items')
+    queryset = Order.objects.all()
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'payment_status', 'customer']
     search_fields = ['order_number', 'customer__name', 'customer__phone']
     ordering_fields = ['order_date', 'expected_delivery_date', 'total_amount']
-    ordering = ['-order_date']
+    ordering = ['-order_date', '-id']
+    pagination_class = OrderCursorPagination
+
+    # Actions that return pages of orders in the lean list representation
+    list_actions = ('list', 'by_status', 'pending_delivery')
+
+    def get_queryset(self):
+        # Every relation a serializer touches is joined or prefetched, so a
+        # page costs the same number of queries however many orders it holds
+        queryset = super().get_queryset()
+        if self.action in self.list_actions:
+            return queryset.select_related('customer').prefetch_related(
+                Prefetch('items', queryset=OrderItem.objects.select_related('service'))
+            )
+        
+        items = Prefetch(
+            'items',
+            queryset=OrderItem.objects.select_related('service__category').prefetch_related('service__requirements')
+        )
+        if self.action == 'retrieve':
+            return queryset.select_related(
+                'customer', 'appointment__customer', 'appointment__service', 'delivery'
+            ).prefetch_related(items, 'status_updates', 'payments')
+        return queryset.select_related('customer', 'delivery').prefetch_related(items)
 
     def get_serializer_class(self):
         if self.action == 'create':
             return OrderCreateSerializer
         elif self.action == 'retrieve':
             return OrderDetailSerializer
+        elif self.action in self.list_actions:
+            return OrderListSerializer
         return OrderSerializer
 
+    def perform_update(self, serializer):
+        # Status changes made with PUT/PATCH go through the state machine too
+        new_status = serializer.validated_data.pop('status', None)
+        with transaction.atomic():
+            # Write only the edited columns: saving the whole row would put back
+            # a paid_amount read before a concurrent ledger payment
+            order = serializer.instance
+            for field, value in serializer.validated_data.items():
+                setattr(order, field, value)
+            order.save(update_fields=[*serializer.validated_data, 'updated_at'])
+            if 'total_amount' in serializer.validated_data:
+                refresh_payment_status(order.id)
+            order.refresh_from_db(fields=['paid_amount', 'payment_status'])
+            if new_status and new_status != order.status:
+                result = transition_orders([order.id], new_status, updated_by='System')
+                if result['rejected']:
+                    raise ValidationError({'status': [result['rejected'][0]['error']]})
+                order.refresh_from_db()
+
+    def paginated_response(self, queryset):
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def bulk_import(self, request):
+        """Create many orders at once (e.g. a partner boutique's order feed)"""
+        rows = request.data.get('orders')
+        if not isinstance(rows, list) or not rows:
+            return Response(
+                {'error': 'orders must be a non-empty list'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        summary = import_orders(rows)
+        return Response(
+            summary,
+            status=status.HTTP_201_CREATED if summary['created'] else status.HTTP_400_BAD_REQUEST
+        )
+
     @action(detail=True, methods=['post'])
     def update_status(self, request, pk=None):
         """Update order status"""
@@ -36,22 +108,53 @@ class OrderViewSet(viewsets.ModelViewSet):
         if not new_status:
             return Response({'error': 'status is required'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Create status update record
-        OrderStatusUpdate.objects.create(
-            order=order,
-            old_status=order.status,
-            new_status=new_status,
-            notes=notes,
-            updated_by=updated_by
-        )
+        try:
+            result = transition_orders([order.id], new_status, updated_by=updated_by, notes=notes)
+        except TransitionError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Update order status
-        order.status = new_status
-        order.save()
+        if result['rejected']:
+            return Response({'error': result['rejected'][0]['error']}, status=status.HTTP_400_BAD_REQUEST)
         
-        serializer = self.get_serializer(order)
+        serializer = self.get_serializer(self.get_object())
         return Response(serializer.data)
 
+    @action(detail=False, methods=['post'])
+    def bulk_transition(self, request):
+        """Move many orders to one status (e.g. a whole batch to ready_for_fitting)"""
+        order_ids = request.data.get('order_ids')
+        new_status = request.data.get('status')
+        notes = request.data.get('notes', '')
+        updated_by = request.data.get('updated_by', 'System')
+        
+        if not isinstance(order_ids, list) or not order_ids or not new_status:
+            return Response(
+                {'error': 'order_ids (a non-empty list) and status are required'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            result = transition_orders(order_ids, new_status, updated_by=updated_by, notes=notes)
+        except (TransitionError, TypeError, ValueError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(result)
+
+    @action(detail=False, methods=['get'])
+    def events(self, request):
+        """Status change events after ?after=<sequence>, in commit order; pass back last_sequence to continue"""
+        try:
+            last_sequence = int(request.query_params.get('after', 0))
+            limit = min(int(request.query_params.get('limit', EVENT_PAGE_SIZE)), EVENT_PAGE_SIZE)
+        except ValueError:
+            return Response({'error': 'after and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        events = list(events_after(last_sequence, max(1, limit)))
+        return Response({
+            'results': OrderStatusUpdateSerializer(events, many=True).data,
+            'last_sequence': events[-1].sequence if events else last_sequence
+        })
+
     @action(detail=True, methods=['post'])
     def add_payment(self, request, pk=None):
         """Add payment to an order"""
@@ -67,28 +170,17 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Create payment record
-        payment = Payment.objects.create(
-            order=order,
-            amount=amount,
-            payment_method=payment_method,
-            transaction_id=transaction_id,
-            notes=notes
-        )
-        
-        # Update order paid amount
-        order.paid_amount += float(amount)
-        
-        # Update payment status
-        if order.paid_amount >= order.total_amount:
-            order.payment_status = 'paid'
-        elif order.paid_amount > 0:
-            order.payment_status = 'partial'
-        
-        order.save()
+        # Insert the payment and advance the order's totals atomically;
+        # a replayed transaction_id returns the payment already recorded
+        try:
+            payment, created = record_payment(
+                order.id, amount, payment_method, transaction_id=transaction_id, notes=notes
+            )
+        except LedgerError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         serializer = PaymentSerializer(payment)
-        return Response(serializer.data)
+        return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
     @action(detail=True, methods=['get'])
     def payments(self, request, pk=None):
@@ -142,37 +234,40 @@ class OrderViewSet(viewsets.ModelViewSet):
         delivery.is_delivered = True
         delivery.actual_delivery_date = request.data.get('delivery_date')
         delivery.delivery_notes = request.data.get('notes', delivery.delivery_notes)
-        delivery.save()
         
-        # Update order status
-        order.status = 'delivered'
-        order.actual_delivery_date = delivery.actual_delivery_date
-        order.save()
+        # Update order status through the state machine so the event is logged
+        with transaction.atomic():
+            result = transition_orders(
+                [order.id], 'delivered',
+                updated_by=request.data.get('updated_by', 'System'),
+                notes=delivery.delivery_notes,
+                extra={'actual_delivery_date': delivery.actual_delivery_date}
+            )
+            if result['rejected']:
+                return Response({'error': result['rejected'][0]['error']}, status=status.HTTP_400_BAD_REQUEST)
+            delivery.save()
         
-        serializer = self.get_serializer(order)
+        serializer = self.get_serializer(self.get_object())
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
     def by_status(self, request):
         """Get orders grouped by status"""
-        status = request.query_params.get('status')
-        if status:
-            orders = self.queryset.filter(status=status)
-        else:
-            orders = self.queryset
+        orders = self.filter_queryset(self.get_queryset())
+        order_status = request.query_params.get('status')
+        if order_status:
+            orders = orders.filter(status=order_status)
         
-        serializer = self.get_serializer(orders, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(orders)
 
     @action(detail=False, methods=['get'])
     def pending_delivery(self, request):
         """Get orders pending delivery"""
-        orders = self.queryset.filter(
+        orders = self.filter_queryset(self.get_queryset()).filter(
             status='completed',
             delivery__is_delivered=False
         )
-        serializer = self.get_serializer(orders, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(orders)
 
 
 class OrderItemViewSet(viewsets.ReadOnlyModelViewSet):
@@ -186,13 +281,50 @@ class OrderItemViewSet(viewsets.ReadOnlyModelViewSet):
 
 
 class PaymentViewSet(viewsets.ModelViewSet):
-    """ViewSet for payments"""
+    """ViewSet for payments
+
+    Payments are ledger entries: they are recorded, never edited or deleted,
+    since either would leave the order's paid total out of step.
+    """
     queryset = Payment.objects.all().select_related('order')
     serializer_class = PaymentSerializer
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['order', 'payment_method']
     ordering_fields = ['payment_date', 'amount']
     ordering = ['-payment_date']
+    http_method_names = ['get', 'post', 'head', 'options']
+
+    def create(self, request, *args, **kwargs):
+        """Record a payment through the ledger so the order's totals follow"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        try:
+            payment, created = record_payment(
+                data['order'].id, data['amount'], data['payment_method'],
+                transaction_id=data.get('transaction_id', ''), notes=data.get('notes', '')
+            )
+        except LedgerError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(
+            self.get_serializer(payment).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+    @action(detail=False, methods=['post'])
+    def settle(self, request):
+        """Import a batch of settled payments (e.g. a gateway settlement file)"""
+        entries = request.data.get('payments')
+        if not isinstance(entries, list) or not entries:
+            return Response(
+                {'error': 'payments must be a non-empty list'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        summary = settle_payments(entries)
+        return Response(summary)
 
 
 class DeliveryViewSet(viewsets.ModelViewSet):
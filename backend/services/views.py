@@ -105,6 +105,15 @@ class ServicePricingViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        # Answer from the precomputed price matrix when it covers this pair
+        from ai_pricing.services.price_matrix import lookup_price
+        try:
+            entry = lookup_price(service_id, area_id)
+        except (TypeError, ValueError):
+            entry = None
+        if entry is not None:
+            return Response(entry['service_pricing'])
+        
         try:
             pricing = ServicePricing.objects.get(
                 service_id=service_id, 
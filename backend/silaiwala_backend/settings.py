@@ -195,3 +195,50 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# Cache
+# Workers share the cache through Redis when REDIS_URL is set; the pricing
+# rule, price matrix and quote cache version stamps depend on that to reach
+# every worker. Without it each process has its own in-memory cache.
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'OPTIONS': {'CLIENT_CLASS': 'django_redis.client.DefaultClient'},
+        }
+    }
+
+# Orders
+# Order numbers each worker reserves from the day's sequence at a time
+ORDER_NUMBER_BLOCK_SIZE = int(os.environ.get('ORDER_NUMBER_BLOCK_SIZE', 20))
+
+# AI Pricing
+# Quote records (DynamicPricing) are buffered in memory and upserted in bulk
+AI_PRICING_RECORD_FLUSH_INTERVAL = 5.0  # seconds
+AI_PRICING_RECORD_BATCH_SIZE = 200
+# Trained model bundles; every web and training process must see the same directory
+AI_PRICING_MODEL_DIR = os.environ.get(
+    'AI_PRICING_MODEL_DIR', str(BASE_DIR / 'var' / 'ai_pricing' / 'models')
+)
+# CPU cores model training may use: candidate models fit in parallel processes
+# and the leftover cores go to estimators with n_jobs (RandomForest). Kept small
+# by default because training runs next to the web workers
+AI_PRICING_TRAINING_CORES = int(os.environ.get('AI_PRICING_TRAINING_CORES', 2))
+# k-fold cross-validation folds used to pick the best candidate (below 2 disables)
+AI_PRICING_TRAINING_CV_FOLDS = int(os.environ.get('AI_PRICING_TRAINING_CV_FOLDS', 5))
+# 'auto' training updates the current model incrementally, but retrains from
+# scratch once the last full retrain is this old
+AI_PRICING_FULL_RETRAIN_DAYS = int(os.environ.get('AI_PRICING_FULL_RETRAIN_DAYS', 7))
+# Full retrains read history from a month-partitioned Arrow snapshot (needs pyarrow)
+AI_PRICING_FEATURE_SNAPSHOT = os.environ.get('AI_PRICING_FEATURE_SNAPSHOT', 'True') == 'True'
+AI_PRICING_SNAPSHOT_DIR = os.environ.get(
+    'AI_PRICING_SNAPSHOT_DIR', str(BASE_DIR / 'var' / 'ai_pricing' / 'snapshots')
+)
+# Model quotes below this confidence are always priced live, never served precomputed
+AI_PRICING_CACHE_MIN_CONFIDENCE = float(os.environ.get('AI_PRICING_CACHE_MIN_CONFIDENCE', 0.7))
+# Computed quotes are cached per prepared context: an in-process LRU in front
+# of the default cache (Redis in production)
+AI_PRICING_QUOTE_CACHE_TTL = int(os.environ.get('AI_PRICING_QUOTE_CACHE_TTL', 900))  # seconds
+AI_PRICING_QUOTE_CACHE_L1_SIZE = 2048
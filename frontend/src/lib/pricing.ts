@@ -27,6 +27,7 @@ export type PriceResponse = {
   price_multiplier?: number;
   confidence_score?: number;
   factors_applied?: Record<string, unknown>;
+  pricing_record_id?: string;
   message?: string;
 };
 